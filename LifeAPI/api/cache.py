@@ -0,0 +1,23 @@
+import uuid
+
+from django.core.cache import cache
+
+
+def _version_key(scope: str) -> str:
+    return f'version:{scope}'
+
+def get_version(scope: str) -> str:
+    """
+    Returns the current version token for a cache scope, creating one if needed.
+    Tokens are random rather than counters so an evicted version can never
+    match data built against an older one.
+    """
+    return cache.get_or_set(_version_key(scope), lambda: uuid.uuid4().hex, timeout=None)
+
+def bump_version(scope: str) -> str:
+    """
+    Replaces the version token for a cache scope, invalidating anything built from it.
+    """
+    version = uuid.uuid4().hex
+    cache.set(_version_key(scope), version, timeout=None)
+    return version
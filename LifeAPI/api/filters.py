@@ -1,7 +1,13 @@
 import django_filters
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import Q
+from rest_framework.filters import OrderingFilter
 
 from api.models import BudgetPurchase, BudgetCategory
 
+# Annotation set by PurchaseFilterSet.search, usable as ?ordering=-search_rank
+SEARCH_RANK = 'search_rank'
+
 class PurchaseFilterSet(django_filters.FilterSet):
     category = django_filters.ModelMultipleChoiceFilter(
         field_name='category',
@@ -10,7 +16,47 @@ class PurchaseFilterSet(django_filters.FilterSet):
     purchase_date__year = django_filters.NumberFilter(field_name='purchase_date', lookup_expr='year')
     purchase_date__month = django_filters.NumberFilter(field_name='purchase_date', lookup_expr='month')
     description = django_filters.CharFilter(field_name='description', lookup_expr='icontains')
+    search = django_filters.CharFilter(
+        method='filter_search',
+        help_text='Purchases whose description contains every word. Order by -search_rank for best matches first.'
+    )
 
     class Meta:
         model = BudgetPurchase
-        fields = ['category', 'purchase_date__year', 'purchase_date__month', 'description']
+        fields = ['category', 'purchase_date__year', 'purchase_date__month', 'description', 'search']
+
+    def filter_search(self, queryset, name, value):
+        """
+        Each word is an icontains match, so every word is answered by the
+        idx_purchase_desc_trgm trigram index rather than a scan of the
+        budget's purchases. Rows are ranked by trigram similarity to the
+        whole search.
+        """
+        terms = value.split()
+        if not terms:
+            return queryset
+
+        condition = Q()
+        for term in terms:
+            condition &= Q(description__icontains=term)
+        queryset = queryset.filter(condition)
+
+        return queryset.annotate(**{SEARCH_RANK: TrigramSimilarity('description', ' '.join(terms))})
+
+class PurchaseOrderingFilter(OrderingFilter):
+    """
+    Allows ordering by search_rank only when a search has ranked the rows,
+    falling back to the view's default ordering otherwise. Ties in rank keep
+    the default ordering.
+    """
+    def remove_invalid_fields(self, queryset, fields, view, request):
+        valid = super().remove_invalid_fields(queryset, fields, view, request)
+        if SEARCH_RANK not in queryset.query.annotations:
+            valid = [term for term in valid if term.lstrip('-') != SEARCH_RANK]
+        return valid
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering and any(term.lstrip('-') == SEARCH_RANK for term in ordering):
+            ordering = [*ordering, *(term for term in self.get_default_ordering(view) if term not in ordering)]
+        return ordering
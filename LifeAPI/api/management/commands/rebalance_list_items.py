@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.models import ListItem, UserModule
+from api.services.ordering import needs_rebalance, renumber, MIN_RANK_GAP, RANK_STEP
+from api.serializers.serializers_lists import LIST_ITEM_ORDERING
+
+
+class Command(BaseCommand):
+    help = 'Respaces list item rank keys in lists where they have become tied or too dense'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--list',
+            type=int,
+            action='append',
+            dest='list_ids',
+            help='ID of a list to check. Can be repeated. Defaults to all lists.'
+        )
+        parser.add_argument(
+            '--min-gap',
+            type=float,
+            default=MIN_RANK_GAP * 1000,
+            help='Rebalance lists where neighbouring keys are closer than this.'
+        )
+
+    def handle(self, *args, **options):
+        lists = UserModule.objects.filter(module__name='list').order_by('id')
+        if options['list_ids']:
+            lists = lists.filter(id__in=options['list_ids'])
+            missing = set(options['list_ids']) - set(lists.values_list('id', flat=True))
+            if missing:
+                raise CommandError(f"List(s) not found: {', '.join(str(id) for id in sorted(missing))}")
+
+        rebalanced = 0
+        for user_list in lists.iterator():
+            items = ListItem.objects.filter(user_module=user_list)
+            if not needs_rebalance(items, options['min_gap']):
+                continue
+
+            # Same lock as a move, so a concurrent drag never sees half-written keys
+            with transaction.atomic():
+                list(UserModule.objects.filter(pk=user_list.pk).select_for_update())
+                renumber(items, LIST_ITEM_ORDERING, step=RANK_STEP)
+            self.stdout.write(f"Rebalanced list {user_list.id} ({user_list.name})")
+            rebalanced += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Rebalanced {rebalanced} list(s)."))
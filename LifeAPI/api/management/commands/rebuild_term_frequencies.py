@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import UserModule
+from api.services.budget_analysis import rebuild_term_frequencies, REBUILD_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the category term frequency table from budget purchases'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--budget',
+            type=int,
+            action='append',
+            dest='budget_ids',
+            help='ID of a budget to rebuild. Can be repeated. Defaults to all budgets.'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=REBUILD_CHUNK_SIZE,
+            help='Number of purchases fetched per database round trip.'
+        )
+
+    def handle(self, *args, **options):
+        budgets = UserModule.objects.filter(module__name='budget').order_by('id')
+        if options['budget_ids']:
+            budgets = budgets.filter(id__in=options['budget_ids'])
+            missing = set(options['budget_ids']) - set(budgets.values_list('id', flat=True))
+            if missing:
+                raise CommandError(f"Budget(s) not found: {', '.join(str(id) for id in sorted(missing))}")
+
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be a positive integer.')
+
+        total = 0
+        for budget in budgets.iterator():
+            self.stdout.write(f"Rebuilding budget {budget.id} ({budget.name})...")
+            count = rebuild_term_frequencies(
+                budget,
+                chunk_size=chunk_size,
+                progress=lambda processed: self.stdout.write(f"  {processed} purchases processed")
+            )
+            total += count
+
+        self.stdout.write(self.style.SUCCESS(f"Reprocessed {total} purchases for term frequency analysis."))
@@ -0,0 +1,71 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.services.load_data import (
+    clear_load_data,
+    generate_load_data,
+    LoadDataScale,
+    DEFAULT_EMAIL_DOMAIN,
+    DEFAULT_SEED,
+    LOAD_DATA_CHUNK_SIZE
+)
+
+
+class Command(BaseCommand):
+    help = 'Generates a synthetic dataset of users, lists and budgets for load testing'
+
+    def add_arguments(self, parser):
+        defaults = LoadDataScale()
+        parser.add_argument('--users', type=int, default=defaults.users, help='Number of users to generate.')
+        parser.add_argument('--lists', type=int, default=defaults.lists, help='Lists per user.')
+        parser.add_argument('--fields', type=int, default=defaults.fields, help='Fields per list.')
+        parser.add_argument('--items', type=int, default=defaults.items, help='Items per list.')
+        parser.add_argument('--budgets', type=int, default=defaults.budgets, help='Budgets per user.')
+        parser.add_argument('--purchases', type=int, default=defaults.purchases, help='Purchases per budget.')
+        parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='Random seed. The same seed generates the same data.')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=LOAD_DATA_CHUNK_SIZE,
+            help='Number of rows inserted per bulk_create statement.'
+        )
+        parser.add_argument(
+            '--email-domain',
+            default=DEFAULT_EMAIL_DOMAIN,
+            help='Generated users are loaduser<n>@<domain>.'
+        )
+        parser.add_argument('--password', default='loadtest', help='Password for every generated user.')
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Delete users previously generated for the email domain first.'
+        )
+
+    def handle(self, *args, **options):
+        scale = LoadDataScale(**{field: options[field] for field in LoadDataScale._fields})
+        if any(value < 0 for value in scale):
+            raise CommandError('Scale options must not be negative.')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be a positive integer.')
+
+        domain = options['email_domain']
+        if options['clear']:
+            deleted = clear_load_data(domain)
+            self.stdout.write(f"Deleted {deleted} generated user(s).")
+        elif get_user_model().objects.filter(email__endswith=f'@{domain}').exists():
+            raise CommandError(f"Users for {domain} already exist. Use --clear to replace them.")
+
+        started = time.perf_counter()
+        data = generate_load_data(
+            scale,
+            seed=options['seed'],
+            email_domain=domain,
+            password=options['password'],
+            chunk_size=options['chunk_size'],
+            progress=self.stdout.write
+        )
+
+        summary = ', '.join(f"{count} {name}" for name, count in data.counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Generated {summary} in {time.perf_counter() - started:.1f}s."))
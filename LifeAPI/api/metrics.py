@@ -0,0 +1,318 @@
+import atexit
+import glob
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the request latency buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Upper bounds of the queries-per-request buckets
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+SNAPSHOT_PATTERN = 'metrics_{pid}.json'
+
+
+class Metric:
+    type = None
+
+    def __init__(self, registry, name: str, documentation: str, label_names: tuple[str, ...] = ()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        if labels.keys() != set(self.label_names):
+            raise ValueError(f"{self.name} takes labels {', '.join(self.label_names) or '(none)'}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def empty(self):
+        raise NotImplementedError
+
+    def accepts(self, value) -> bool:
+        raise NotImplementedError
+
+    def merge(self, value, other):
+        raise NotImplementedError
+
+
+class CounterMetric(Metric):
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        self.registry._update(self, self._key(labels), lambda value: value + amount)
+
+    def empty(self):
+        return 0
+
+    def accepts(self, value) -> bool:
+        return isinstance(value, (int, float))
+
+    def merge(self, value, other):
+        return value + other
+
+    def samples(self, key, value):
+        yield self.name, key, value
+
+
+class HistogramMetric(Metric):
+    """
+    Values are stored as the count in each bucket, the +Inf bucket last,
+    followed by the sum of all observations.
+    """
+    type = 'histogram'
+
+    def __init__(self, registry, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+
+        def update(counts):
+            counts = list(counts)
+            counts[index] += 1
+            counts[-1] += value
+            return counts
+
+        self.registry._update(self, self._key(labels), update)
+
+    def empty(self):
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def accepts(self, value) -> bool:
+        # Snapshots written before the buckets changed cannot be merged
+        return isinstance(value, list) and len(value) == len(self.buckets) + 2
+
+    def merge(self, value, other):
+        return [a + b for a, b in zip(value, other)]
+
+    def samples(self, key, value):
+        cumulative = 0
+        for bound, count in zip((*self.buckets, math.inf), value):
+            cumulative += count
+            yield f'{self.name}_bucket', (*key, _format_value(bound)), cumulative
+        yield f'{self.name}_sum', key, value[-1]
+        yield f'{self.name}_count', key, cumulative
+
+
+class MetricsRegistry:
+    """
+    Holds this process's metric values in memory. With METRICS_DIR set,
+    each gunicorn worker writes its values to its own file in that
+    directory (see flush) and a scrape served by any worker sums every
+    file, so totals cover all workers. A worker reuses the file of an
+    earlier process with the same pid, and on starting deletes files not
+    written for METRICS_SNAPSHOT_MAX_AGE seconds.
+    """
+    def __init__(self):
+        self.metrics = {}
+        self._values = {}
+        self._lock = threading.Lock()
+        self._pid = None
+        self._last_flush = time.monotonic()
+        self._flush_at_exit = False
+
+    def counter(self, name, documentation, label_names=()) -> CounterMetric:
+        return self._register(CounterMetric(self, name, documentation, label_names))
+
+    def histogram(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS) -> HistogramMetric:
+        return self._register(HistogramMetric(self, name, documentation, label_names, buckets))
+
+    def _register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    @property
+    def directory(self) -> str:
+        return getattr(settings, 'METRICS_DIR', '')
+
+    def _snapshot_path(self, pid: int) -> str:
+        return os.path.join(self.directory, SNAPSHOT_PATTERN.format(pid=pid))
+
+    def _check_pid(self):
+        # Runs on first use in each process; values inherited from the
+        # parent across a fork belong to the parent
+        pid = os.getpid()
+        if pid == self._pid:
+            return
+        self._pid = pid
+        self._values = {}
+        self._last_flush = time.monotonic()
+        if self.directory:
+            self._values = self._read(self._snapshot_path(pid))
+            self._prune()
+
+    def _snapshot_paths(self) -> list[str]:
+        return glob.glob(os.path.join(self.directory, SNAPSHOT_PATTERN.format(pid='*')))
+
+    def _prune(self):
+        # Snapshots of exited workers would otherwise count towards every
+        # scrape forever. A live worker that is only idle rewrites its file
+        # on the next flush.
+        max_age = getattr(settings, 'METRICS_SNAPSHOT_MAX_AGE', 0)
+        if not max_age:
+            return
+        cutoff = time.time() - max_age
+        own_path = self._snapshot_path(self._pid)
+        for path in self._snapshot_paths():
+            try:
+                if path != own_path and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                # Pruned by another worker starting at the same time
+                pass
+
+    def _update(self, metric, key, update):
+        with self._lock:
+            self._check_pid()
+            values_key = (metric.name, key)
+            self._values[values_key] = update(self._values.get(values_key, metric.empty()))
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+    def flush(self):
+        """
+        Writes this process's values to its snapshot file. The file is
+        replaced atomically so a concurrent scrape never reads half of it.
+        """
+        if not self.directory:
+            return
+        with self._lock:
+            self._check_pid()
+            entries = [[name, list(key), value] for (name, key), value in self._values.items()]
+            self._last_flush = time.monotonic()
+
+        path = self._snapshot_path(self._pid)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(f'{path}.tmp', 'w') as file:
+                json.dump(entries, file)
+            os.replace(f'{path}.tmp', path)
+        except OSError:
+            logger.warning("Could not write metrics snapshot %s", path, exc_info=True)
+
+    def flush_at_exit(self):
+        if not self._flush_at_exit:
+            atexit.register(self.flush)
+            self._flush_at_exit = True
+
+    def flush_if_due(self, interval: float):
+        if time.monotonic() - self._last_flush >= interval:
+            self.flush()
+
+    def _read(self, path: str) -> dict:
+        try:
+            with open(path) as file:
+                entries = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        return {
+            (name, tuple(key)): value for name, key, value in entries
+            if name in self.metrics
+            and len(key) == len(self.metrics[name].label_names)
+            and self.metrics[name].accepts(value)
+        }
+
+    def collect(self) -> dict:
+        """
+        Returns every value summed across this process and the snapshot
+        files of all other processes.
+        """
+        with self._lock:
+            self._check_pid()
+            sources = [dict(self._values)]
+
+        if self.directory:
+            own_path = self._snapshot_path(self._pid)
+            for path in self._snapshot_paths():
+                if path != own_path:
+                    sources.append(self._read(path))
+
+        totals = {}
+        for values in sources:
+            for values_key, value in values.items():
+                metric = self.metrics[values_key[0]]
+                totals[values_key] = metric.merge(totals[values_key], value) if values_key in totals else value
+        return totals
+
+    def render(self) -> str:
+        """
+        Renders the collected values in the Prometheus text exposition format.
+        """
+        totals = self.collect()
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            label_names = metric.label_names
+            for (name, key), value in sorted(item for item in totals.items() if item[0][0] == metric.name):
+                for sample_name, sample_key, sample_value in metric.samples(key, value):
+                    names = (*label_names, 'le') if sample_name.endswith('_bucket') else label_names
+                    lines.append(f'{sample_name}{_format_labels(names, sample_key)} {_format_value(sample_value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+registry = MetricsRegistry()
+
+REQUEST_DURATION = registry.histogram(
+    'lifeapi_request_duration_seconds',
+    'Time to produce a response, by view and action.',
+    ('view', 'action')
+)
+REQUESTS = registry.counter(
+    'lifeapi_requests_total',
+    'Responses returned, by view, action, method and status code.',
+    ('view', 'action', 'method', 'status')
+)
+REQUEST_QUERIES = registry.histogram(
+    'lifeapi_request_db_queries',
+    'Database queries run per request, by view and action.',
+    ('view', 'action'),
+    buckets=QUERY_COUNT_BUCKETS
+)
+TERM_FREQUENCY_UPSERT_ROWS = registry.counter(
+    'lifeapi_term_frequency_upsert_rows_total',
+    'Category term frequency rows inserted or updated.'
+)
+TERM_FREQUENCY_UPSERT_STATEMENTS = registry.counter(
+    'lifeapi_term_frequency_upsert_statements_total',
+    'Category term frequency upsert statements run.'
+)
+CATEGORY_SUGGESTIONS = registry.counter(
+    'lifeapi_category_suggestions_total',
+    'Descriptions scored for a category suggestion, by whether one was found (hit or miss).',
+    ('result',)
+)
+PAGINATED_REQUESTS = registry.counter(
+    'lifeapi_paginated_requests_total',
+    'List requests by view and pagination mode: page, cursor, get_all or stream.',
+    ('view', 'mode')
+)
@@ -0,0 +1,183 @@
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from api import metrics
+
+logger = logging.getLogger('api.sql')
+
+# Runs of placeholders, as in IN (%s, %s, ...) or multi-row VALUES, collapse to one
+PLACEHOLDER_RUN_PATTERN = re.compile(r'%s(?:\s*,\s*%s)+')
+VALUES_RUN_PATTERN = re.compile(r'(\([^()]*\))(?:\s*,\s*\1)+')
+# Characters of each statement kept in log lines
+LOGGED_SQL_LENGTH = 200
+
+
+def query_fingerprint(sql: str) -> str:
+    """
+    Normalises a parametrised statement so repeats of the same query with
+    different parameters or list lengths compare equal.
+    """
+    sql = PLACEHOLDER_RUN_PATTERN.sub('%s, ...', sql)
+    sql = VALUES_RUN_PATTERN.sub(r'\1, ...', sql)
+    return ' '.join(sql.split())
+
+
+class QueryProfile:
+    """
+    Execute wrapper that records the fingerprint and duration of every
+    statement run while it is installed.
+    """
+    def __init__(self):
+        self.durations = Counter()
+        self.counts = Counter()
+        self.slowest = (0.0, '')
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            fingerprint = query_fingerprint(sql)
+            self.counts[fingerprint] += 1
+            self.durations[fingerprint] += duration
+            if duration > self.slowest[0]:
+                self.slowest = (duration, fingerprint)
+
+    @property
+    def total_queries(self) -> int:
+        return sum(self.counts.values())
+
+    @property
+    def total_ms(self) -> float:
+        return sum(self.durations.values())
+
+
+class SQLProfilingMiddleware:
+    """
+    Counts the queries and database time of each request. Adds a
+    Server-Timing header, logs one JSON line to the `api.sql` logger and
+    raises the level to WARNING for requests over the SQL_PROFILING_*
+    thresholds. Queries run while a streaming response is consumed are not
+    included.
+
+    Enabled with SQL_PROFILING; otherwise Django drops the middleware at
+    startup, so it costs nothing.
+    """
+    def __init__(self, get_response):
+        if not getattr(settings, 'SQL_PROFILING', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.max_queries = settings.SQL_PROFILING_MAX_QUERIES
+        self.max_db_ms = settings.SQL_PROFILING_MAX_DB_MS
+        self.max_query_ms = settings.SQL_PROFILING_MAX_QUERY_MS
+        self.max_duplicates = settings.SQL_PROFILING_MAX_DUPLICATES
+
+    def __call__(self, request):
+        profile = QueryProfile()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(profile))
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - start) * 1000
+
+        db_ms = profile.total_ms
+        response['Server-Timing'] = (
+            f'db;dur={db_ms:.1f};desc="{profile.total_queries} queries", '
+            f'app;dur={max(total_ms - db_ms, 0):.1f}'
+        )
+
+        duplicates = [
+            (fingerprint, count) for fingerprint, count in profile.counts.most_common(3)
+            if count > 1
+        ]
+        flags = []
+        if profile.total_queries > self.max_queries:
+            flags.append('queries')
+        if db_ms > self.max_db_ms:
+            flags.append('db_time')
+        if profile.slowest[0] > self.max_query_ms:
+            flags.append('slow_query')
+        if duplicates and duplicates[0][1] > self.max_duplicates:
+            flags.append('duplicates')
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': profile.total_queries,
+            'db_ms': round(db_ms, 1),
+            'total_ms': round(total_ms, 1),
+            'duplicates': [
+                {'count': count, 'sql': fingerprint[:LOGGED_SQL_LENGTH]} for fingerprint, count in duplicates
+            ],
+            'slowest': {'ms': round(profile.slowest[0], 1), 'sql': profile.slowest[1][:LOGGED_SQL_LENGTH]},
+            'flags': flags,
+        }
+        logger.log(logging.WARNING if flags else logging.INFO, json.dumps(record))
+        return response
+
+
+def resolve_view_action(request) -> tuple[str, str]:
+    """
+    Returns the view class name and DRF action that served a request, e.g.
+    ('BudgetPurchaseViewSet', 'list'). Views without actions use the
+    lowercased method, and unmatched paths use a single 'unmatched' view so
+    unknown URLs cannot grow the number of series.
+    """
+    method = request.method.lower()
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched', method
+
+    view_class = getattr(match.func, 'cls', None) or getattr(match.func, 'view_class', None)
+    actions = getattr(match.func, 'actions', None) or {}
+    return view_class.__name__ if view_class else match.view_name, actions.get(method, method)
+
+
+class MetricsMiddleware:
+    """
+    Records the latency, status and query count of every request against
+    the view and action that served it (see api.metrics). With METRICS_DIR
+    set the values are written out at most every METRICS_FLUSH_INTERVAL
+    seconds and when the worker exits.
+
+    Disabled with METRICS_ENABLED=False.
+    """
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.flush_interval = settings.METRICS_FLUSH_INTERVAL
+        metrics.registry.flush_at_exit()
+
+    def __call__(self, request):
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(count))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        view, action = resolve_view_action(request)
+        metrics.REQUEST_DURATION.observe(duration, view=view, action=action)
+        metrics.REQUEST_QUERIES.observe(queries, view=view, action=action)
+        metrics.REQUESTS.inc(view=view, action=action, method=request.method, status=response.status_code)
+        metrics.registry.flush_if_due(self.flush_interval)
+        return response
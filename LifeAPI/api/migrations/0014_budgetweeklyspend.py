@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-18 18:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_budgetbulkimportmapping'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BudgetWeeklySpend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('iso_year', models.IntegerField()),
+                ('iso_week', models.IntegerField()),
+                ('week_start', models.DateField()),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='api.budgetcategory')),
+                ('user_module', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.usermodule')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user_module', 'iso_year', 'iso_week', 'category'], name='idx_weeklyspend_key'), models.Index(fields=['user_module', 'week_start'], name='idx_weeklyspend_weekstart')],
+            },
+        ),
+    ]
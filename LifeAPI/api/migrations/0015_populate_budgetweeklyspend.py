@@ -0,0 +1,49 @@
+# Generated by Django 5.1.7 on 2026-10-18 18:33
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import migrations
+
+
+def populate_weekly_spend(apps, schema_editor):
+    BudgetPurchase = apps.get_model('api', 'BudgetPurchase')
+    BudgetWeeklySpend = apps.get_model('api', 'BudgetWeeklySpend')
+
+    totals = defaultdict(Decimal)
+    purchases = BudgetPurchase.objects.order_by().values_list(
+        'user_module_id', 'purchase_date', 'category_id', 'amount'
+    )
+    for user_module_id, purchase_date, category_id, amount in purchases.iterator(chunk_size=2000):
+        week_start = purchase_date - timedelta(days=purchase_date.weekday())
+        totals[(user_module_id, week_start, category_id)] += amount
+
+    rows = []
+    for (user_module_id, week_start, category_id), total in totals.items():
+        iso_year, iso_week, _ = week_start.isocalendar()
+        rows.append(BudgetWeeklySpend(
+            user_module_id=user_module_id,
+            iso_year=iso_year,
+            iso_week=iso_week,
+            week_start=week_start,
+            category_id=category_id,
+            total=total
+        ))
+
+    BudgetWeeklySpend.objects.bulk_create(rows, batch_size=1000)
+
+
+def clear_weekly_spend(apps, schema_editor):
+    apps.get_model('api', 'BudgetWeeklySpend').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_budgetweeklyspend'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_weekly_spend, reverse_code=clear_weekly_spend),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-18 18:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_populate_budgetweeklyspend'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='budgetpurchase',
+            index=models.Index(fields=['user_module', '-purchase_date', '-modified_at'], include=('amount', 'category'), name='idx_purchase_module_date'),
+        ),
+    ]
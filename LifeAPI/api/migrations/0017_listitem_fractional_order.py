@@ -0,0 +1,44 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:05
+
+from django.db import migrations, models
+
+RANK_STEP = 1024.0
+
+
+def _respace(apps, step):
+    ListItem = apps.get_model('api', 'ListItem')
+
+    module_ids = ListItem.objects.order_by().values_list('user_module_id', flat=True).distinct()
+    for module_id in list(module_ids):
+        items = list(
+            ListItem.objects.filter(user_module_id=module_id)
+            .order_by('order', '-modified_at', 'id')
+            .only('id', 'order')
+        )
+        for position, item in enumerate(items, start=1):
+            item.order = position * step
+        ListItem.objects.bulk_update(items, ['order'], batch_size=1000)
+
+
+def spread_orders(apps, schema_editor):
+    _respace(apps, RANK_STEP)
+
+
+def compact_orders(apps, schema_editor):
+    _respace(apps, 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_budgetpurchase_module_date_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='listitem',
+            name='order',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(spread_orders, compact_orders),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:40
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def populate_fingerprints(apps, schema_editor):
+    BudgetPurchase = apps.get_model('api', 'BudgetPurchase')
+
+    batch = []
+    purchases = BudgetPurchase.objects.order_by().only('id', 'purchase_date', 'amount', 'description')
+    for purchase in purchases.iterator(chunk_size=2000):
+        # Same key as api.models.purchase_fingerprint
+        normalised = ' '.join((purchase.description or '').lower().split())
+        key = f"{purchase.purchase_date.isoformat()}|{purchase.amount:.2f}|{normalised}"
+        purchase.fingerprint = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+        batch.append(purchase)
+
+        if len(batch) >= 2000:
+            BudgetPurchase.objects.bulk_update(batch, ['fingerprint'])
+            batch = []
+
+    if batch:
+        BudgetPurchase.objects.bulk_update(batch, ['fingerprint'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_listitem_fractional_order'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='budgetpurchase',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.RunPython(populate_fingerprints, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='budgetpurchase',
+            index=models.Index(fields=['user_module', 'fingerprint'], name='idx_purchase_fingerprint'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.7 on 2026-10-18 20:12
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_keys(apps, schema_editor):
+    # Rows used to be additive, so a key may have several; keep one holding their sum
+    BudgetWeeklySpend = apps.get_model('api', 'BudgetWeeklySpend')
+    duplicates = list(
+        BudgetWeeklySpend.objects
+        .values('user_module_id', 'iso_year', 'iso_week', 'category_id')
+        .annotate(rows=Count('id'), key_total=Sum('total'), first_id=Min('id'))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for key in duplicates:
+        BudgetWeeklySpend.objects.filter(id=key['first_id']).update(total=key['key_total'])
+        BudgetWeeklySpend.objects.filter(
+            user_module_id=key['user_module_id'],
+            iso_year=key['iso_year'],
+            iso_week=key['iso_week'],
+            category_id=key['category_id']
+        ).exclude(id=key['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_budgetpurchase_description_trigram'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_keys, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='budgetweeklyspend',
+            name='idx_weeklyspend_key',
+        ),
+        migrations.AddConstraint(
+            model_name='budgetweeklyspend',
+            constraint=models.UniqueConstraint(fields=('user_module', 'iso_year', 'iso_week', 'category'), name='uniq_weeklyspend_key', nulls_distinct=False),
+        ),
+    ]
@@ -1,5 +1,9 @@
+import hashlib
+
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
 
 class UserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
@@ -90,7 +94,8 @@ class ListFieldOption(models.Model):
 class ListItem(models.Model):
     user_module = models.ForeignKey(UserModule, on_delete=models.CASCADE)
     is_completed = models.BooleanField(default=False)
-    order = models.IntegerField(default=0)
+    # Fractional rank key, so moving an item only rewrites that item (see api.services.ordering)
+    order = models.FloatField(default=0)
     modified_at = models.DateTimeField(auto_now=True)
     fields = models.JSONField(default=list)
 
@@ -118,6 +123,18 @@ class BudgetCategory(models.Model):
     def __str__(self):
         return self.name
 
+def purchase_fingerprint(purchase_date, amount, description) -> str:
+    """
+    Hash of (purchase_date, amount, normalised description) used to spot the
+    same bank transaction imported twice. Case and whitespace in the
+    description are ignored.
+    """
+    purchase_date = BudgetPurchase._meta.get_field('purchase_date').to_python(purchase_date)
+    amount = BudgetPurchase._meta.get_field('amount').to_python(amount)
+    normalised = ' '.join((description or '').lower().split())
+    key = f"{purchase_date.isoformat()}|{amount:.2f}|{normalised}"
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
 class BudgetPurchase(models.Model):
     user_module = models.ForeignKey(UserModule, on_delete=models.CASCADE)
     purchase_date = models.DateField()
@@ -125,13 +142,89 @@ class BudgetPurchase(models.Model):
     description = models.TextField(null=True,blank=True)
     category = models.ForeignKey(BudgetCategory, on_delete=models.SET_NULL, null=True, blank=True)
     modified_at = models.DateTimeField(auto_now=True)
+    # See purchase_fingerprint. Not unique: identical purchases on the same day are legitimate
+    fingerprint = models.CharField(max_length=32, blank=True, default='')
 
     class Meta:
         ordering = ['-purchase_date', '-modified_at']
+        indexes = [
+            # Serves the purchase list ordering and date range reads as index-only scans
+            models.Index(
+                fields=['user_module', '-purchase_date', '-modified_at'],
+                include=['amount', 'category'],
+                name='idx_purchase_module_date',
+            ),
+            models.Index(fields=['user_module', 'fingerprint'], name='idx_purchase_fingerprint'),
+            # Serves description icontains/search filters, which compile to
+            # UPPER(description) LIKE UPPER('%term%'). PostgreSQL only, see migration 0019
+            GinIndex(OpClass(Upper('description'), name='gin_trgm_ops'), name='idx_purchase_desc_trgm'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # bulk_create bypasses save(), so bulk writers call refresh_fingerprint() themselves
+        if self.refresh_fingerprint():
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'fingerprint' not in update_fields:
+                kwargs['update_fields'] = [*update_fields, 'fingerprint']
+        super().save(*args, **kwargs)
+
+    def refresh_fingerprint(self) -> bool:
+        """
+        Recomputes the fingerprint from the current values, unless they are deferred.
+        Returns whether it was recomputed.
+        """
+        if {'purchase_date', 'amount', 'description'} & self.get_deferred_fields():
+            return False
+        self.fingerprint = purchase_fingerprint(self.purchase_date, self.amount, self.description)
+        return True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored values so rollups can reverse them on update
+        instance._loaded_spend = instance.spend_key()
+        return instance
+
+    def spend_key(self):
+        """
+        Returns (user_module_id, purchase_date, category_id, amount) as stored
+        in the database, or None if any of those fields were deferred.
+        """
+        if {'purchase_date', 'amount', 'category_id', 'user_module_id'} & self.get_deferred_fields():
+            return None
+        return (self.user_module_id, self.purchase_date, self.category_id, self.amount)
 
     def __str__(self):
         return f"{self.purchase_date} - {self.description or ''}"
 
+class BudgetWeeklySpend(models.Model):
+    """
+    Running purchase totals per ISO week and category, maintained as purchases change.
+    There is one row per key, uncategorised spend included, so changes are
+    applied as upserts against the unique key.
+    """
+    user_module = models.ForeignKey(UserModule, on_delete=models.CASCADE)
+    iso_year = models.IntegerField()
+    iso_week = models.IntegerField()
+    week_start = models.DateField()
+    category = models.ForeignKey(BudgetCategory, on_delete=models.SET_NULL, null=True, blank=True)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user_module', 'week_start'], name='idx_weeklyspend_weekstart'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user_module', 'iso_year', 'iso_week', 'category'],
+                name='uniq_weeklyspend_key',
+                nulls_distinct=False
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.iso_year}-W{self.iso_week:02d} - ${self.total}"
+
 class Period(models.Model):
     name = models.CharField(max_length=255)
 
@@ -1,10 +1,125 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from api import metrics
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination that seeks past the last row of the previous page
+    using every column of the view's `keyset_ordering`, so pages never
+    need a COUNT(*) or an OFFSET.
+    """
+    page_size = 20
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering, page_size=None):
+        self.ordering = list(ordering)
+        if page_size:
+            self.page_size = page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.model = queryset.model
+
+        queryset = queryset.order_by(*self.ordering)
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            queryset = queryset.filter(self._seek_filter(self._decode_cursor(encoded)))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.get_cursor(self.page[-1]))
+
+    def get_cursor(self, obj):
+        """
+        Returns the encoded cursor for the page that starts after `obj`.
+        """
+        return self._encode_cursor([getattr(obj, self._field_name(field)) for field in self.ordering])
+
+    def _field_name(self, field):
+        return field.lstrip('-')
+
+    def _seek_filter(self, values):
+        # (a, b, c) after (x, y, z) => a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            name = self._field_name(field)
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            step = Q(**{self._field_name(prev): values[i] for i, prev in enumerate(self.ordering[:index])})
+            condition |= step & Q(**{f'{name}__{lookup}': values[index]})
+        return condition
+
+    def _encode_value(self, value):
+        # Full precision isoformat; DjangoJSONEncoder truncates microseconds
+        if isinstance(value, (date, datetime)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        raise TypeError(f'Cannot encode {type(value).__name__} in a cursor')
+
+    def _encode_cursor(self, values):
+        return b64encode(json.dumps(values, default=self._encode_value).encode()).decode()
+
+    def _decode_cursor(self, encoded):
+        try:
+            raw = json.loads(b64decode(encoded.encode(), validate=True))
+            if not isinstance(raw, list) or len(raw) != len(self.ordering):
+                raise ValueError
+            return [
+                self.model._meta.get_field(self._field_name(field)).to_python(value)
+                for field, value in zip(self.ordering, raw)
+            ]
+        except (BinasciiError, ValueError, TypeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
 
 class Unpaginatable(PageNumberPagination):
     page_size = 20
-    
+    keyset_paginator = None
+
     def paginate_queryset(self, queryset, request, view=None):
+        view_name = type(view).__name__ if view is not None else 'none'
         if request.query_params.get('get_all', False) == 'true':
+            metrics.PAGINATED_REQUESTS.inc(view=view_name, mode='get_all')
             return None
 
-        return super().paginate_queryset(queryset, request, view=view)
\ No newline at end of file
+        # Opt-in keyset pagination for views that declare a keyset ordering
+        keyset_ordering = getattr(view, 'keyset_ordering', None)
+        if keyset_ordering and request.query_params.get('pagination') == 'cursor':
+            metrics.PAGINATED_REQUESTS.inc(view=view_name, mode='cursor')
+            self.keyset_paginator = KeysetPagination(keyset_ordering, page_size=self.page_size)
+            return self.keyset_paginator.paginate_queryset(queryset, request, view=view)
+
+        metrics.PAGINATED_REQUESTS.inc(view=view_name, mode='page')
+        return super().paginate_queryset(queryset, request, view=view)
+
+    def get_paginated_response(self, data):
+        if self.keyset_paginator is not None:
+            return self.keyset_paginator.get_paginated_response(data)
+
+        return super().get_paginated_response(data)
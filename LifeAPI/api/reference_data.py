@@ -0,0 +1,62 @@
+import logging
+
+from django.core.cache import cache
+from django.db import DatabaseError
+
+from api.cache import get_version, bump_version
+from api.models import BudgetTermType
+
+logger = logging.getLogger(__name__)
+
+
+def _load_term_types() -> list[BudgetTermType]:
+    return list(BudgetTermType.objects.order_by('word_length'))
+
+# Loaders for each reference data set held in the shared cache
+REFERENCE_DATA_LOADERS = {
+    'term-types': _load_term_types,
+}
+
+# Process-local copies keyed by name: (version, value)
+_local_copies = {}
+
+def _scope(name: str) -> str:
+    return f'reference:{name}'
+
+def get_reference_data(name: str):
+    """
+    Returns a reference data set, loading it into the shared cache under a
+    versioned key on first use. A process-local copy is reused until the
+    version changes, so repeat reads cost a single cache lookup.
+    """
+    version = get_version(_scope(name))
+
+    local = _local_copies.get(name)
+    if local and local[0] == version:
+        return local[1]
+
+    key = f'{_scope(name)}:{version}'
+    value = cache.get(key)
+    if value is None:
+        value = REFERENCE_DATA_LOADERS[name]()
+        cache.set(key, value, timeout=None)
+
+    _local_copies[name] = (version, value)
+    return value
+
+def get_reference_data_version(name: str) -> str:
+    return get_version(_scope(name))
+
+def invalidate_reference_data(name: str):
+    bump_version(_scope(name))
+    _local_copies.pop(name, None)
+
+def warm_reference_data():
+    """
+    Loads every reference data set so the first request after boot does not pay for it.
+    """
+    for name in REFERENCE_DATA_LOADERS:
+        try:
+            get_reference_data(name)
+        except DatabaseError:
+            logger.warning("Skipped warming reference data '%s': database unavailable", name)
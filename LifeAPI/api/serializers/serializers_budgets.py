@@ -4,6 +4,8 @@ from rest_framework import serializers
 
 from api.models import BudgetCategory, BudgetPurchase, BudgetCashFlow, BudgetBulkImportMapping
 from api.serializers.serializers_modules import UserModuleSerializer
+from api.services.budget_import import IMPORT_FORMATS
+from api.services.budget_purchases import DUPLICATE_MODES
 
 
 User = get_user_model()
@@ -65,16 +67,8 @@ class BudgetPurchaseSerializer(serializers.ModelSerializer):
         return attrs
 
     def create(self, validated_data):
-        user_module = self.context.get('user_module')
-        if isinstance(validated_data, list):
-            for item in validated_data:
-                item['user_module'] = user_module
-            return BudgetPurchase.objects.bulk_create(
-                [BudgetPurchase(**item) for item in validated_data]
-            )
-        else:
-            validated_data['user_module'] = user_module
-            return super().create(validated_data)
+        validated_data['user_module'] = self.context.get('user_module')
+        return super().create(validated_data)
 
 class BudgetBulkImportMappingSerializer(serializers.ModelSerializer):
     class Meta:
@@ -114,6 +108,22 @@ class BudgetBulkImportMappingSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class BudgetPurchaseImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    format = serializers.ChoiceField(choices=IMPORT_FORMATS, required=False, help_text='Detected from the file when omitted.')
+    mapping = serializers.IntegerField(required=False, help_text='Saved import mapping for CSV files. Defaults to the mapping whose headers match the file.')
+    invert_amounts = serializers.BooleanField(required=False, allow_null=True, help_text='Negate amounts. CSV files are inverted automatically when most amounts are negative.')
+    suggest_categories = serializers.BooleanField(required=False, allow_null=True, help_text='Suggest categories for rows without one. Defaults to true.')
+    duplicates = serializers.ChoiceField(choices=DUPLICATE_MODES, default='allow', help_text='How rows matching an existing purchase are handled.')
+
+
+class BudgetPurchaseImportResultSerializer(serializers.Serializer):
+    imported = serializers.IntegerField()
+    updated = serializers.IntegerField()
+    skipped = serializers.IntegerField()
+    categorised = serializers.IntegerField()
+
+
 class BudgetSerializer(UserModuleSerializer):
     categories = serializers.SerializerMethodField()
 
@@ -1,13 +1,57 @@
 from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
 from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
+from rest_framework.reverse import reverse
+from rest_framework.utils.urls import replace_query_param
 
 from api.models import FieldType, ListField, ListFieldOption, ListFieldRule, ListItem
+from api.pagination import KeysetPagination
 from api.serializers.serializers_modules import UserModuleSerializer
 from api.serializers.serializers_reference import FieldTypeRuleSerializer
 
 User = get_user_model()
 
+# Keyset ordering for list items; matches ListItem.Meta.ordering with id as a tiebreaker
+LIST_ITEM_ORDERING = ['order', '-modified_at', 'id']
+
+# Number of items embedded in list data responses
+LIST_ITEMS_LIMIT = 100
+
+def prefetch_list_fields(queryset):
+    """
+    Loads field types, rules and options alongside a ListField queryset.
+    """
+    return queryset.select_related('field_type').prefetch_related(
+        Prefetch('listfieldrule_set', queryset=ListFieldRule.objects.select_related('field_type_rule').order_by('id')),
+        Prefetch('listfieldoption_set', queryset=ListFieldOption.objects.order_by('id')),
+    )
+
+def prefetch_list_configuration(queryset):
+    """
+    Loads everything ListConfigurationSerializer reads alongside a UserModule
+    queryset, so serializing any number of lists costs a fixed number of queries.
+    """
+    return queryset.select_related('module').prefetch_related(
+        Prefetch('listfield_set', queryset=prefetch_list_fields(ListField.objects.order_by('order'))),
+    )
+
+def prefetch_list_data(queryset, limit=LIST_ITEMS_LIMIT):
+    """
+    Extends prefetch_list_configuration with the first `limit` items of each
+    list, plus one more so the serializer can tell whether a next page exists.
+    """
+    return prefetch_list_configuration(queryset).prefetch_related(
+        Prefetch(
+            'listitem_set',
+            queryset=ListItem.objects.order_by(*LIST_ITEM_ORDERING)[:limit + 1],
+            to_attr='prefetched_list_items'
+        ),
+    )
+
+def _is_prefetched(obj, related_name):
+    return related_name in getattr(obj, '_prefetched_objects_cache', {})
+
 class ListFieldOptionSerializer(serializers.ModelSerializer):
     class Meta:
         model = ListFieldOption
@@ -46,15 +90,13 @@ class ListFieldSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(ListFieldRuleSerializer(many=True))
     def get_rules(self, obj):
-        rules = ListFieldRule.objects.filter(list_field=obj)
-        return ListFieldRuleSerializer(rules, many=True).data
+        return ListFieldRuleSerializer(obj.listfieldrule_set.all(), many=True).data
 
     @extend_schema_field(ListFieldOptionSerializer(many=True))
     def get_options(self, obj):
         # Only return options if this is a dropdown field
         if obj.field_type.name == 'dropdown':
-            options = ListFieldOption.objects.filter(list_field=obj)
-            return ListFieldOptionSerializer(options, many=True).data
+            return ListFieldOptionSerializer(obj.listfieldoption_set.all(), many=True).data
         return []
 
 
@@ -66,7 +108,10 @@ class ListConfigurationSerializer(UserModuleSerializer):
 
     @extend_schema_field(ListFieldSerializer(many=True))
     def get_list_fields(self, obj):
-        list_fields = ListField.objects.filter(user_module=obj).order_by('order')
+        if _is_prefetched(obj, 'listfield_set'):
+            list_fields = obj.listfield_set.all()
+        else:
+            list_fields = ListField.objects.filter(user_module=obj).order_by('order')
         return ListFieldSerializer(list_fields, many=True).data
 
 
@@ -96,16 +141,73 @@ class ListItemSerializer(serializers.ModelSerializer):
         return value
 
 
+class ListItemBulkUpdateSerializer(ListItemSerializer):
+    id = serializers.IntegerField()
+    field_values = serializers.JSONField(source='fields', required=False)
+
+    class Meta(ListItemSerializer.Meta):
+        fields = ['id', 'is_completed', 'field_values']
+
+
+class ListItemCompletionSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    is_completed = serializers.BooleanField()
+
+
+class ListItemBulkSerializer(serializers.Serializer):
+    create = ListItemSerializer(many=True, required=False)
+    update = ListItemBulkUpdateSerializer(many=True, required=False)
+    delete = serializers.ListField(child=serializers.IntegerField(), required=False)
+    complete = ListItemCompletionSerializer(many=True, required=False)
+
+    def validate(self, attrs):
+        changed_ids = [item['id'] for item in attrs.get('update', [])] + [item['id'] for item in attrs.get('complete', [])]
+        if len(changed_ids) != len(set(changed_ids)):
+            raise serializers.ValidationError("Each item can only be updated or completed once per request")
+
+        if set(changed_ids) & set(attrs.get('delete', [])):
+            raise serializers.ValidationError("Items cannot be changed and deleted in the same request")
+
+        return attrs
+
+
+class ListItemBulkResultSerializer(serializers.Serializer):
+    created = ListItemSerializer(many=True)
+    updated = ListItemSerializer(many=True)
+    deleted = serializers.ListField(child=serializers.IntegerField())
+
+
 class ListDataSerializer(ListConfigurationSerializer):
     list_items = serializers.SerializerMethodField()
+    list_items_next = serializers.SerializerMethodField()
 
     class Meta(ListConfigurationSerializer.Meta):
-        fields = ListConfigurationSerializer.Meta.fields + ['list_items']
+        fields = ListConfigurationSerializer.Meta.fields + ['list_items', 'list_items_next']
+
+    def _get_items_window(self, obj):
+        limit = self.context.get('list_items_limit', LIST_ITEMS_LIMIT)
+        items = getattr(obj, 'prefetched_list_items', None)
+        if items is None:
+            items = list(ListItem.objects.filter(user_module=obj).order_by(*LIST_ITEM_ORDERING)[:limit + 1])
+        return items[:limit], len(items) > limit
 
     @extend_schema_field(ListItemSerializer(many=True))
     def get_list_items(self, obj):
-        list_items = ListItem.objects.filter(user_module=obj)
-        return ListItemSerializer(list_items, many=True).data
+        items, _ = self._get_items_window(obj)
+        return ListItemSerializer(items, many=True).data
+
+    @extend_schema_field(serializers.URLField(allow_null=True))
+    def get_list_items_next(self, obj):
+        """
+        Link to the items endpoint continuing after the embedded items, or None.
+        """
+        items, has_next = self._get_items_window(obj)
+        if not has_next:
+            return None
+
+        url = reverse('list-items-list', args=[obj.id], request=self.context.get('request'))
+        url = replace_query_param(url, 'pagination', 'cursor')
+        return replace_query_param(url, 'cursor', KeysetPagination(LIST_ITEM_ORDERING).get_cursor(items[-1]))
 
 class ListFieldReorderSerializer(serializers.Serializer):
     new_order = serializers.IntegerField(min_value=1)
\ No newline at end of file
@@ -1,89 +1,249 @@
-import re
-from collections import Counter
-from django.db import transaction
+import threading
+from collections import Counter, OrderedDict
+from collections.abc import Callable, Iterable
+from django.db import transaction, connection
+
+from api import metrics
+from api.cache import get_version, bump_version
+from api.reference_data import get_reference_data, get_reference_data_version
+from api.services.tokenizer import description_ngrams
 
 from api.models import (
+    BudgetCategory,
     BudgetCategoryTermFrequency,
     BudgetTermType,
     BudgetPurchase
 )
 
-# Cache term types by word length
-TERM_TYPE_CACHE = {}
-
 def get_all_term_types() -> list[BudgetTermType]:
-    global TERM_TYPE_CACHE
-    if not TERM_TYPE_CACHE:
-        TERM_TYPE_CACHE = {
-            t.word_length: t for t in BudgetTermType.objects.all()
-        }
-    return list(TERM_TYPE_CACHE.values())
-
-def tokenize(text: str) -> list[str]:
-    # Remove non-word characters
-    cleaned = re.sub(r"[^\w\s]", "", text.lower())
-    tokens = cleaned.split()
-    return [t for t in tokens if not any(char.isdigit() for char in t)]
-
-def get_ngrams(tokens: list[str], n: int) -> list[str]:
-    if len(tokens) < n:
-        return set()
-    return {" ".join(tokens[i:i+n]) for i in range(len(tokens) - n + 1)}
+    return get_reference_data('term-types')
+
+# Maximum number of rows sent in a single upsert statement
+UPSERT_CHUNK_SIZE = 500
+
+# Number of purchases fetched per round trip when rebuilding
+REBUILD_CHUNK_SIZE = 2000
+
+MIN_MATCH_RATIO = 0.3  # To be tuned over time
+
+# Number of per-budget category models held in memory
+CATEGORY_MODEL_CACHE_SIZE = 64
+
+# Compiled models keyed by user module id: (version, term → (category_ids, frequencies, weight))
+CATEGORY_MODEL_CACHE = OrderedDict()
+_category_model_lock = threading.Lock()
 
-@transaction.atomic
 def update_term_frequencies_from_purchase(purchase: BudgetPurchase):
-    if not purchase.description or not purchase.category:
-        return
-
-    tokens = tokenize(purchase.description)
-    category_id = purchase.category_id
-
-    for term_type in get_all_term_types():
-        n = term_type.word_length
-        terms = get_ngrams(tokens, n)
-        for term in terms:
-            _upsert_term_frequency(category_id, term, term_type.id)
-
-def _upsert_term_frequency(category_id: int, term: str, term_type_id: int):
-    obj, created = BudgetCategoryTermFrequency.objects.get_or_create(
-        category_id=category_id,
-        term=term,
-        term_type_id=term_type_id,
-        defaults={'frequency': 1}
+    update_term_frequencies_from_purchases([purchase])
+
+@transaction.atomic
+def update_term_frequencies_from_purchases(purchases: Iterable[BudgetPurchase]) -> int:
+    """
+    Collects the term deltas for all purchases and applies them in batches.
+    Returns the number of distinct term rows written.
+    """
+    purchases = list(purchases)
+    deltas = collect_term_frequency_deltas(
+        (purchase.description, purchase.category_id) for purchase in purchases
+    )
+    written = apply_term_frequency_deltas(deltas)
+
+    if written:
+        for user_module_id in {purchase.user_module_id for purchase in purchases}:
+            invalidate_category_model(user_module_id)
+
+    return written
+
+def collect_term_frequency_deltas(rows: Iterable[tuple[str | None, int | None]]) -> Counter:
+    """
+    Builds a Counter keyed by (category_id, term, term_type_id) from
+    (description, category_id) pairs. Each term counts once per purchase.
+    """
+    term_types = get_all_term_types()
+    word_lengths = tuple(term_type.word_length for term_type in term_types)
+    deltas = Counter()
+
+    for description, category_id in rows:
+        if not description or not category_id:
+            continue
+
+        for term_type, terms in zip(term_types, description_ngrams(description, word_lengths)):
+            for term in terms:
+                deltas[(category_id, term, term_type.id)] += 1
+
+    return deltas
+
+def apply_term_frequency_deltas(deltas: Counter, chunk_size: int = UPSERT_CHUNK_SIZE) -> int:
+    """
+    Adds the deltas to the stored frequencies using one
+    INSERT ... ON CONFLICT DO UPDATE statement per chunk. Rows are written
+    in key order, so concurrent writers lock shared rows in the same order
+    and cannot deadlock.
+    """
+    if not deltas:
+        return 0
+
+    table = BudgetCategoryTermFrequency._meta.db_table
+    items = sorted(deltas.items())
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(items), chunk_size):
+            chunk = items[start:start + chunk_size]
+            values_sql = ", ".join(["(%s, %s, %s, %s)"] * len(chunk))
+            params = []
+            for (category_id, term, term_type_id), frequency in chunk:
+                params.extend([category_id, term, term_type_id, frequency])
+
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (category_id, term, term_type_id, frequency)
+                VALUES {values_sql}
+                ON CONFLICT (category_id, term, term_type_id)
+                DO UPDATE SET frequency = {table}.frequency + EXCLUDED.frequency
+                """,
+                params
+            )
+            metrics.TERM_FREQUENCY_UPSERT_STATEMENTS.inc()
+
+    metrics.TERM_FREQUENCY_UPSERT_ROWS.inc(len(items))
+    return len(items)
+
+def rebuild_term_frequencies(
+    user_module,
+    chunk_size: int = REBUILD_CHUNK_SIZE,
+    progress: Callable[[int], None] | None = None
+) -> int:
+    """
+    Recomputes the term frequency table for a budget from its purchases.
+    Purchases are streamed in chunks and counted in memory, then the old
+    rows are swapped for the new ones in a single transaction.
+    `progress` is called with the running purchase count after each chunk.
+    Returns the number of purchases processed.
+    """
+    purchases = (
+        BudgetPurchase.objects
+        .filter(user_module=user_module, category__isnull=False, description__isnull=False)
+        .exclude(description='')
+        .order_by()
+        .values_list('description', 'category_id')
+        .iterator(chunk_size=chunk_size)
     )
-    if not created:
-        obj.frequency += 1
-        obj.save()
+
+    processed = 0
+
+    def counted(rows):
+        nonlocal processed
+        for row in rows:
+            processed += 1
+            if progress and processed % chunk_size == 0:
+                progress(processed)
+            yield row
+
+    deltas = collect_term_frequency_deltas(counted(purchases))
+
+    with transaction.atomic():
+        category_ids = BudgetCategory.objects.filter(user_module=user_module).values('id')
+        BudgetCategoryTermFrequency.objects.filter(category_id__in=category_ids).delete()
+        apply_term_frequency_deltas(deltas)
+        invalidate_category_model(user_module.id)
+
+    if progress and processed % chunk_size:
+        progress(processed)
+
+    return processed
+
+def _category_model_scope(user_module_id: int) -> str:
+    return f'category-model:{user_module_id}'
+
+def get_category_model(user_module_id: int) -> dict[str, tuple[tuple[int, ...], tuple[int, ...], int]]:
+    """
+    Returns the compiled term → (category_ids, frequencies, weight) map for a budget.
+    Models are held in a per-process LRU and rebuilt when their version changes.
+    Term type weights are baked in, so their version is part of the model's.
+    """
+    version = (
+        get_version(_category_model_scope(user_module_id)),
+        get_reference_data_version('term-types')
+    )
+
+    with _category_model_lock:
+        entry = CATEGORY_MODEL_CACHE.get(user_module_id)
+        if entry and entry[0] == version:
+            CATEGORY_MODEL_CACHE.move_to_end(user_module_id)
+            return entry[1]
+
+    model = _build_category_model(user_module_id)
+
+    with _category_model_lock:
+        CATEGORY_MODEL_CACHE[user_module_id] = (version, model)
+        CATEGORY_MODEL_CACHE.move_to_end(user_module_id)
+        while len(CATEGORY_MODEL_CACHE) > CATEGORY_MODEL_CACHE_SIZE:
+            CATEGORY_MODEL_CACHE.popitem(last=False)
+
+    return model
+
+def _build_category_model(user_module_id: int) -> dict:
+    entries = {}
+    rows = BudgetCategoryTermFrequency.objects.filter(
+        category__user_module_id=user_module_id
+    ).values_list('term', 'category_id', 'frequency', 'term_type__weight')
+
+    for term, category_id, frequency, weight in rows:
+        category_ids, frequencies, _ = entries.setdefault(term, ([], [], weight))
+        category_ids.append(category_id)
+        frequencies.append(frequency)
+
+    return {
+        term: (tuple(category_ids), tuple(frequencies), weight)
+        for term, (category_ids, frequencies, weight) in entries.items()
+    }
+
+def invalidate_category_model(user_module_id: int):
+    """
+    Drops the compiled model for a budget in every process sharing the cache.
+    The version is bumped again on commit so a model rebuilt from
+    uncommitted data by another process is not kept.
+    """
+    def bump():
+        bump_version(_category_model_scope(user_module_id))
+        with _category_model_lock:
+            CATEGORY_MODEL_CACHE.pop(user_module_id, None)
+
+    bump()
+    transaction.on_commit(bump)
 
 def suggest_category_for_description(description: str, user_module) -> int | None:
-    tokens = tokenize(description)
-    terms = [t for term_type in get_all_term_types() for t in get_ngrams(tokens, term_type.word_length)]
+    return suggest_categories_for_descriptions([description], user_module)[0]
 
-    # Query all matches for terms in this user module
-    matches = BudgetCategoryTermFrequency.objects.filter(
-        category__user_module=user_module,
-        term__in=terms
-    ).select_related('category', 'term_type')
+def suggest_categories_for_descriptions(descriptions: list[str], user_module) -> list[int | None]:
+    """
+    Suggests a category for each description by scoring its n-grams
+    against the budget's compiled category model.
+    """
+    word_lengths = tuple(term_type.word_length for term_type in get_all_term_types())
+    description_terms = [
+        [term for terms in description_ngrams(description, word_lengths) for term in terms]
+        for description in descriptions
+    ]
 
-    if not matches:
-        return None
+    model = get_category_model(user_module.id)
+
+    suggestions = [_score_terms(terms, model) for terms in description_terms]
+    hits = sum(1 for suggestion in suggestions if suggestion is not None)
+    if hits:
+        metrics.CATEGORY_SUGGESTIONS.inc(hits, result='hit')
+    if len(suggestions) > hits:
+        metrics.CATEGORY_SUGGESTIONS.inc(len(suggestions) - hits, result='miss')
+    return suggestions
 
-    # Map term → list of (category_id, frequency, weight)
-    term_to_categories = {}
-    for m in matches:
-        if m.term not in term_to_categories:
-            term_to_categories[m.term] = []
-        term_to_categories[m.term].append({
-            'category_id': m.category_id,
-            'frequency': m.frequency,
-            'weight': m.term_type.weight
-        })
+def _score_terms(terms: list[str], model: dict) -> int | None:
+    matched = {term: model[term] for term in terms if term in model}
+    if not matched:
+        return None
 
     # Check if there are enough matches to continue
     total_terms = len(terms)
-    matched_terms = len(term_to_categories)
-
-    MIN_MATCH_RATIO = 0.3  # To be tuned over time
+    matched_terms = len(matched)
 
     if total_terms == 0 or matched_terms / total_terms < MIN_MATCH_RATIO:
         return None
@@ -91,20 +251,20 @@ def suggest_category_for_description(description: str, user_module) -> int | Non
     category_scores = {}
 
     # For each term, score all associated categories
-    for term, entries in term_to_categories.items():
-        num_categories = len(entries)
+    for term, (category_ids, frequencies, weight) in matched.items():
+        num_categories = len(category_ids)
         term_score = 1 / (num_categories * num_categories)
+        weighted_score = weight * term_score
+
+        # Discard low scoring terms
+        if weighted_score <= 0.1:
+            continue
 
-        for entry in entries:
-            category_id = entry['category_id']
-            weighted_score = entry['weight'] * term_score
-            # print(f"{term},{category_id},{weighted_score},{term_score}")
-            # Discard low scoring terms
-            if weighted_score > 0.1:
-                category_scores[category_id] = category_scores.get(category_id, 0) + weighted_score
+        for category_id in category_ids:
+            category_scores[category_id] = category_scores.get(category_id, 0) + weighted_score
 
     if not category_scores:
         return None
 
     best_category_id, best_score = max(category_scores.items(), key=lambda item: item[1])
-    return best_category_id
\ No newline at end of file
+    return best_category_id
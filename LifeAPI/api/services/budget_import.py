@@ -0,0 +1,328 @@
+import csv
+import io
+import re
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from itertools import chain, islice
+from typing import NamedTuple
+
+from django.db import transaction
+
+from api.models import BudgetCategory, BudgetPurchase
+from api.services.budget_analysis import (
+    apply_term_frequency_deltas,
+    collect_term_frequency_deltas,
+    invalidate_category_model,
+    suggest_categories_for_descriptions
+)
+from api.services.budget_purchases import save_purchase_batch
+from api.services.budget_summary import invalidate_purchase_years
+
+# Number of statement rows parsed, categorised and inserted at a time
+IMPORT_CHUNK_SIZE = 500
+
+IMPORT_FORMATS = ('csv', 'ofx')
+
+# Mapping targets that must appear exactly once in a CSV mapping
+REQUIRED_IMPORT_FIELDS = ('purchase_date', 'amount', 'description')
+
+# Bytes read to detect the format and CSV dialect
+SNIFF_SIZE = 4096
+
+
+class InvalidStatement(ValueError):
+    """
+    Raised when an uploaded statement cannot be imported. `row` is the
+    1-based line or transaction number at fault, when there is one.
+    """
+    def __init__(self, message: str, row: int | None = None):
+        self.row = row
+        super().__init__(f"Row {row}: {message}" if row else message)
+
+
+class StatementRow(NamedTuple):
+    row: int
+    purchase_date: date
+    amount: Decimal
+    description: str
+    category_name: str | None = None
+
+
+MONTH_SHORTS = ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+
+# Same formats the purchase import screen accepts, in the same priority
+DATE_FORMATS = [
+    (re.compile(r'^(\d{4})[-/](\d{1,2})[-/](\d{1,2})$'), ('year', 'month', 'day')),
+    (re.compile(r'^(\d{1,2})[/-](\d{1,2})[/-](\d{4})$'), ('day', 'month', 'year')),
+    (re.compile(r'^(\d{1,2})[/-](\d{1,2})[/-](\d{2})$'), ('day', 'month', 'year_short')),
+    (re.compile(r'^(\d{1,2})[ -](\w{3})[ -](\d{2})$'), ('day', 'month_short', 'year_short')),
+    (re.compile(r'^(\d{1,2})[ -](\w{3})[ -](\d{4})$'), ('day', 'month_short', 'year')),
+    (re.compile(r'^(\w{3})[ -](\d{1,2})[ -](\d{2})$'), ('month_short', 'day', 'year_short')),
+    (re.compile(r'^(\w{3})[ -](\d{1,2})[ -](\d{4})$'), ('month_short', 'day', 'year')),
+]
+
+def parse_flexible_date(value: str) -> date | None:
+    value = value.strip().lower()
+    for pattern, order in DATE_FORMATS:
+        match = pattern.match(value)
+        if not match:
+            continue
+
+        parts = {}
+        for part, raw in zip(order, match.groups()):
+            if part == 'month_short':
+                if raw[:3] not in MONTH_SHORTS:
+                    break
+                parts['month'] = MONTH_SHORTS.index(raw[:3]) + 1
+            elif part == 'year_short':
+                year = int(raw)
+                parts['year'] = 2000 + year if year < 50 else 1900 + year
+            else:
+                parts[part] = int(raw)
+        else:
+            try:
+                return date(parts['year'], parts['month'], parts['day'])
+            except ValueError:
+                continue
+
+    return None
+
+def parse_amount(value: str) -> Decimal | None:
+    cleaned = re.sub(r'[$,\s]', '', value).lstrip('+')
+    if not cleaned:
+        return Decimal('0.00')
+    try:
+        return Decimal(cleaned).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        return None
+
+def _is_number(value: str) -> bool:
+    return parse_amount(value) is not None and bool(re.sub(r'[$,\s]', '', value))
+
+
+def detect_format(upload) -> str:
+    """
+    Picks 'ofx' for .ofx/.qfx files or content starting with an OFX header, otherwise 'csv'.
+    """
+    name = (getattr(upload, 'name', '') or '').lower()
+    if name.endswith(('.ofx', '.qfx')):
+        return 'ofx'
+
+    upload.seek(0)
+    head = upload.read(SNIFF_SIZE)
+    upload.seek(0)
+    if isinstance(head, bytes):
+        head = head.decode('utf-8', errors='replace')
+    head = head.lstrip('\ufeff').lstrip().upper()
+    return 'ofx' if head.startswith(('OFXHEADER', '<?XML', '<OFX')) and '<OFX' in head else 'csv'
+
+def open_text(upload) -> io.TextIOWrapper:
+    """
+    Wraps an uploaded file for incremental text reads without loading it into memory.
+    """
+    upload.seek(0)
+    return io.TextIOWrapper(getattr(upload, 'file', upload), encoding='utf-8-sig', errors='replace', newline='')
+
+def read_csv_headers(stream: io.TextIOBase) -> tuple[csv.Dialect, list[str], bool]:
+    """
+    Sniffs the dialect from the start of the stream and returns
+    (dialect, first row, whether the first row is a header). The stream is
+    rewound afterwards. A first row with no numeric cells is treated as a
+    header, as the import screen does.
+    """
+    sample = stream.read(SNIFF_SIZE)
+    stream.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',\t;|')
+    except csv.Error:
+        dialect = csv.excel
+
+    first_row = next(csv.reader(io.StringIO(sample), dialect), [])
+    stream.seek(0)
+    has_header = bool(first_row) and not any(_is_number(cell) for cell in first_row)
+    return dialect, [cell.strip() for cell in first_row], has_header
+
+def validate_mapping(mapping: list[str]):
+    counts = Counter(target for target in mapping if target)
+    for target in REQUIRED_IMPORT_FIELDS:
+        if counts[target] == 0:
+            raise InvalidStatement(f"Missing mapping for {target}")
+    duplicates = sorted(target for target, count in counts.items() if count > 1)
+    if duplicates:
+        raise InvalidStatement(f"Field type \"{duplicates[0]}\" is mapped more than once. Each field must be unique.")
+
+def iter_csv_rows(stream: io.TextIOBase, mapping: list[str], dialect=csv.excel, skip_header: bool = True,
+                  invert_amounts: bool = False) -> Iterator[StatementRow]:
+    """
+    Yields statement rows from a CSV stream using a stored column mapping
+    (one target per column: 'purchase_date', 'amount', 'description',
+    'category' or '' to skip).
+    """
+    validate_mapping(mapping)
+    columns = {target: index for index, target in enumerate(mapping) if target}
+
+    reader = csv.reader(stream, dialect)
+    if skip_header:
+        next(reader, None)
+
+    for row_number, cells in enumerate(reader, start=2 if skip_header else 1):
+        if not any(cell.strip() for cell in cells):
+            continue
+
+        def cell(target):
+            index = columns.get(target)
+            if index is None or index >= len(cells):
+                return ''
+            return cells[index].strip()
+
+        purchase_date = parse_flexible_date(cell('purchase_date'))
+        if purchase_date is None:
+            raise InvalidStatement("Invalid date format", row_number)
+
+        amount = parse_amount(cell('amount'))
+        if amount is None:
+            raise InvalidStatement("Invalid amount", row_number)
+
+        yield StatementRow(
+            row=row_number,
+            purchase_date=purchase_date,
+            amount=-amount if invert_amounts else amount,
+            description=cell('description'),
+            category_name=cell('category') or None
+        )
+
+def with_positive_spend(rows: Iterable[StatementRow], sample_size: int = IMPORT_CHUNK_SIZE) -> Iterator[StatementRow]:
+    """
+    Negates every amount when most of the first `sample_size` rows are
+    negative, i.e. the statement records spending as debits. Only the sample
+    is held in memory.
+    """
+    iterator = iter(rows)
+    sample = list(islice(iterator, sample_size))
+    negative = sum(1 for row in sample if row.amount < 0)
+    positive = sum(1 for row in sample if row.amount > 0)
+
+    for row in chain(sample, iterator):
+        yield row._replace(amount=-row.amount) if negative > positive else row
+
+OFX_TAG_PATTERN = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<\r\n]*)')
+
+def iter_ofx_rows(stream: io.TextIOBase, invert_amounts: bool = False) -> Iterator[StatementRow]:
+    """
+    Yields statement rows from the <STMTTRN> blocks of an OFX (SGML or XML)
+    stream, reading it line by line. Debits are negative in OFX, so amounts
+    are negated to record spending as positive; `invert_amounts` flips that.
+    """
+    transaction_number = 0
+    current = None
+
+    for line in stream:
+        for closing, tag, value in OFX_TAG_PATTERN.findall(line):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if not closing:
+                    current = {}
+                    continue
+                if current is None:
+                    continue
+
+                transaction_number += 1
+                purchase_date = None
+                posted = current.get('DTPOSTED', '')
+                if len(posted) >= 8 and posted[:8].isdigit():
+                    try:
+                        purchase_date = date(int(posted[:4]), int(posted[4:6]), int(posted[6:8]))
+                    except ValueError:
+                        pass
+                if purchase_date is None:
+                    raise InvalidStatement("Invalid DTPOSTED date", transaction_number)
+
+                amount = parse_amount(current.get('TRNAMT', ''))
+                if amount is None:
+                    raise InvalidStatement("Invalid TRNAMT amount", transaction_number)
+
+                yield StatementRow(
+                    row=transaction_number,
+                    purchase_date=purchase_date,
+                    amount=amount if invert_amounts else -amount,
+                    description=current.get('NAME') or current.get('MEMO') or ''
+                )
+                current = None
+            elif current is not None and not closing:
+                current[tag] = value.strip()
+
+
+def _chunks(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+@transaction.atomic
+def import_purchases(user_module, rows: Iterable[StatementRow], suggest_categories: bool = True,
+                     duplicates: str = 'allow', chunk_size: int = IMPORT_CHUNK_SIZE) -> dict:
+    """
+    Inserts statement rows as purchases, `chunk_size` rows at a time, so memory
+    stays bounded however long the statement is. Each chunk costs one batch
+    of category suggestions, one duplicate lookup and one bulk write (see
+    save_purchase_batch); term frequency deltas are accumulated and written
+    once at the end. Any invalid row rolls the whole import back.
+
+    Suggested categories are saved but not counted into term frequencies, so
+    the model only learns from categories the user gave and never reinforces
+    its own guesses.
+    """
+    categories = {
+        name.strip().lower(): category_id
+        for category_id, name in BudgetCategory.objects.filter(user_module=user_module).values_list('id', 'name')
+    }
+
+    totals = Counter(imported=0, updated=0, skipped=0, categorised=0)
+    term_deltas = Counter()
+
+    for chunk in _chunks(rows, chunk_size):
+        category_ids = [categories.get((row.category_name or '').strip().lower()) for row in chunk]
+
+        suggested = []
+        if suggest_categories:
+            uncategorised = [index for index, category_id in enumerate(category_ids) if category_id is None]
+            suggestions = suggest_categories_for_descriptions(
+                [chunk[index].description for index in uncategorised], user_module
+            )
+            for index, suggestion in zip(uncategorised, suggestions):
+                category_ids[index] = suggestion
+                if suggestion is not None:
+                    suggested.append(index)
+
+        purchases = [
+            BudgetPurchase(
+                user_module=user_module,
+                purchase_date=row.purchase_date,
+                amount=row.amount,
+                description=row.description,
+                category_id=category_id
+            )
+            for row, category_id in zip(chunk, category_ids)
+        ]
+        for index in suggested:
+            purchases[index].category_suggested = True
+        created, updated = save_purchase_batch(user_module, purchases, duplicates=duplicates)
+
+        term_deltas.update(collect_term_frequency_deltas(
+            (purchase.description, None if getattr(purchase, 'category_suggested', False) else purchase.category_id)
+            for purchase in created
+        ))
+
+        totals['imported'] += len(created)
+        totals['updated'] += len(updated)
+        totals['skipped'] += len(chunk) - len(created) - len(updated)
+        totals['categorised'] += sum(1 for purchase in created if purchase.category_id)
+
+    if term_deltas:
+        apply_term_frequency_deltas(term_deltas)
+        invalidate_category_model(user_module.id)
+    if totals['imported']:
+        invalidate_purchase_years(user_module.id)
+
+    return dict(totals)
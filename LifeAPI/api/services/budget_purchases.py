@@ -0,0 +1,120 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.utils.timezone import now
+
+from api.models import BudgetCategoryTermFrequency, BudgetPurchase, UserModule
+from api.services.budget_analysis import (
+    apply_term_frequency_deltas,
+    collect_term_frequency_deltas,
+    invalidate_category_model
+)
+from api.services.budget_summary import apply_spend_deltas
+
+# How a batch write treats rows matching an existing purchase's fingerprint:
+# insert anyway, drop the row, or update the existing purchase from it
+DUPLICATE_MODES = ('allow', 'skip', 'upsert')
+
+
+def partition_duplicates(user_module, purchases: list[BudgetPurchase]) -> tuple[list, list]:
+    """
+    Splits unsaved purchases into (new, [(purchase, existing match)]) with one
+    indexed lookup on (user_module, fingerprint). Matching is one-to-one, so
+    a batch holding two identical purchases against one stored copy still
+    yields one new purchase.
+    """
+    for purchase in purchases:
+        purchase.refresh_fingerprint()
+
+    candidates = defaultdict(list)
+    existing = BudgetPurchase.objects.filter(
+        user_module=user_module,
+        fingerprint__in={purchase.fingerprint for purchase in purchases}
+    ).order_by('id')
+    for match in existing:
+        candidates[match.fingerprint].append(match)
+
+    new, matched = [], []
+    for purchase in purchases:
+        if candidates[purchase.fingerprint]:
+            matched.append((purchase, candidates[purchase.fingerprint].pop(0)))
+        else:
+            new.append(purchase)
+    return new, matched
+
+@transaction.atomic
+def save_purchase_batch(user_module, purchases: list[BudgetPurchase], duplicates: str = 'allow') -> tuple[list, list]:
+    """
+    Writes unsaved purchases with one bulk_create and, in upsert mode, one
+    bulk_update of the existing purchases they match. bulk writes skip
+    signals, so the weekly rollup is adjusted here, as are the term
+    frequencies of updated purchases. Term frequencies of created purchases
+    and the purchase years cache are left to the caller.
+    Purchases with `category_suggested` set hold a guessed category: it never
+    replaces a stored one and is not counted into term frequencies.
+    Returns (created, updated).
+    """
+    # Fingerprints are not unique, so concurrent batches for one budget are
+    # serialised on its row; otherwise each could miss the other's inserts
+    list(UserModule.objects.filter(pk=user_module.pk).select_for_update())
+
+    if duplicates == 'allow':
+        for purchase in purchases:
+            purchase.refresh_fingerprint()
+        new, matched = purchases, []
+    else:
+        new, matched = partition_duplicates(user_module, purchases)
+
+    created = BudgetPurchase.objects.bulk_create(new) if new else []
+    spend_deltas = [purchase.spend_key() for purchase in created]
+
+    updated = []
+    old_terms, new_terms = [], []
+    if duplicates == 'upsert':
+        modified_at = now()
+        for purchase, existing in matched:
+            # Keep the stored category when the incoming row has none, or only a guess
+            suggested = getattr(purchase, 'category_suggested', False)
+            if purchase.category_id and not (suggested and existing.category_id):
+                category_id = purchase.category_id
+            else:
+                category_id = existing.category_id
+                suggested = False
+            if existing.description == purchase.description and existing.category_id == category_id:
+                continue
+
+            if existing.category_id != category_id:
+                spend_deltas.append((existing.user_module_id, existing.purchase_date, existing.category_id, -existing.amount))
+                spend_deltas.append((existing.user_module_id, existing.purchase_date, category_id, existing.amount))
+
+            old_terms.append((existing.description, existing.category_id))
+            new_terms.append((purchase.description, None if suggested else category_id))
+
+            existing.description = purchase.description
+            existing.category_id = category_id
+            existing.fingerprint = purchase.fingerprint
+            existing.modified_at = modified_at
+            updated.append(existing)
+
+        if updated:
+            BudgetPurchase.objects.bulk_update(updated, ['description', 'category', 'fingerprint', 'modified_at'])
+
+    apply_spend_deltas(spend_deltas)
+    _apply_term_changes(user_module, old_terms, new_terms)
+    return created, updated
+
+def _apply_term_changes(user_module, old_terms: list, new_terms: list):
+    # Moves the terms of updated purchases from their old (description,
+    # category) to the new one; rows no purchase counts any more are removed
+    term_deltas = collect_term_frequency_deltas(new_terms)
+    term_deltas.subtract(collect_term_frequency_deltas(old_terms))
+    term_deltas = Counter({key: delta for key, delta in term_deltas.items() if delta})
+    if not term_deltas:
+        return
+
+    apply_term_frequency_deltas(term_deltas)
+    BudgetCategoryTermFrequency.objects.filter(
+        category_id__in={category_id for category_id, _, _ in term_deltas},
+        frequency__lte=0
+    ).delete()
+    invalidate_category_model(user_module.id)
@@ -0,0 +1,182 @@
+from collections import defaultdict
+from collections.abc import Iterable
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from api.cache import get_version, bump_version
+from api.models import BudgetPurchase, BudgetWeeklySpend
+
+# Maximum number of rollup keys sent in a single upsert statement
+SPEND_UPSERT_CHUNK_SIZE = 500
+
+def get_week_start(value: date) -> date:
+    """
+    Returns the Monday of the ISO week containing the date.
+    """
+    return value - timedelta(days=value.weekday())
+
+def _normalise_spend(user_module_id, purchase_date, category_id, amount):
+    # Instances created in code may still hold the raw values they were given
+    purchase_date = BudgetPurchase._meta.get_field('purchase_date').to_python(purchase_date)
+    amount = BudgetPurchase._meta.get_field('amount').to_python(amount)
+    return user_module_id, purchase_date, category_id, amount
+
+def apply_spend_deltas(rows: Iterable[tuple[int, date, int | None, Decimal]], chunk_size: int = SPEND_UPSERT_CHUNK_SIZE):
+    """
+    Adds (user_module_id, purchase_date, category_id, amount) deltas to the weekly rollup.
+    Deltas are summed per week and category first, then applied with one
+    INSERT ... ON CONFLICT DO UPDATE statement per chunk, so a bulk import
+    costs one query however many weeks it touches and concurrent writers
+    add to the same row.
+    """
+    totals = defaultdict(Decimal)
+    for row in rows:
+        user_module_id, purchase_date, category_id, amount = _normalise_spend(*row)
+        totals[(user_module_id, get_week_start(purchase_date), category_id)] += amount
+
+    # Key order, so concurrent writers lock shared rows in the same order and cannot deadlock
+    items = sorted(
+        ((key, amount) for key, amount in totals.items() if amount),
+        key=lambda item: (item[0][0], item[0][1], item[0][2] is not None, item[0][2] or 0)
+    )
+    if not items:
+        return
+
+    table = BudgetWeeklySpend._meta.db_table
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(items), chunk_size):
+            chunk = items[start:start + chunk_size]
+            values_sql = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(chunk))
+            params = []
+            for (user_module_id, week_start, category_id), amount in chunk:
+                iso_year, iso_week, _ = week_start.isocalendar()
+                params.extend([user_module_id, iso_year, iso_week, week_start, category_id, amount])
+
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (user_module_id, iso_year, iso_week, week_start, category_id, total)
+                VALUES {values_sql}
+                ON CONFLICT (user_module_id, iso_year, iso_week, category_id)
+                DO UPDATE SET total = {table}.total + EXCLUDED.total
+                """,
+                params
+            )
+
+def uncategorise_spend(category_id: int):
+    """
+    Moves a category's rollup rows onto the uncategorised rows of the same
+    weeks, as its purchases become uncategorised when it is deleted.
+    """
+    table = BudgetWeeklySpend._meta.db_table
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (user_module_id, iso_year, iso_week, week_start, category_id, total)
+            SELECT user_module_id, iso_year, iso_week, week_start, NULL, total
+            FROM {table}
+            WHERE category_id = %s
+            ON CONFLICT (user_module_id, iso_year, iso_week, category_id)
+            DO UPDATE SET total = {table}.total + EXCLUDED.total
+            """,
+            [category_id]
+        )
+        cursor.execute(f"DELETE FROM {table} WHERE category_id = %s", [category_id])
+
+def get_weekly_summary(user_module, start_date: date, end_date: date) -> list[dict]:
+    """
+    Returns purchase totals grouped by ISO week number and category for
+    purchases in [start_date, end_date). Whole weeks are read from the rollup;
+    only the partial weeks at either end of the range touch purchases.
+    """
+    totals = defaultdict(Decimal)
+
+    full_start = get_week_start(start_date + timedelta(days=6))
+    full_end = get_week_start(end_date)
+
+    if full_start < full_end:
+        rollup = (
+            BudgetWeeklySpend.objects
+            .filter(user_module=user_module, week_start__gte=full_start, week_start__lt=full_end)
+            .exclude(total=0)
+            .values('iso_week', 'category_id')
+            .annotate(week_total=Sum('total'))
+            .order_by()
+        )
+        for row in rollup:
+            totals[(row['iso_week'], row['category_id'])] += row['week_total']
+
+        edges = [(start_date, full_start), (full_end, end_date)]
+    else:
+        edges = [(start_date, end_date)]
+
+    for edge_start, edge_end in edges:
+        if edge_start >= edge_end:
+            continue
+
+        purchases = (
+            BudgetPurchase.objects
+            .filter(user_module=user_module, purchase_date__gte=edge_start, purchase_date__lt=edge_end)
+            .values('purchase_date', 'category_id')
+            .annotate(day_total=Sum('amount'))
+            .order_by()
+        )
+        for row in purchases:
+            week = row['purchase_date'].isocalendar()[1]
+            totals[(week, row['category_id'])] += row['day_total']
+
+    return [
+        {"week": week, "category": category_id, "total": float(total)}
+        for (week, category_id), total in sorted(
+            totals.items(),
+            key=lambda item: (item[0][0], item[0][1] is None, item[0][1] or 0)
+        )
+    ]
+
+
+def _purchase_years_scope(user_module_id: int) -> str:
+    return f'purchase-years:{user_module_id}'
+
+def get_purchase_years(user_module_id: int) -> list[int]:
+    """
+    Returns the sorted years that have purchases in a budget, cached until a purchase changes.
+    """
+    scope = _purchase_years_scope(user_module_id)
+    key = f'{scope}:{get_version(scope)}'
+
+    years = cache.get(key)
+    if years is None:
+        years = _load_purchase_years(user_module_id)
+        cache.set(key, years, timeout=None)
+
+    return years
+
+def _load_purchase_years(user_module_id: int) -> list[int]:
+    # Skip scan over the purchase date index: one seek per year present,
+    # rather than reading every purchase to find the distinct years
+    dates = (
+        BudgetPurchase.objects
+        .filter(user_module_id=user_module_id)
+        .order_by('purchase_date')
+        .values_list('purchase_date', flat=True)
+    )
+
+    years = []
+    next_date = dates.first()
+    while next_date is not None:
+        years.append(next_date.year)
+        if next_date.year == date.max.year:
+            break
+        next_date = dates.filter(purchase_date__gte=date(next_date.year + 1, 1, 1)).first()
+
+    return years
+
+def invalidate_purchase_years(user_module_id: int):
+    scope = _purchase_years_scope(user_module_id)
+    bump_version(scope)
+    transaction.on_commit(lambda: bump_version(scope))
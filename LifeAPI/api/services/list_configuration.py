@@ -0,0 +1,131 @@
+from collections import defaultdict
+from operator import attrgetter
+
+from django.db import transaction
+
+from api.models import FieldType, ListField, ListFieldOption, ListFieldRule
+from api.services.list_validation import invalidate_list_validator
+
+LIST_FIELD_UPDATE_FIELDS = ['field_name', 'field_type', 'is_mandatory', 'order']
+
+
+def diff_children(existing: list, submitted: list, key) -> tuple[list, list]:
+    """
+    Matches existing child rows, in display (id) order, against submitted keys.
+    Keeps the longest prefix of `submitted` that appears in order within
+    `existing`, so unchanged and appended rows are never rewritten and the
+    display order still follows the submission.
+    Returns (rows to delete, keys to create).
+    """
+    kept = set()
+    position = 0
+    for child in existing:
+        if position < len(submitted) and key(child) == submitted[position]:
+            kept.add(child.id)
+            position += 1
+
+    stale = [child for child in existing if child.id not in kept]
+    return stale, submitted[position:]
+
+@transaction.atomic
+def apply_list_fields(user_module, list_fields_data: list[dict]):
+    """
+    Brings the fields, rules and options of a list in line with a submitted
+    `list_fields` payload. Changes are computed up front and applied with one
+    delete, bulk_update or bulk_create per table, so the query count does not
+    grow with the number of fields.
+    """
+    field_type_names = dict(FieldType.objects.values_list('id', 'name'))
+    existing_fields = {field.id: field for field in ListField.objects.filter(user_module=user_module)}
+
+    existing_rules = defaultdict(list)
+    for rule in ListFieldRule.objects.filter(list_field__user_module=user_module).order_by('id'):
+        existing_rules[rule.list_field_id].append(rule)
+
+    existing_options = defaultdict(list)
+    for option in ListFieldOption.objects.filter(list_field__user_module=user_module).order_by('id'):
+        existing_options[option.list_field_id].append(option)
+
+    submitted_field_ids = {field_data.get('id') for field_data in list_fields_data if 'id' in field_data}
+    fields_to_update = []
+    fields_to_create = []
+    rules_to_delete = []
+    options_to_delete = []
+    # (field, field_type_rule ids to create, option names to create)
+    children_to_create = []
+
+    for idx, field_data in enumerate(list_fields_data):
+        field_id = field_data.get('id')
+        rules = [rule_data.get('field_type_rule') for rule_data in field_data.get('rules', [])]
+        options = [option_data.get('option_name') for option_data in field_data.get('options', [])]
+
+        if field_id and field_id in existing_fields:
+            field = existing_fields[field_id]
+            values = {
+                'field_name': field_data.get('field_name', field.field_name),
+                'field_type_id': field_data.get('field_type', field.field_type_id),
+                'is_mandatory': field_data.get('is_mandatory', field.is_mandatory),
+                'order': field_data.get('order', idx + 1),
+            }
+            if any(getattr(field, name) != value for name, value in values.items()):
+                for name, value in values.items():
+                    setattr(field, name, value)
+                fields_to_update.append(field)
+
+            if 'rules' in field_data:
+                stale, rules = diff_children(existing_rules[field.id], rules, attrgetter('field_type_rule_id'))
+                rules_to_delete.extend(stale)
+            else:
+                rules = []
+
+            if field_type_names.get(field.field_type_id) == 'dropdown' and 'options' in field_data:
+                stale, options = diff_children(existing_options[field.id], options, attrgetter('option_name'))
+                options_to_delete.extend(stale)
+            else:
+                options = []
+        else:
+            field = ListField(
+                user_module=user_module,
+                field_type_id=field_data.get('field_type'),
+                field_name=field_data.get('field_name'),
+                is_mandatory=field_data.get('is_mandatory', False),
+                order=field_data.get('order', idx + 1)
+            )
+            fields_to_create.append(field)
+
+            if field_type_names.get(field.field_type_id) != 'dropdown':
+                options = []
+
+        children_to_create.append((field, rules, options))
+
+    # Deleting a field cascades to its rules and options
+    stale_field_ids = existing_fields.keys() - submitted_field_ids
+    if stale_field_ids:
+        ListField.objects.filter(id__in=stale_field_ids).delete()
+    if rules_to_delete:
+        ListFieldRule.objects.filter(id__in=[rule.id for rule in rules_to_delete]).delete()
+    if options_to_delete:
+        ListFieldOption.objects.filter(id__in=[option.id for option in options_to_delete]).delete()
+
+    if fields_to_update:
+        ListField.objects.bulk_update(fields_to_update, LIST_FIELD_UPDATE_FIELDS)
+    if fields_to_create:
+        ListField.objects.bulk_create(fields_to_create)
+
+    new_rules = [
+        ListFieldRule(list_field=field, field_type_rule_id=field_type_rule_id)
+        for field, rules, _ in children_to_create
+        for field_type_rule_id in rules
+    ]
+    if new_rules:
+        ListFieldRule.objects.bulk_create(new_rules)
+
+    new_options = [
+        ListFieldOption(list_field=field, option_name=option_name)
+        for field, _, options in children_to_create
+        for option_name in options
+    ]
+    if new_options:
+        ListFieldOption.objects.bulk_create(new_options)
+
+    invalidate_list_validator(user_module.id)
@@ -0,0 +1,66 @@
+from django.db import transaction
+from django.db.models import Min
+from django.utils.timezone import now
+
+from api.models import ListItem, UserModule
+from api.services.ordering import RANK_STEP
+
+
+def top_ranks(user_module, count: int) -> list[float]:
+    """
+    Returns `count` ascending rank keys above the list's current top item, one
+    step apart. Callers should hold the list's lock so the keys stay unique.
+    """
+    top = ListItem.objects.filter(user_module=user_module).aggregate(top=Min('order'))['top'] or 0
+    return [top - (count - position) * RANK_STEP for position in range(count)]
+
+
+@transaction.atomic
+def apply_bulk_item_changes(user_module, create=(), update=(), delete=(), complete=()) -> dict:
+    """
+    Applies a batch of item changes to a list in one transaction, with one
+    bulk_create, bulk_update and delete at most. New items are placed above
+    the existing ones, keeping their order from the request.
+
+    `create` and `update` hold validated ListItem data ({'fields', 'is_completed'},
+    plus 'id' for updates); `complete` holds {'id', 'is_completed'} pairs.
+    Raises ListItem.DoesNotExist if any referenced id is not an item of the list.
+    """
+    # Same lock as a move, so concurrent batches never hand out the same rank keys
+    list(UserModule.objects.filter(pk=user_module.pk).select_for_update())
+
+    changes = {item['id']: item for item in [*update, *complete]}
+    referenced_ids = set(changes) | set(delete)
+    existing = ListItem.objects.filter(user_module=user_module).in_bulk(referenced_ids)
+    missing = referenced_ids - existing.keys()
+    if missing:
+        raise ListItem.DoesNotExist(f"Items not found: {', '.join(str(id) for id in sorted(missing))}")
+
+    updated = []
+    modified_at = now()
+    for item_id, data in changes.items():
+        item = existing[item_id]
+        item.fields = data.get('fields', item.fields)
+        item.is_completed = data.get('is_completed', item.is_completed)
+        # bulk_update skips auto_now, so stamp the change explicitly
+        item.modified_at = modified_at
+        updated.append(item)
+    if updated:
+        ListItem.objects.bulk_update(updated, ['fields', 'is_completed', 'modified_at'])
+
+    if delete:
+        ListItem.objects.filter(user_module=user_module, id__in=delete).delete()
+
+    created = []
+    if create:
+        created = ListItem.objects.bulk_create([
+            ListItem(
+                user_module=user_module,
+                fields=data.get('fields', []),
+                is_completed=data.get('is_completed', False),
+                order=order
+            )
+            for order, data in zip(top_ranks(user_module, len(create)), create)
+        ])
+
+    return {'created': created, 'updated': updated, 'deleted': sorted(delete)}
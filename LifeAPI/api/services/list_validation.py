@@ -0,0 +1,126 @@
+from datetime import datetime
+from typing import NamedTuple
+
+from django.core.cache import cache
+from django.db import transaction
+
+from api.cache import get_version, bump_version
+from api.models import ListField, ListFieldOption
+
+
+class CompiledField(NamedTuple):
+    name: str
+    type_name: str
+    # Valid option names for dropdown fields, otherwise None
+    options: frozenset[str] | None
+
+
+class CompiledListValidator(NamedTuple):
+    fields: dict[int, CompiledField]
+    mandatory: frozenset[int]
+
+    def validate(self, field_values: list[dict]) -> str | None:
+        """
+        Returns the first problem with an item's field values, or None if they are valid.
+        """
+        provided_field_ids = {item.get('field') for item in field_values if 'field' in item}
+        missing_required = self.mandatory - provided_field_ids
+        if missing_required:
+            missing_field_names = [self.fields[field_id].name for field_id in sorted(missing_required)]
+            return f"Missing required fields: {', '.join(missing_field_names)}"
+
+        for item in field_values:
+            field_id = item['field']
+            field = self.fields.get(field_id)
+            if field is None:
+                return f"Field ID {field_id} does not belong to this list"
+
+            checker = TYPE_CHECKERS.get(field.type_name)
+            if checker:
+                error = checker(field, item['value'])
+                if error:
+                    return error
+
+        return None
+
+
+def _check_number(field: CompiledField, value) -> str | None:
+    try:
+        float(value)
+    except (ValueError, TypeError):
+        return f"Field '{field.name}' must be a number"
+    return None
+
+def _check_date(field: CompiledField, value) -> str | None:
+    # Allow empty dates for non-mandatory fields
+    if not value:
+        return None
+    try:
+        datetime.strptime(value, '%Y-%m-%d')
+    except (ValueError, TypeError):
+        return f"Field '{field.name}' must be a valid date in YYYY-MM-DD format"
+    return None
+
+def _check_dropdown(field: CompiledField, value) -> str | None:
+    if value and (not isinstance(value, str) or value not in field.options):
+        return f"'{value}' is not a valid option for field '{field.name}'"
+    return None
+
+TYPE_CHECKERS = {
+    'number': _check_number,
+    'date': _check_date,
+    'dropdown': _check_dropdown,
+}
+
+
+def _validator_scope(list_id: int) -> str:
+    return f'list-validator:{list_id}'
+
+def get_list_validator(list_id: int) -> CompiledListValidator:
+    """
+    Returns the compiled validator for a list's configuration. Validators are
+    stored in the shared cache under a versioned key, so item writes only
+    touch the configuration tables after the configuration has changed.
+    """
+    list_id = int(list_id)
+    version = get_version(_validator_scope(list_id))
+    key = f'{_validator_scope(list_id)}:{version}'
+
+    validator = cache.get(key)
+    if validator is None:
+        validator = _compile_list_validator(list_id)
+        cache.set(key, validator, timeout=None)
+    return validator
+
+def _compile_list_validator(list_id: int) -> CompiledListValidator:
+    rows = ListField.objects.filter(user_module_id=list_id).values_list(
+        'id', 'field_name', 'field_type__name', 'is_mandatory'
+    )
+
+    options = {}
+    for field_id, option_name in ListFieldOption.objects.filter(
+        list_field__user_module_id=list_id, list_field__field_type__name='dropdown'
+    ).values_list('list_field_id', 'option_name'):
+        options.setdefault(field_id, set()).add(option_name)
+
+    fields = {}
+    mandatory = set()
+    for field_id, field_name, type_name, is_mandatory in rows:
+        fields[field_id] = CompiledField(
+            name=field_name,
+            type_name=type_name,
+            options=frozenset(options.get(field_id, ())) if type_name == 'dropdown' else None
+        )
+        if is_mandatory:
+            mandatory.add(field_id)
+
+    return CompiledListValidator(fields=fields, mandatory=frozenset(mandatory))
+
+def invalidate_list_validator(list_id: int):
+    """
+    Drops the compiled validator for a list. The version is bumped again on
+    commit so a validator compiled from uncommitted data is not kept.
+    """
+    scope = _validator_scope(int(list_id))
+    bump_version(scope)
+    transaction.on_commit(lambda: bump_version(scope))
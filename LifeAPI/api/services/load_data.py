@@ -0,0 +1,303 @@
+import random
+from collections import Counter, defaultdict
+from collections.abc import Callable, Iterable, Iterator
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import islice
+from typing import NamedTuple
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+
+from api.models import (
+    BudgetBulkImportMapping,
+    BudgetCashFlow,
+    BudgetCategory,
+    BudgetPurchase,
+    BudgetWeeklySpend,
+    FieldType,
+    ListField,
+    ListFieldOption,
+    ListItem,
+    ModuleType,
+    Period,
+    UserModule
+)
+from api.services.budget_analysis import (
+    apply_term_frequency_deltas,
+    collect_term_frequency_deltas,
+    invalidate_category_model
+)
+from api.services.budget_summary import get_week_start, invalidate_purchase_years
+from api.services.ordering import RANK_STEP
+
+# Rows per bulk_create statement
+LOAD_DATA_CHUNK_SIZE = 5000
+
+DEFAULT_SEED = 42
+DEFAULT_EMAIL_DOMAIN = 'loadtest.example.com'
+
+# Last purchase date of generated histories, fixed so the same seed gives the same data
+HISTORY_END_DATE = date(2025, 6, 30)
+HISTORY_DAYS = 3 * 365
+
+# Share of purchases left uncategorised, as a user part way through categorising would
+UNCATEGORISED_RATIO = 0.15
+
+# Category name -> (weekly target, (lowest, highest) purchase amount in cents, merchant templates)
+CATEGORIES = {
+    'Groceries': (250, (300, 25000), [
+        'WOOLWORTHS {store} {suburb}', 'COLES {store} {suburb}', 'ALDI STORES {store} {suburb}',
+        'IGA {suburb}', 'HARRIS FARM MARKETS {suburb}',
+    ]),
+    'Transport': (80, (250, 9000), [
+        'UBER *TRIP HELP.UBER.COM', 'TRANSPORTFORNSW OPAL {suburb}', 'BP {suburb} {store}',
+        'SHELL COLES EXPRESS {store}', 'LINKT SYDNEY TOLL',
+    ]),
+    'Eating out': (120, (450, 12000), [
+        'GUZMAN Y GOMEZ {suburb}', 'ANGKOR CAFE & BAR {suburb}', 'MCDONALDS {suburb} {store}',
+        'SQ *{cafe} {suburb}', 'UBER *EATS HELP.UBER.COM',
+    ]),
+    'Utilities': (60, (2000, 45000), [
+        'ORIGIN ENERGY DIRECT DEBIT', 'AGL SALES PTY LTD', 'TELSTRA PREPAID {store}', 'SYDNEY WATER',
+    ]),
+    'Entertainment': (40, (999, 8000), [
+        'NETFLIX.COM 866-579-7172', 'SPOTIFY P{store}', 'EVENT CINEMAS {suburb}', 'STEAM GAMES',
+    ]),
+    'Health': (30, (800, 20000), [
+        'PRICELINE PHARMACY {suburb}', 'CHEMIST WAREHOUSE {suburb}', 'BUPA DENTAL {suburb}',
+    ]),
+    'Home': (50, (500, 60000), [
+        'BUNNINGS WAREHOUSE {store} {suburb}', 'IKEA TEMPE', 'KMART {suburb} {store}',
+    ]),
+    'Travel': (0, (5000, 150000), [
+        'QANTAS AIRWAYS {store}', 'VIRGIN AUSTRALIA', 'BOOKING.COM HOTEL', 'AIRBNB * HM{store}',
+    ]),
+}
+
+SUBURBS = [
+    'SYDNEY', 'NEWTOWN', 'MARRICKVILLE', 'CHATSWOOD', 'BONDI', 'ALEXANDRIA', 'PARRAMATTA',
+    'MELBOURNE', 'FITZROY', 'BRUNSWICK', 'SOUTH YARRA', 'BRISBANE CITY', 'FORTITUDE VALLEY',
+]
+CAFES = ['BEAN THERE', 'THE DAILY GRIND', 'MARKET STALL 88', 'SOURDOUGH CO', 'NOODLE HOUSE']
+
+# Repeated field layout for generated lists: (field type, is_mandatory)
+FIELD_LAYOUT = [('text', True), ('number', False), ('date', False), ('dropdown', False), ('text', False)]
+DROPDOWN_OPTIONS = ['Low', 'Medium', 'High']
+
+
+class LoadDataScale(NamedTuple):
+    users: int = 1
+    # Per user
+    lists: int = 3
+    # Per list
+    fields: int = 8
+    items: int = 500
+    # Per user
+    budgets: int = 2
+    # Per budget
+    purchases: int = 5000
+
+
+class LoadData(NamedTuple):
+    users: list
+    lists: list
+    budgets: list
+    counts: Counter
+
+
+def _bulk_create_chunks(model, rows: Iterable, chunk_size: int) -> int:
+    """
+    Inserts rows from a generator one chunk at a time, so memory stays bounded.
+    Returns the number of rows inserted.
+    """
+    iterator = iter(rows)
+    total = 0
+    while chunk := list(islice(iterator, chunk_size)):
+        model.objects.bulk_create(chunk)
+        total += len(chunk)
+    return total
+
+def generate_load_data(
+    scale: LoadDataScale,
+    seed: int = DEFAULT_SEED,
+    email_domain: str = DEFAULT_EMAIL_DOMAIN,
+    password: str = 'loadtest',
+    chunk_size: int = LOAD_DATA_CHUNK_SIZE,
+    progress: Callable[[str], None] | None = None
+) -> LoadData:
+    """
+    Generates `scale.users` users, each owning lists with fields and items and
+    budgets with categories, purchases, cash flows and an import mapping.
+    The weekly rollup and term frequencies are built from the generated
+    purchases in memory and written once per budget. Every row is written
+    with bulk_create in chunks of `chunk_size`, one transaction per user. The
+    same seed always produces the same data.
+    """
+    rng = random.Random(seed)
+    list_type = ModuleType.objects.get(name='list')
+    budget_type = ModuleType.objects.get(name='budget')
+    field_types = {field_type.name: field_type for field_type in FieldType.objects.all()}
+    period = Period.objects.order_by('id').first()
+    # Hashing is deliberately slow, so every user shares one hash
+    password_hash = make_password(password)
+
+    counts = Counter(dict.fromkeys(
+        ['users', 'lists', 'fields', 'options', 'items', 'budgets', 'categories', 'purchases', 'terms'], 0
+    ))
+    users = get_user_model().objects.bulk_create([
+        get_user_model()(email=f'loaduser{i}@{email_domain}', password=password_hash)
+        for i in range(scale.users)
+    ])
+    counts['users'] = len(users)
+
+    all_lists, all_budgets = [], []
+    for user in users:
+        with transaction.atomic():
+            lists = UserModule.objects.bulk_create([
+                UserModule(user=user, module=list_type, name=f'List {i + 1}', order=i + 1, is_enabled=True, is_checkable=True)
+                for i in range(scale.lists)
+            ])
+            for user_list in lists:
+                _generate_list(user_list, scale, field_types, rng, chunk_size, counts)
+
+            budgets = UserModule.objects.bulk_create([
+                UserModule(user=user, module=budget_type, name=f'Budget {i + 1}', order=scale.lists + i + 1, is_enabled=True)
+                for i in range(scale.budgets)
+            ])
+            for budget in budgets:
+                _generate_budget(budget, scale, period, rng, chunk_size, counts)
+
+        counts['lists'] += len(lists)
+        counts['budgets'] += len(budgets)
+        all_lists.extend(lists)
+        all_budgets.extend(budgets)
+        if progress:
+            progress(f"{user.email}: {len(lists)} list(s), {len(budgets)} budget(s)")
+
+    return LoadData(users=users, lists=all_lists, budgets=all_budgets, counts=counts)
+
+def _generate_list(user_list, scale, field_types, rng, chunk_size, counts):
+    fields = ListField.objects.bulk_create([
+        ListField(
+            user_module=user_list,
+            field_type=field_types[FIELD_LAYOUT[i % len(FIELD_LAYOUT)][0]],
+            field_name=f'Field {i + 1}',
+            is_mandatory=FIELD_LAYOUT[i % len(FIELD_LAYOUT)][1],
+            order=i + 1
+        )
+        for i in range(scale.fields)
+    ])
+    counts['fields'] += len(fields)
+    counts['options'] += len(ListFieldOption.objects.bulk_create([
+        ListFieldOption(list_field=field, option_name=option)
+        for field in fields if field.field_type.name == 'dropdown'
+        for option in DROPDOWN_OPTIONS
+    ]))
+
+    def field_value(field):
+        type_name = field.field_type.name
+        if type_name == 'number':
+            return str(rng.randint(0, 1000))
+        if type_name == 'date':
+            return (HISTORY_END_DATE - timedelta(days=rng.randrange(HISTORY_DAYS))).isoformat()
+        if type_name == 'dropdown':
+            return rng.choice(DROPDOWN_OPTIONS)
+        return f'Item {rng.randrange(100_000)}'
+
+    counts['items'] += _bulk_create_chunks(ListItem, (
+        ListItem(
+            user_module=user_list,
+            is_completed=rng.random() < 0.3,
+            order=position * RANK_STEP,
+            fields=[{'field': field.id, 'value': field_value(field)} for field in fields]
+        )
+        for position in range(1, scale.items + 1)
+    ), chunk_size)
+
+def _generate_budget(budget, scale, period, rng, chunk_size, counts):
+    categories = BudgetCategory.objects.bulk_create([
+        BudgetCategory(user_module=budget, name=name, weekly_target=weekly_target, order=i + 1)
+        for i, (name, (weekly_target, _, _)) in enumerate(CATEGORIES.items())
+    ])
+    counts['categories'] += len(categories)
+    category_specs = [(category, *CATEGORIES[category.name][1:]) for category in categories]
+
+    weekly_totals = defaultdict(Decimal)
+    term_deltas = Counter()
+
+    def purchases() -> Iterator[BudgetPurchase]:
+        for _ in range(scale.purchases):
+            category, (low, high), templates = rng.choice(category_specs)
+            purchase = BudgetPurchase(
+                user_module=budget,
+                purchase_date=HISTORY_END_DATE - timedelta(days=rng.randrange(HISTORY_DAYS)),
+                amount=Decimal(rng.randint(low, high)) / 100,
+                description=rng.choice(templates).format(
+                    store=f'{rng.randrange(10_000):04d}',
+                    suburb=rng.choice(SUBURBS),
+                    cafe=rng.choice(CAFES)
+                ),
+                category=None if rng.random() < UNCATEGORISED_RATIO else category
+            )
+            purchase.refresh_fingerprint()
+            yield purchase
+
+    iterator = purchases()
+    while chunk := list(islice(iterator, chunk_size)):
+        BudgetPurchase.objects.bulk_create(chunk)
+        for purchase in chunk:
+            weekly_totals[(get_week_start(purchase.purchase_date), purchase.category_id)] += purchase.amount
+        term_deltas.update(collect_term_frequency_deltas(
+            (purchase.description, purchase.category_id) for purchase in chunk
+        ))
+        counts['purchases'] += len(chunk)
+
+    # The budget is new, so its rollup rows can be inserted rather than adjusted
+    _bulk_create_chunks(BudgetWeeklySpend, (
+        BudgetWeeklySpend(
+            user_module=budget,
+            iso_year=week_start.isocalendar()[0],
+            iso_week=week_start.isocalendar()[1],
+            week_start=week_start,
+            category_id=category_id,
+            total=total
+        )
+        for (week_start, category_id), total in weekly_totals.items()
+    ), chunk_size)
+    counts['terms'] += apply_term_frequency_deltas(term_deltas)
+
+    BudgetCashFlow.objects.bulk_create([
+        BudgetCashFlow(user_module=budget, amount=Decimal('2500.00'), description='Salary', is_income=True, period=period),
+        BudgetCashFlow(user_module=budget, amount=Decimal('600.00'), description='Rent', period=period),
+    ])
+    BudgetBulkImportMapping.objects.create(
+        user_module=budget,
+        headers=['Date', 'Details', 'Amount'],
+        mapping=['purchase_date', 'description', 'amount']
+    )
+
+    invalidate_category_model(budget.id)
+    invalidate_purchase_years(budget.id)
+
+def clear_load_data(email_domain: str = DEFAULT_EMAIL_DOMAIN) -> int:
+    """
+    Deletes generated users, and everything they own, for the email domain.
+    Returns the number of users deleted.
+    """
+    users = get_user_model().objects.filter(email__endswith=f'@{email_domain}')
+    count = users.count()
+    with transaction.atomic():
+        budget_ids = list(UserModule.objects.filter(user__in=users).values_list('id', flat=True))
+        # Whole budgets go, so drop their rollup rows and delete the purchases
+        # in one statement; an ORM delete would load every purchase to send
+        # its rollup signal
+        BudgetWeeklySpend.objects.filter(user_module_id__in=budget_ids).delete()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {BudgetPurchase._meta.db_table} WHERE user_module_id = ANY(%s)",
+                [budget_ids]
+            )
+        users.delete()
+    return count
@@ -0,0 +1,128 @@
+from django.db import transaction
+from django.db.models import Count, F
+
+# Spacing between fractional rank keys after a rebalance
+RANK_STEP = 1024.0
+
+# Neighbouring rank keys closer than this are rebalanced before inserting between them
+MIN_RANK_GAP = 1e-6
+
+
+def _has_ties(siblings, low, high) -> bool:
+    stats = siblings.filter(order__gte=low, order__lte=high).aggregate(
+        total=Count('id'),
+        distinct=Count('order', distinct=True),
+    )
+    return stats['total'] != stats['distinct']
+
+def renumber(siblings, ordering=('order', 'id'), step=1):
+    """
+    Rewrites sibling orders as step, 2 * step, ... following `ordering`.
+    """
+    rows = list(siblings.order_by(*ordering).only('id', 'order'))
+    changed = []
+    for position, row in enumerate(rows, start=1):
+        if row.order != position * step:
+            row.order = position * step
+            changed.append(row)
+    siblings.model.objects.bulk_update(changed, ['order'])
+
+@transaction.atomic
+def move_to_position(siblings, obj_id, new_order: int, lock, ordering=('order', 'id')) -> int:
+    """
+    Moves one row to the 1-based position `new_order` among `siblings`.
+
+    The moved row takes the order of the row now at that position, and only
+    the rows between the two are shifted by one, with a single UPDATE,
+    followed by a second UPDATE for the moved row. Orders need not be 1..n:
+    gaps and offsets are kept as they are. The siblings are renumbered first,
+    following `ordering`, only when the affected range holds tied orders,
+    which a shift cannot separate. `lock` is a queryset for the parent row
+    (the owning list, budget or user), locked for the rest of the
+    transaction so concurrent moves on the same siblings run one at a time.
+    Returns the position the row ended up at.
+    """
+    list(lock.select_for_update())
+
+    # Read the current order under the lock, not from a possibly stale instance
+    current = siblings.filter(pk=obj_id).values_list('order', flat=True).first()
+    if current is None:
+        raise siblings.model.DoesNotExist()
+
+    new_order = max(new_order, 1)
+    ordered = siblings.order_by(*ordering).values_list('order', flat=True)
+    target = next(iter(ordered[new_order - 1:new_order]), None)
+    if target is None:
+        new_order = siblings.count()
+        target = ordered.last()
+
+    if _has_ties(siblings, min(current, target), max(current, target)):
+        renumber(siblings, ordering)
+        current = siblings.filter(pk=obj_id).values_list('order', flat=True).first()
+        target = new_order
+
+    if target < current:
+        siblings.filter(order__gte=target, order__lt=current).update(order=F('order') + 1)
+    elif target > current:
+        siblings.filter(order__gt=current, order__lte=target).update(order=F('order') - 1)
+    else:
+        return new_order
+
+    siblings.filter(pk=obj_id).update(order=target)
+    return new_order
+
+def needs_rebalance(siblings, min_gap=MIN_RANK_GAP) -> bool:
+    """
+    Whether any two neighbouring rank keys are tied or closer than `min_gap`.
+    """
+    previous = None
+    for order in siblings.order_by('order').values_list('order', flat=True).iterator():
+        if previous is not None and order - previous < min_gap:
+            return True
+        previous = order
+    return False
+
+def _rank_between(before, after):
+    if before is None and after is None:
+        return RANK_STEP
+    if before is None:
+        return after - RANK_STEP
+    if after is None:
+        return before + RANK_STEP
+    if after - before < MIN_RANK_GAP:
+        return None
+    return (before + after) / 2
+
+@transaction.atomic
+def move_to_rank(siblings, obj_id, new_order: int, lock, ordering=('order', 'id')) -> float:
+    """
+    Moves one row to the 1-based position `new_order` among `siblings` using
+    fractional rank keys: the row's key becomes the midpoint of its new
+    neighbours, so a move writes exactly one row. When the neighbours are tied
+    or too close to split, the siblings are rebalanced to RANK_STEP spacing
+    first. `lock` is a queryset for the parent row, locked for the rest of the
+    transaction. Returns the row's new key.
+    """
+    list(lock.select_for_update())
+
+    if not siblings.filter(pk=obj_id).exists():
+        raise siblings.model.DoesNotExist()
+    new_order = min(max(new_order, 1), siblings.count())
+
+    def neighbours():
+        # The rows either side of the target position once the moved row is taken out
+        others = siblings.exclude(pk=obj_id).order_by(*ordering).values_list('order', flat=True)
+        if new_order == 1:
+            return None, others.first()
+        window = list(others[new_order - 2:new_order])
+        return window[0], window[1] if len(window) > 1 else None
+
+    before, after = neighbours()
+    rank = _rank_between(before, after)
+    if rank is None:
+        renumber(siblings, ordering, step=RANK_STEP)
+        before, after = neighbours()
+        rank = _rank_between(before, after)
+
+    siblings.filter(pk=obj_id).update(order=rank)
+    return rank
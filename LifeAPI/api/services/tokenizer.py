@@ -0,0 +1,43 @@
+import re
+from functools import lru_cache
+
+# Compiled once at import rather than on every call
+NON_WORD_PATTERN = re.compile(r"[^\w\s]")
+
+# Number of distinct descriptions whose n-grams are memoized.
+# Bank exports repeat merchant strings heavily, so hit rates are high.
+NGRAM_CACHE_SIZE = 4096
+
+def tokenize(text: str) -> list[str]:
+    # Remove non-word characters
+    cleaned = NON_WORD_PATTERN.sub("", text.lower())
+    # isalpha() covers the common case without scanning each character
+    return [t for t in cleaned.split() if t.isalpha() or not any(char.isdigit() for char in t)]
+
+def get_ngrams(tokens: list[str], n: int) -> set[str]:
+    if len(tokens) < n:
+        return set()
+    if n == 1:
+        return set(tokens)
+    return {" ".join(tokens[i:i+n]) for i in range(len(tokens) - n + 1)}
+
+@lru_cache(maxsize=NGRAM_CACHE_SIZE)
+def description_ngrams(description: str, word_lengths: tuple[int, ...]) -> tuple[frozenset[str], ...]:
+    """
+    Returns the n-grams of a description for each requested word length,
+    in the same order as `word_lengths`. All lengths are produced in a
+    single pass over the tokens, each n-gram extending the previous one.
+    """
+    tokens = tokenize(description)
+    max_length = max(word_lengths, default=0)
+    grams_by_length = {n: set() for n in word_lengths}
+
+    for start in range(len(tokens)):
+        gram = tokens[start]
+        for n in range(1, min(max_length, len(tokens) - start) + 1):
+            if n > 1:
+                gram = f"{gram} {tokens[start + n - 1]}"
+            if n in grams_by_length:
+                grams_by_length[n].add(gram)
+
+    return tuple(frozenset(grams_by_length[n]) for n in word_lengths)
@@ -0,0 +1,73 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from api.models import BudgetCategory, BudgetTermType, BudgetPurchase
+from api.reference_data import invalidate_reference_data
+from api.services.budget_summary import apply_spend_deltas, invalidate_purchase_years, uncategorise_spend
+
+
+@receiver([post_save, post_delete], sender=BudgetTermType)
+def invalidate_term_types(sender, **kwargs):
+    # Invalidate now for this process and again once the change is visible to others
+    invalidate_reference_data('term-types')
+    transaction.on_commit(lambda: invalidate_reference_data('term-types'))
+
+
+@receiver(pre_save, sender=BudgetPurchase)
+def capture_purchase_spend(sender, instance, raw=False, **kwargs):
+    # Instances not loaded through the ORM need their stored values fetched before they are overwritten
+    if raw or instance._state.adding or getattr(instance, '_loaded_spend', None) is not None:
+        return
+    instance._loaded_spend = BudgetPurchase.objects.filter(pk=instance.pk).values_list(
+        'user_module_id', 'purchase_date', 'category_id', 'amount'
+    ).first()
+
+
+@receiver(post_save, sender=BudgetPurchase)
+def update_weekly_spend_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    old = getattr(instance, '_loaded_spend', None)
+    new = instance.spend_key()
+    if old == new:
+        return
+
+    deltas = []
+    if old is not None:
+        user_module_id, purchase_date, category_id, amount = old
+        deltas.append((user_module_id, purchase_date, category_id, -amount))
+    if new is not None:
+        deltas.append(new)
+
+    apply_spend_deltas(deltas)
+    for user_module_id in {spend[0] for spend in (old, new) if spend is not None}:
+        invalidate_purchase_years(user_module_id)
+    instance._loaded_spend = new
+
+
+@receiver(post_delete, sender=BudgetPurchase)
+def update_weekly_spend_on_delete(sender, instance, origin=None, **kwargs):
+    # Cascades from a budget or user remove the rollup rows along with the purchases
+    if not isinstance(origin, BudgetPurchase) and getattr(origin, 'model', None) is not BudgetPurchase:
+        return
+
+    spend = getattr(instance, '_loaded_spend', None) or instance.spend_key()
+    if spend is None:
+        return
+
+    user_module_id, purchase_date, category_id, amount = spend
+    apply_spend_deltas([(user_module_id, purchase_date, category_id, -amount)])
+    invalidate_purchase_years(user_module_id)
+
+
+@receiver(pre_delete, sender=BudgetCategory)
+def uncategorise_weekly_spend(sender, instance, origin=None, **kwargs):
+    # Setting the rollup rows' category to NULL would collide with the
+    # uncategorised rows of the same weeks, so merge them first. Cascades
+    # from a budget or user remove the rollup rows before that update.
+    if not isinstance(origin, BudgetCategory) and getattr(origin, 'model', None) is not BudgetCategory:
+        return
+
+    uncategorise_spend(instance.id)
@@ -5,4 +5,7 @@ from .test_views_auth import *
 from .test_views_reference import *
 from .test_views_module import *
 from .test_views_list import *
-from .test_views_budget import *
\ No newline at end of file
+from .test_views_budget import *
+from .test_services import *
+from .test_middleware import *
+from .test_metrics import *
\ No newline at end of file
@@ -0,0 +1,210 @@
+import os
+import shutil
+import tempfile
+import time
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api import metrics
+from api.metrics import MetricsRegistry
+from api.models import BudgetCategory, BudgetTermType, ModuleType, UserModule
+from api.services.budget_analysis import apply_term_frequency_deltas, suggest_categories_for_descriptions
+
+User = get_user_model()
+
+def metric_value(name, **labels):
+    """Returns the collected value of a counter sample, 0 when unset"""
+    metric = metrics.registry.metrics[name]
+    return metrics.registry.collect().get((name, tuple(str(labels[label]) for label in metric.label_names)), 0)
+
+class MetricsRegistryTests(SimpleTestCase):
+    """Test the metrics registry and its multiprocess snapshots"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.registry, self.requests, self.duration = self.make_registry()
+
+    def make_registry(self):
+        registry = MetricsRegistry()
+        requests = registry.counter('test_requests_total', 'Requests.', ('view',))
+        duration = registry.histogram('test_duration_seconds', 'Duration.', buckets=(0.1, 1.0))
+        return registry, requests, duration
+
+    def test_render(self):
+        """Test counters and cumulative histogram buckets in the text format"""
+        self.requests.inc(view='ListView')
+        self.requests.inc(2, view='ListView')
+        self.duration.observe(0.05)
+        self.duration.observe(0.5)
+        self.duration.observe(5)
+
+        lines = self.registry.render().splitlines()
+
+        self.assertIn('# TYPE test_requests_total counter', lines)
+        self.assertIn('test_requests_total{view="ListView"} 3', lines)
+        self.assertIn('# TYPE test_duration_seconds histogram', lines)
+        self.assertIn('test_duration_seconds_bucket{le="0.1"} 1', lines)
+        self.assertIn('test_duration_seconds_bucket{le="1.0"} 2', lines)
+        self.assertIn('test_duration_seconds_bucket{le="+Inf"} 3', lines)
+        self.assertIn('test_duration_seconds_sum 5.55', lines)
+        self.assertIn('test_duration_seconds_count 3', lines)
+
+    def test_labels_are_validated(self):
+        """Test samples must give exactly the metric's labels"""
+        with self.assertRaises(ValueError):
+            self.requests.inc(method='GET')
+
+    def test_label_values_are_escaped(self):
+        """Test quotes, backslashes and newlines in label values are escaped"""
+        self.requests.inc(view='a"b\\c\nd')
+
+        self.assertIn('test_requests_total{view="a\\"b\\\\c\\nd"} 1', self.registry.render())
+
+    def test_collect_sums_other_processes(self):
+        """Test a scrape sums the snapshots of every other worker"""
+        with override_settings(METRICS_DIR=self.directory):
+            self.requests.inc(2, view='ListView')
+            self.duration.observe(0.5)
+            self.registry.flush()
+            # Another worker's snapshot
+            shutil.copy(
+                os.path.join(self.directory, f'metrics_{os.getpid()}.json'),
+                os.path.join(self.directory, 'metrics_1.json')
+            )
+            self.requests.inc(view='ListView')
+
+            totals = self.registry.collect()
+
+        self.assertEqual(totals[('test_requests_total', ('ListView',))], 5)
+        self.assertEqual(totals[('test_duration_seconds', ())], [0, 2, 0, 1.0])
+
+    def test_resumes_own_snapshot(self):
+        """Test a worker reusing a pid continues from that pid's snapshot"""
+        with override_settings(METRICS_DIR=self.directory):
+            self.requests.inc(4, view='ListView')
+            self.registry.flush()
+
+            registry, requests, _ = self.make_registry()
+            requests.inc(view='ListView')
+
+            self.assertEqual(registry.collect(), {('test_requests_total', ('ListView',)): 5})
+
+    def test_ignores_incompatible_snapshots(self):
+        """Test unreadable files and values from other bucket layouts are skipped"""
+        with open(os.path.join(self.directory, 'metrics_1.json'), 'w') as file:
+            file.write('[["test_duration_seconds", [], [1, 2]], ["removed_total", [], 3]]')
+        with open(os.path.join(self.directory, 'metrics_2.json'), 'w') as file:
+            file.write('not json')
+
+        with override_settings(METRICS_DIR=self.directory):
+            self.assertEqual(self.registry.collect(), {})
+
+    def test_prunes_stale_snapshots_on_start(self):
+        """Test a starting worker deletes snapshots of other workers not written recently"""
+        for pid in (1, 2):
+            with open(os.path.join(self.directory, f'metrics_{pid}.json'), 'w') as file:
+                file.write('[["test_requests_total", ["ListView"], 1]]')
+        stale = time.time() - 120
+        os.utime(os.path.join(self.directory, 'metrics_1.json'), (stale, stale))
+
+        with override_settings(METRICS_DIR=self.directory, METRICS_SNAPSHOT_MAX_AGE=60):
+            totals = self.registry.collect()
+
+        self.assertEqual(totals, {('test_requests_total', ('ListView',)): 1})
+        self.assertEqual(os.listdir(self.directory), ['metrics_2.json'])
+
+@override_settings(METRICS_ENABLED=True, METRICS_TOKEN='scrape-token')
+class MetricsViewTests(TestCase):
+    """Test the metrics scrape endpoint and the values recorded for requests"""
+
+    def setUp(self):
+        """Set up test data and authenticated client"""
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpassword123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.budget_type = ModuleType.objects.get(name='budget')
+        self.budget = UserModule.objects.create(user=self.user, module=self.budget_type, name='Budget', order=0)
+        self.groceries = BudgetCategory.objects.create(user_module=self.budget, name='Groceries', order=1)
+
+        self.url = reverse('metrics')
+
+    def test_requires_token(self):
+        """Test scrapes without the token, or with no token configured, are refused"""
+        client = APIClient()
+        self.assertEqual(client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(
+            client.get(self.url, HTTP_AUTHORIZATION='Bearer wrong').status_code,
+            status.HTTP_403_FORBIDDEN
+        )
+        with override_settings(METRICS_TOKEN=''):
+            self.assertEqual(
+                client.get(self.url, HTTP_AUTHORIZATION='Bearer ').status_code,
+                status.HTTP_403_FORBIDDEN
+            )
+
+    def test_scrape(self):
+        """Test a scrape returns the text format including the request metrics"""
+        self.client.get(reverse('budget-purchase-list', args=[self.budget.id]))
+
+        response = APIClient().get(self.url, HTTP_AUTHORIZATION='Bearer scrape-token')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('# TYPE lifeapi_request_duration_seconds histogram', body)
+        self.assertIn('lifeapi_request_duration_seconds_count{view="BudgetPurchaseViewSet",action="list"}', body)
+        self.assertIn('lifeapi_request_db_queries_count{view="BudgetPurchaseViewSet",action="list"}', body)
+
+    def test_records_request_by_action(self):
+        """Test requests are counted against the viewset action that served them"""
+        labels = {'view': 'BudgetCategoryViewSet', 'action': 'retrieve', 'method': 'GET', 'status': 200}
+        before = metric_value('lifeapi_requests_total', **labels)
+
+        self.client.get(reverse('budget-category-detail', args=[self.budget.id, self.groceries.id]))
+
+        self.assertEqual(metric_value('lifeapi_requests_total', **labels), before + 1)
+
+    def test_records_pagination_mode(self):
+        """Test get_all and paged list requests are counted separately"""
+        url = reverse('budget-purchase-list', args=[self.budget.id])
+        get_all = metric_value('lifeapi_paginated_requests_total', view='BudgetPurchaseViewSet', mode='get_all')
+        page = metric_value('lifeapi_paginated_requests_total', view='BudgetPurchaseViewSet', mode='page')
+
+        self.client.get(url, {'get_all': 'true'})
+        self.client.get(url)
+
+        self.assertEqual(
+            metric_value('lifeapi_paginated_requests_total', view='BudgetPurchaseViewSet', mode='get_all'), get_all + 1
+        )
+        self.assertEqual(
+            metric_value('lifeapi_paginated_requests_total', view='BudgetPurchaseViewSet', mode='page'), page + 1
+        )
+
+    def test_records_term_frequency_upserts_and_suggestions(self):
+        """Test upserted rows and suggestion hits and misses are counted"""
+        rows = metric_value('lifeapi_term_frequency_upsert_rows_total')
+        statements = metric_value('lifeapi_term_frequency_upsert_statements_total')
+        hits = metric_value('lifeapi_category_suggestions_total', result='hit')
+        misses = metric_value('lifeapi_category_suggestions_total', result='miss')
+
+        unigram = BudgetTermType.objects.get(word_length=1)
+        apply_term_frequency_deltas(Counter({
+            (self.groceries.id, 'woolworths', unigram.id): 3,
+            (self.groceries.id, 'coles', unigram.id): 1
+        }))
+        suggest_categories_for_descriptions(['WOOLWORTHS', 'UNKNOWN SHOP'], self.budget)
+
+        self.assertEqual(metric_value('lifeapi_term_frequency_upsert_rows_total'), rows + 2)
+        self.assertEqual(metric_value('lifeapi_term_frequency_upsert_statements_total'), statements + 1)
+        self.assertEqual(metric_value('lifeapi_category_suggestions_total', result='hit'), hits + 1)
+        self.assertEqual(metric_value('lifeapi_category_suggestions_total', result='miss'), misses + 1)
@@ -0,0 +1,88 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api.middleware import query_fingerprint
+from api.models import ModuleType, UserModule
+
+User = get_user_model()
+
+@override_settings(
+    SQL_PROFILING=True,
+    SQL_PROFILING_MAX_QUERIES=50,
+    SQL_PROFILING_MAX_DB_MS=10_000,
+    SQL_PROFILING_MAX_QUERY_MS=10_000,
+    SQL_PROFILING_MAX_DUPLICATES=50
+)
+class SQLProfilingMiddlewareTests(TestCase):
+    """Test the SQL profiling middleware"""
+
+    def setUp(self):
+        """Set up test data and authenticated client"""
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpassword123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        list_type = ModuleType.objects.get(name='list')
+        for i in range(3):
+            UserModule.objects.create(user=self.user, module=list_type, name=f'List {i}', order=i)
+
+        self.url = reverse('configuration-list')
+
+    def test_adds_server_timing_header(self):
+        """Test every response carries the database and application timings"""
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", app;dur=[\d.]+$')
+
+    def test_logs_request_profile(self):
+        """Test each request logs one JSON line at INFO when under the thresholds"""
+        with self.assertLogs('api.sql', 'INFO') as logs:
+            self.client.get(self.url)
+
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(logs.records[0].levelname, 'INFO')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['method'], 'GET')
+        self.assertEqual(record['path'], self.url)
+        self.assertEqual(record['status'], status.HTTP_200_OK)
+        self.assertGreater(record['queries'], 0)
+        self.assertEqual(record['flags'], [])
+
+    @override_settings(SQL_PROFILING_MAX_QUERIES=0, SQL_PROFILING_MAX_DUPLICATES=0)
+    def test_flags_requests_over_thresholds(self):
+        """Test requests over the query and duplicate thresholds log at WARNING"""
+        with self.assertLogs('api.sql', 'INFO') as logs:
+            self.client.get(self.url)
+
+        self.assertEqual(logs.records[0].levelname, 'WARNING')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertIn('queries', record['flags'])
+
+    @override_settings(SQL_PROFILING=False)
+    def test_disabled(self):
+        """Test nothing is added or logged when profiling is off"""
+        with self.assertNoLogs('api.sql'):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('Server-Timing', response)
+
+    def test_query_fingerprint(self):
+        """Test repeats of a query with different list lengths share a fingerprint"""
+        self.assertEqual(
+            query_fingerprint('SELECT * FROM "api_purchase" WHERE "id" IN (%s, %s, %s)'),
+            query_fingerprint('SELECT  *  FROM "api_purchase"\nWHERE "id" IN (%s,%s)')
+        )
+        self.assertEqual(
+            query_fingerprint('INSERT INTO "t" ("a", "b") VALUES (%s, %s), (%s, %s), (%s, %s)'),
+            'INSERT INTO "t" ("a", "b") VALUES (%s, ...), ...'
+        )
@@ -1,4 +1,6 @@
+from datetime import date, timedelta
 from django.test import TestCase
+from django.db import connection
 from django.contrib.auth import get_user_model
 from django.db.utils import IntegrityError
 from api.models import (
@@ -516,4 +518,54 @@ class BudgetCategoryTermFrequencyTests(TestCase):
             term_type=self.term_type,
             frequency=1
         )
-        self.assertEqual(str(tf), "angkor cafe")
\ No newline at end of file
+        self.assertEqual(str(tf), "angkor cafe")
+
+class BudgetPurchaseIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(email='test@example.com', password='password123')
+        module_type = ModuleType.objects.get(name='budget')
+        cls.budgets = [
+            UserModule.objects.create(user=user, module=module_type, name=f'Budget {i}', order=i)
+            for i in range(5)
+        ]
+        # Budgets' purchases are interleaved on disk, as they are when users add them over time
+        start = date(2020, 1, 1)
+        BudgetPurchase.objects.bulk_create([
+            BudgetPurchase(
+                user_module=budget,
+                purchase_date=start + timedelta(days=i % 1500),
+                amount=i % 100,
+                description=f'Purchase {i}'
+            )
+            for i in range(20000)
+            for budget in cls.budgets
+        ], batch_size=5000)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE api_budgetpurchase')
+
+    def test_list_query_uses_index(self):
+        queryset = BudgetPurchase.objects.filter(user_module=self.budgets[0]).order_by('-purchase_date', '-modified_at')[:20]
+        plan = queryset.explain()
+        self.assertIn('idx_purchase_module_date', plan)
+        self.assertNotIn('Sort', plan)
+
+    def test_summary_range_query_uses_index(self):
+        queryset = BudgetPurchase.objects.filter(
+            user_module=self.budgets[0],
+            purchase_date__gte=date(2021, 1, 1),
+            purchase_date__lt=date(2021, 1, 8)
+        ).values('purchase_date', 'category_id', 'amount').order_by()
+        plan = queryset.explain()
+        self.assertIn('idx_purchase_module_date', plan)
+        self.assertNotIn('Seq Scan', plan)
+
+    def test_description_match_can_use_trigram_index(self):
+        # Only shows the index can answer a substring match, so sequential scans
+        # are ruled out. Whether the planner picks it depends on how selective
+        # the term is; within one budget of this size it rightly prefers the
+        # budget's own index.
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        queryset = BudgetPurchase.objects.filter(description__icontains='chase 1234')
+        self.assertIn('idx_purchase_desc_trgm', queryset.explain())
@@ -0,0 +1,838 @@
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from operator import attrgetter
+from types import SimpleNamespace
+from unittest.mock import patch
+from django.core.management import call_command, CommandError
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+
+from api.models import (
+    ModuleType,
+    UserModule,
+    BudgetCategory,
+    BudgetPurchase,
+    BudgetCategoryTermFrequency,
+    BudgetTermType,
+    BudgetWeeklySpend,
+    ListField,
+    ListItem,
+    purchase_fingerprint
+)
+from api.services.budget_analysis import (
+    update_term_frequencies_from_purchase,
+    update_term_frequencies_from_purchases,
+    collect_term_frequency_deltas,
+    apply_term_frequency_deltas,
+    rebuild_term_frequencies,
+    suggest_category_for_description,
+    suggest_categories_for_descriptions,
+    get_category_model,
+    get_all_term_types,
+    CATEGORY_MODEL_CACHE
+)
+from api.reference_data import get_reference_data, warm_reference_data
+from api.services.budget_summary import get_weekly_summary, apply_spend_deltas, get_purchase_years
+from api.services.tokenizer import tokenize, get_ngrams, description_ngrams
+from api.services.list_configuration import diff_children
+from api.services.list_validation import get_list_validator
+from api.services.budget_purchases import save_purchase_batch
+from api.services.budget_import import (
+    InvalidStatement,
+    StatementRow,
+    iter_csv_rows,
+    parse_amount,
+    parse_flexible_date,
+    with_positive_spend
+)
+from api.services.load_data import clear_load_data
+from api.services.ordering import move_to_position, move_to_rank, RANK_STEP
+
+User = get_user_model()
+
+class TokenizerTests(SimpleTestCase):
+    def test_tokenize_strips_punctuation_and_numeric_tokens(self):
+        self.assertEqual(
+            tokenize('WOOLWORTHS 1234 Metro, Sydney NSW x2 cafe_bar'),
+            ['woolworths', 'metro', 'sydney', 'nsw', 'cafe_bar']
+        )
+
+    def test_get_ngrams(self):
+        tokens = ['angkor', 'cafe', 'newtown']
+        self.assertEqual(get_ngrams(tokens, 1), {'angkor', 'cafe', 'newtown'})
+        self.assertEqual(get_ngrams(tokens, 2), {'angkor cafe', 'cafe newtown'})
+        self.assertEqual(get_ngrams(tokens, 4), set())
+
+    def test_description_ngrams_matches_per_length_ngrams(self):
+        description = 'Uber *Trip help.uber.com Sydney'
+        tokens = tokenize(description)
+        word_lengths = (2, 1, 3)
+
+        self.assertEqual(
+            description_ngrams(description, word_lengths),
+            tuple(frozenset(get_ngrams(tokens, n)) for n in word_lengths)
+        )
+
+    def test_description_ngrams_short_descriptions(self):
+        self.assertEqual(description_ngrams('', (1, 2)), (frozenset(), frozenset()))
+        self.assertEqual(description_ngrams('Aldi', (1, 2)), (frozenset({'aldi'}), frozenset()))
+
+
+class TermFrequencyBatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@example.com', password='password123')
+        self.module_type = ModuleType.objects.get(name='budget')
+        self.budget = UserModule.objects.create(user=self.user, module=self.module_type, name='Budget', order=0, is_enabled=True)
+        self.groceries = BudgetCategory.objects.create(user_module=self.budget, name='Groceries', order=1)
+        self.dining = BudgetCategory.objects.create(user_module=self.budget, name='Dining', order=2)
+        self.unigram = BudgetTermType.objects.get(word_length=1)
+        self.bigram = BudgetTermType.objects.get(word_length=2)
+
+    def _purchase(self, description, category):
+        return BudgetPurchase.objects.create(
+            user_module=self.budget,
+            purchase_date='2024-01-01',
+            amount=10,
+            description=description,
+            category=category
+        )
+
+    def _frequency(self, category, term, term_type):
+        return BudgetCategoryTermFrequency.objects.get(category=category, term=term, term_type=term_type).frequency
+
+    def test_collect_deltas_counts_each_term_once_per_purchase(self):
+        deltas = collect_term_frequency_deltas([
+            ('Woolworths Woolworths', self.groceries.id),
+            ('Woolworths Metro', self.groceries.id),
+            ('No category', None),
+            (None, self.groceries.id),
+        ])
+        self.assertEqual(deltas[(self.groceries.id, 'woolworths', self.unigram.id)], 2)
+        self.assertEqual(deltas[(self.groceries.id, 'woolworths metro', self.bigram.id)], 1)
+        self.assertNotIn((self.groceries.id, 'category', self.unigram.id), deltas)
+
+    def test_apply_deltas_inserts_and_increments(self):
+        BudgetCategoryTermFrequency.objects.create(category=self.groceries, term='aldi', term_type=self.unigram, frequency=4)
+
+        written = apply_term_frequency_deltas(Counter({
+            (self.groceries.id, 'aldi', self.unigram.id): 3,
+            (self.dining.id, 'aldi', self.unigram.id): 1,
+        }), chunk_size=1)
+
+        self.assertEqual(written, 2)
+        self.assertEqual(self._frequency(self.groceries, 'aldi', self.unigram), 7)
+        self.assertEqual(self._frequency(self.dining, 'aldi', self.unigram), 1)
+
+    def test_apply_deltas_writes_rows_in_key_order(self):
+        deltas = Counter({(self.groceries.id, term, self.unigram.id): 1 for term in ['zeta', 'alpha', 'mu']})
+
+        with CaptureQueriesContext(connection) as queries:
+            apply_term_frequency_deltas(deltas, chunk_size=1)
+
+        inserts = [query['sql'] for query in queries if query['sql'].lstrip().startswith('INSERT')]
+        self.assertEqual([next(term for term in ['alpha', 'mu', 'zeta'] if f"'{term}'" in sql) for sql in inserts], ['alpha', 'mu', 'zeta'])
+
+    def test_batch_matches_per_purchase_updates(self):
+        purchases = [
+            self._purchase('Woolworths Metro Sydney', self.groceries),
+            self._purchase('Woolworths Online', self.groceries),
+            self._purchase('Angkor Cafe', self.dining),
+        ]
+        update_term_frequencies_from_purchases(purchases)
+        batched = set(BudgetCategoryTermFrequency.objects.values_list('category_id', 'term', 'term_type_id', 'frequency'))
+
+        BudgetCategoryTermFrequency.objects.all().delete()
+        for purchase in purchases:
+            update_term_frequencies_from_purchase(purchase)
+        single = set(BudgetCategoryTermFrequency.objects.values_list('category_id', 'term', 'term_type_id', 'frequency'))
+
+        self.assertEqual(batched, single)
+        self.assertEqual(self._frequency(self.groceries, 'woolworths', self.unigram), 2)
+
+    def test_batch_uses_one_statement_per_chunk(self):
+        purchases = [self._purchase(f'Store Number {word}', self.groceries) for word in ['alpha', 'beta', 'gamma']]
+        with CaptureQueriesContext(connection) as ctx:
+            update_term_frequencies_from_purchases(purchases)
+
+        upserts = [q for q in ctx.captured_queries if 'api_budgetcategorytermfrequency' in q['sql']]
+        self.assertEqual(len(upserts), 1)
+
+
+class RebuildTermFrequencyTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@example.com', password='password123')
+        self.module_type = ModuleType.objects.get(name='budget')
+        self.budget = UserModule.objects.create(user=self.user, module=self.module_type, name='Budget', order=0, is_enabled=True)
+        self.other_budget = UserModule.objects.create(user=self.user, module=self.module_type, name='Other', order=1, is_enabled=True)
+        self.category = BudgetCategory.objects.create(user_module=self.budget, name='Groceries', order=1)
+        self.other_category = BudgetCategory.objects.create(user_module=self.other_budget, name='Groceries', order=1)
+        self.unigram = BudgetTermType.objects.get(word_length=1)
+
+        for description in ['Woolworths Metro', 'Woolworths Online', '', None]:
+            BudgetPurchase.objects.create(
+                user_module=self.budget,
+                purchase_date='2024-01-01',
+                amount=10,
+                description=description,
+                category=self.category
+            )
+        BudgetPurchase.objects.create(
+            user_module=self.budget,
+            purchase_date='2024-01-01',
+            amount=10,
+            description='Uncategorised',
+        )
+        BudgetPurchase.objects.create(
+            user_module=self.other_budget,
+            purchase_date='2024-01-01',
+            amount=10,
+            description='Coles',
+            category=self.other_category
+        )
+
+        BudgetCategoryTermFrequency.objects.create(category=self.category, term='stale', term_type=self.unigram, frequency=9)
+        BudgetCategoryTermFrequency.objects.create(category=self.other_category, term='kept', term_type=self.unigram, frequency=2)
+
+    def test_rebuild_replaces_budget_frequencies(self):
+        processed = []
+        count = rebuild_term_frequencies(self.budget, chunk_size=1, progress=processed.append)
+
+        self.assertEqual(count, 2)
+        self.assertEqual(processed, [1, 2])
+        self.assertFalse(BudgetCategoryTermFrequency.objects.filter(term='stale').exists())
+        self.assertEqual(
+            BudgetCategoryTermFrequency.objects.get(category=self.category, term='woolworths', term_type=self.unigram).frequency,
+            2
+        )
+        # Other budgets are untouched
+        self.assertTrue(BudgetCategoryTermFrequency.objects.filter(term='kept').exists())
+
+    def test_management_command_rebuilds_all_budgets(self):
+        out = StringIO()
+        call_command('rebuild_term_frequencies', stdout=out)
+
+        self.assertIn('Reprocessed 3 purchases', out.getvalue())
+        self.assertFalse(BudgetCategoryTermFrequency.objects.filter(term__in=['stale', 'kept']).exists())
+        self.assertTrue(BudgetCategoryTermFrequency.objects.filter(category=self.other_category, term='coles').exists())
+
+    def test_management_command_single_budget(self):
+        out = StringIO()
+        call_command('rebuild_term_frequencies', '--budget', str(self.budget.id), stdout=out)
+
+        self.assertIn('Reprocessed 2 purchases', out.getvalue())
+        self.assertTrue(BudgetCategoryTermFrequency.objects.filter(term='kept').exists())
+
+
+class SuggestCategoryBatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        CATEGORY_MODEL_CACHE.clear()
+        self.user = User.objects.create_user(email='user@example.com', password='password123')
+        self.module_type = ModuleType.objects.get(name='budget')
+        self.budget = UserModule.objects.create(user=self.user, module=self.module_type, name='Budget', order=0, is_enabled=True)
+        self.groceries = BudgetCategory.objects.create(user_module=self.budget, name='Groceries', order=1)
+        self.dining = BudgetCategory.objects.create(user_module=self.budget, name='Dining', order=2)
+
+        purchases = [
+            ('Woolworths Metro', self.groceries),
+            ('Woolworths Online', self.groceries),
+            ('Angkor Cafe', self.dining),
+        ]
+        update_term_frequencies_from_purchases([
+            BudgetPurchase.objects.create(
+                user_module=self.budget,
+                purchase_date='2024-01-01',
+                amount=10,
+                description=description,
+                category=category
+            ) for description, category in purchases
+        ])
+
+    def test_batch_matches_single_suggestions(self):
+        descriptions = ['Woolworths Metro', 'Angkor Cafe Sydney', 'Unknown Merchant', '1234']
+        batched = suggest_categories_for_descriptions(descriptions, self.budget)
+        single = [suggest_category_for_description(d, self.budget) for d in descriptions]
+
+        self.assertEqual(batched, single)
+        self.assertEqual(batched, [self.groceries.id, self.dining.id, None, None])
+
+    def test_repeated_suggestions_use_cached_model(self):
+        suggest_categories_for_descriptions(['Woolworths Metro'], self.budget)
+
+        with self.assertNumQueries(0):
+            suggestions = suggest_categories_for_descriptions(
+                [f'Woolworths Store {i}' for i in range(200)] + ['Angkor Cafe'],
+                self.budget
+            )
+
+        self.assertEqual(suggestions[-1], self.dining.id)
+
+    def test_model_is_invalidated_by_new_purchases(self):
+        self.assertIsNone(suggest_category_for_description('Bunnings Warehouse', self.budget))
+
+        update_term_frequencies_from_purchase(BudgetPurchase.objects.create(
+            user_module=self.budget,
+            purchase_date='2024-01-02',
+            amount=10,
+            description='Bunnings Warehouse',
+            category=self.groceries
+        ))
+
+        self.assertEqual(suggest_category_for_description('Bunnings Warehouse', self.budget), self.groceries.id)
+
+    def test_model_is_invalidated_by_rebuild(self):
+        self.assertEqual(suggest_category_for_description('Angkor Cafe', self.budget), self.dining.id)
+
+        BudgetPurchase.objects.filter(category=self.dining).update(category=self.groceries)
+        rebuild_term_frequencies(self.budget)
+
+        self.assertEqual(suggest_category_for_description('Angkor Cafe', self.budget), self.groceries.id)
+
+    def test_model_cache_is_lru_bounded(self):
+        with patch('api.services.budget_analysis.CATEGORY_MODEL_CACHE_SIZE', 1):
+            other_budget = UserModule.objects.create(user=self.user, module=self.module_type, name='Other', order=1)
+            get_category_model(self.budget.id)
+            get_category_model(other_budget.id)
+
+            self.assertEqual(list(CATEGORY_MODEL_CACHE.keys()), [other_budget.id])
+
+
+class ReferenceDataCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_term_types_are_cached(self):
+        get_all_term_types()
+        with self.assertNumQueries(0):
+            term_types = get_all_term_types()
+        self.assertEqual([t.word_length for t in term_types], sorted(t.word_length for t in term_types))
+
+    def test_term_type_save_invalidates_cache(self):
+        term_type = BudgetTermType.objects.get(word_length=1)
+        self.assertNotEqual(get_reference_data('term-types')[0].weight, 99)
+
+        term_type.weight = 99
+        term_type.save()
+
+        self.assertEqual(get_all_term_types()[0].weight, 99)
+
+    def test_term_type_delete_invalidates_cache(self):
+        before = len(get_all_term_types())
+        BudgetTermType.objects.create(word_length=9, weight=1).delete()
+        BudgetTermType.objects.create(word_length=8, weight=1)
+
+        self.assertEqual(len(get_all_term_types()), before + 1)
+
+    def test_warm_reference_data_loads_every_set(self):
+        warm_reference_data()
+        with self.assertNumQueries(0):
+            get_all_term_types()
+
+    def test_term_type_change_invalidates_category_models(self):
+        user = User.objects.create_user(email='user@example.com', password='password123')
+        budget = UserModule.objects.create(user=user, module=ModuleType.objects.get(name='budget'), name='Budget', order=0)
+        category = BudgetCategory.objects.create(user_module=budget, name='Groceries', order=1)
+        update_term_frequencies_from_purchase(BudgetPurchase.objects.create(
+            user_module=budget,
+            purchase_date='2024-01-01',
+            amount=10,
+            description='Woolworths',
+            category=category
+        ))
+        self.assertEqual(get_category_model(budget.id)['woolworths'][2], BudgetTermType.objects.get(word_length=1).weight)
+
+        BudgetTermType.objects.filter(word_length=1).update(weight=42)
+        BudgetTermType.objects.get(word_length=1).save()
+
+        self.assertEqual(get_category_model(budget.id)['woolworths'][2], 42)
+
+
+class WeeklySpendRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@example.com', password='password123')
+        self.module_type = ModuleType.objects.get(name='budget')
+        self.budget = UserModule.objects.create(user=self.user, module=self.module_type, name='Budget', order=0, is_enabled=True)
+        self.food = BudgetCategory.objects.create(user_module=self.budget, name='Food', order=1)
+        self.fuel = BudgetCategory.objects.create(user_module=self.budget, name='Fuel', order=2)
+
+    def _purchase(self, purchase_date, amount, category=None):
+        return BudgetPurchase.objects.create(
+            user_module=self.budget,
+            purchase_date=purchase_date,
+            amount=amount,
+            description='Purchase',
+            category=category
+        )
+
+    def _rollup(self):
+        totals = {}
+        for row in BudgetWeeklySpend.objects.filter(user_module=self.budget):
+            key = (row.iso_year, row.iso_week, row.category_id)
+            totals[key] = totals.get(key, Decimal('0')) + row.total
+        return {key: total for key, total in totals.items() if total}
+
+    def _brute_force_summary(self, start_date, end_date):
+        totals = {}
+        for purchase in BudgetPurchase.objects.filter(user_module=self.budget, purchase_date__gte=start_date, purchase_date__lt=end_date):
+            key = (purchase.purchase_date.isocalendar()[1], purchase.category_id)
+            totals[key] = totals.get(key, Decimal('0')) + purchase.amount
+        return sorted(
+            ({"week": week, "category": category, "total": float(total)} for (week, category), total in totals.items()),
+            key=lambda row: (row['week'], row['category'] is None, row['category'] or 0)
+        )
+
+    def test_create_update_delete_maintain_rollup(self):
+        purchase = self._purchase('2025-01-02', 20, self.food)
+        self._purchase('2025-01-03', '5.50', self.food)
+        self.assertEqual(self._rollup(), {(2025, 1, self.food.id): Decimal('25.50')})
+
+        purchase = BudgetPurchase.objects.get(id=purchase.id)
+        purchase.category = self.fuel
+        purchase.purchase_date = date(2025, 1, 10)
+        purchase.save()
+        self.assertEqual(self._rollup(), {
+            (2025, 1, self.food.id): Decimal('5.50'),
+            (2025, 2, self.fuel.id): Decimal('20.00'),
+        })
+
+        purchase.delete()
+        BudgetPurchase.objects.filter(amount=Decimal('5.50')).delete()
+        self.assertEqual(self._rollup(), {})
+
+    def test_category_delete_keeps_totals(self):
+        self._purchase('2025-01-02', 20, self.food)
+        self.food.delete()
+
+        self.assertEqual(self._rollup(), {(2025, 1, None): Decimal('20.00')})
+
+    def test_budget_delete_cascades(self):
+        self._purchase('2025-01-02', 20, self.food)
+        self._purchase('2025-01-03', 5, None)
+        self.budget.delete()
+
+        self.assertFalse(BudgetWeeklySpend.objects.exists())
+
+    def test_apply_spend_deltas_groups_by_week(self):
+        with self.assertNumQueries(3):
+            # Savepoint, one upsert for the single affected key, then release
+            apply_spend_deltas([
+                (self.budget.id, date(2025, 1, 6), self.food.id, Decimal('1.00')),
+                (self.budget.id, date(2025, 1, 12), self.food.id, Decimal('2.00')),
+            ])
+        self.assertEqual(self._rollup(), {(2025, 2, self.food.id): Decimal('3.00')})
+
+    def test_apply_spend_deltas_upserts_one_row_per_key(self):
+        deltas = [
+            (self.budget.id, date(2025, 1, 6), self.food.id, Decimal('1.00')),
+            (self.budget.id, date(2025, 1, 6), None, Decimal('4.00')),
+            (self.budget.id, date(2025, 1, 13), self.food.id, Decimal('2.00')),
+        ]
+        with self.assertNumQueries(3):
+            apply_spend_deltas(deltas)
+        apply_spend_deltas(deltas)
+
+        self.assertEqual(BudgetWeeklySpend.objects.filter(user_module=self.budget).count(), 3)
+        self.assertEqual(self._rollup(), {
+            (2025, 2, self.food.id): Decimal('2.00'),
+            (2025, 2, None): Decimal('8.00'),
+            (2025, 3, self.food.id): Decimal('4.00'),
+        })
+
+    def test_apply_spend_deltas_writes_rows_in_key_order(self):
+        deltas = [
+            (self.budget.id, date(2025, 1, 13), self.food.id, Decimal('1.00')),
+            (self.budget.id, date(2025, 1, 6), self.food.id, Decimal('2.00')),
+            (self.budget.id, date(2025, 1, 6), None, Decimal('3.00')),
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            apply_spend_deltas(deltas, chunk_size=1)
+
+        inserts = [query['sql'] for query in queries if query['sql'].lstrip().startswith('INSERT')]
+        self.assertEqual(
+            [next(amount for amount in ('1.00', '2.00', '3.00') if f', {amount})' in sql) for sql in inserts],
+            ['3.00', '2.00', '1.00']
+        )
+
+    def test_rollup_key_is_unique_including_uncategorised(self):
+        self._purchase('2025-01-02', 20, None)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            BudgetWeeklySpend.objects.create(
+                user_module=self.budget, iso_year=2025, iso_week=1, week_start=date(2024, 12, 30), total=1
+            )
+
+    def test_category_delete_merges_into_uncategorised(self):
+        self._purchase('2025-01-02', 20, self.food)
+        self._purchase('2025-01-03', 5, None)
+        self._purchase('2025-01-10', 3, self.food)
+
+        self.food.delete()
+
+        self.assertEqual(BudgetWeeklySpend.objects.filter(user_module=self.budget).count(), 2)
+        self.assertEqual(self._rollup(), {
+            (2025, 1, None): Decimal('25.00'),
+            (2025, 2, None): Decimal('3.00'),
+        })
+
+    def test_summary_matches_purchases(self):
+        start = date(2024, 12, 20)
+        for offset in range(0, 60, 3):
+            day = start + timedelta(days=offset)
+            self._purchase(day, offset + 1, self.food if offset % 2 else self.fuel)
+        self._purchase('2025-01-15', 7, None)
+
+        ranges = [
+            (date(2025, 1, 1), date(2025, 2, 1)),
+            (date(2025, 1, 6), date(2025, 1, 20)),
+            (date(2025, 1, 7), date(2025, 1, 9)),
+            (date(2024, 12, 1), date(2025, 3, 1)),
+        ]
+        for start_date, end_date in ranges:
+            self.assertEqual(
+                get_weekly_summary(self.budget, start_date, end_date),
+                self._brute_force_summary(start_date, end_date)
+            )
+
+
+class PurchaseYearsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='user@example.com', password='password123')
+        self.module_type = ModuleType.objects.get(name='budget')
+        self.budget = UserModule.objects.create(user=self.user, module=self.module_type, name='Budget', order=0, is_enabled=True)
+
+    def _purchase(self, purchase_date):
+        return BudgetPurchase.objects.create(user_module=self.budget, purchase_date=purchase_date, amount=1)
+
+    def test_years_skip_gaps_and_sort(self):
+        for purchase_date in ['2024-06-01', '2019-12-31', '2024-01-01', '2021-03-03']:
+            self._purchase(purchase_date)
+
+        self.assertEqual(get_purchase_years(self.budget.id), [2019, 2021, 2024])
+
+    def test_years_are_cached_until_purchases_change(self):
+        purchase = self._purchase('2023-05-05')
+        self.assertEqual(get_purchase_years(self.budget.id), [2023])
+
+        with self.assertNumQueries(0):
+            get_purchase_years(self.budget.id)
+
+        purchase.purchase_date = date(2022, 5, 5)
+        purchase.save()
+        self.assertEqual(get_purchase_years(self.budget.id), [2022])
+
+        purchase.delete()
+        self.assertEqual(get_purchase_years(self.budget.id), [])
+
+
+class PurchaseFingerprintTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@example.com', password='password123')
+        self.module_type = ModuleType.objects.get(name='budget')
+        self.budget = UserModule.objects.create(user=self.user, module=self.module_type, name='Budget', order=0, is_enabled=True)
+
+    def test_fingerprint_normalises_description(self):
+        self.assertEqual(
+            purchase_fingerprint(date(2024, 3, 5), Decimal('4'), 'Corner  Shop '),
+            purchase_fingerprint(date(2024, 3, 5), Decimal('4.00'), 'corner shop')
+        )
+        self.assertNotEqual(
+            purchase_fingerprint(date(2024, 3, 5), Decimal('4.00'), 'corner shop'),
+            purchase_fingerprint(date(2024, 3, 6), Decimal('4.00'), 'corner shop')
+        )
+
+    def test_fingerprint_follows_saves(self):
+        purchase = BudgetPurchase.objects.create(user_module=self.budget, purchase_date='2024-03-05', amount=4, description='Shop')
+        purchase.amount = Decimal('5.00')
+        purchase.save(update_fields=['amount'])
+
+        purchase.refresh_from_db()
+        self.assertEqual(purchase.fingerprint, purchase_fingerprint(date(2024, 3, 5), Decimal('5.00'), 'Shop'))
+
+    def test_skip_uses_one_lookup_per_batch(self):
+        BudgetPurchase.objects.create(user_module=self.budget, purchase_date='2024-03-05', amount=4, description='Shop')
+        batch = [
+            BudgetPurchase(user_module=self.budget, purchase_date=date(2024, 3, day), amount=Decimal('4.00'), description='Shop')
+            for day in range(5, 10)
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            created, updated = save_purchase_batch(self.budget, batch, duplicates='skip')
+
+        self.assertEqual((len(created), updated), (4, []))
+        lookups = [query['sql'] for query in queries if 'fingerprint" IN' in query['sql']]
+        self.assertEqual(len(lookups), 1)
+
+    def test_batches_lock_the_budget(self):
+        for duplicates in ('allow', 'skip', 'upsert'):
+            batch = [BudgetPurchase(user_module=self.budget, purchase_date=date(2024, 3, 5), amount=Decimal('4.00'), description='Shop')]
+
+            with CaptureQueriesContext(connection) as queries:
+                save_purchase_batch(self.budget, batch, duplicates=duplicates)
+
+            locks = [query['sql'] for query in queries if query['sql'].endswith('FOR UPDATE')]
+            self.assertEqual(len(locks), 1, duplicates)
+            self.assertIn('FROM "api_usermodule"', locks[0])
+
+
+class DiffChildrenTests(SimpleTestCase):
+    def _rows(self, *names):
+        return [SimpleNamespace(id=index, name=name) for index, name in enumerate(names, start=1)]
+
+    def _diff(self, existing, submitted):
+        stale, created = diff_children(self._rows(*existing), list(submitted), attrgetter('name'))
+        return [row.name for row in stale], created
+
+    def test_unchanged_rows_are_kept(self):
+        self.assertEqual(self._diff(['a', 'b', 'a'], ['a', 'b', 'a']), ([], []))
+
+    def test_appended_and_removed_rows(self):
+        self.assertEqual(self._diff(['a', 'b', 'c'], ['a', 'c', 'd']), (['b'], ['d']))
+
+    def test_reordering_recreates_rows_after_the_matched_prefix(self):
+        self.assertEqual(self._diff(['a', 'b'], ['b', 'a']), (['a'], ['a']))
+        self.assertEqual(self._diff(['b'], ['a', 'b']), (['b'], ['a', 'b']))
+
+
+class MoveToPositionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@example.com', password='password123')
+        self.module_type = ModuleType.objects.get(name='budget')
+        self.budget = UserModule.objects.create(user=self.user, module=self.module_type, name='Budget', order=0, is_enabled=True)
+        self.categories = [
+            BudgetCategory.objects.create(user_module=self.budget, name=name, order=index)
+            for index, name in enumerate('ABCDE', start=1)
+        ]
+
+    def _move(self, name, new_order):
+        category = next(category for category in self.categories if category.name == name)
+        return move_to_position(
+            BudgetCategory.objects.filter(user_module=self.budget),
+            category.id,
+            new_order,
+            lock=UserModule.objects.filter(pk=self.budget.pk)
+        )
+
+    def _names(self):
+        return ''.join(BudgetCategory.objects.filter(user_module=self.budget).order_by('order').values_list('name', flat=True))
+
+    def test_move_up_and_down(self):
+        self.assertEqual(self._move('D', 2), 2)
+        self.assertEqual(self._names(), 'ADBCE')
+        self.assertEqual(self._move('A', 4), 4)
+        self.assertEqual(self._names(), 'DBCAE')
+        self.assertEqual(
+            list(BudgetCategory.objects.filter(user_module=self.budget).order_by('order').values_list('order', flat=True)),
+            [1, 2, 3, 4, 5]
+        )
+
+    def test_only_affected_range_is_updated(self):
+        # Savepoint, lock, current order, target order, tie check, range shift, moved row, release
+        with self.assertNumQueries(8):
+            self._move('B', 3)
+        self.assertEqual(self._names(), 'ACBDE')
+        self.assertEqual(BudgetCategory.objects.get(name='E').modified_at, self.categories[4].modified_at)
+
+    def test_position_is_clamped(self):
+        self.assertEqual(self._move('B', 99), 5)
+        self.assertEqual(self._move('E', -3), 1)
+        self.assertEqual(self._names(), 'EACDB')
+
+    def _orders(self):
+        return list(BudgetCategory.objects.filter(user_module=self.budget).order_by('order').values_list('order', flat=True))
+
+    def test_gaps_and_offsets_are_kept(self):
+        for category in self.categories:
+            BudgetCategory.objects.filter(pk=category.pk).update(order=category.order * 10 - 10)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self._move('D', 2), 2)
+        self.assertEqual(self._names(), 'ADBCE')
+        self.assertEqual(self._orders(), [0, 10, 11, 21, 40])
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE')]), 2)
+
+        self.assertEqual(self._move('A', 4), 4)
+        self.assertEqual(self._names(), 'DBCAE')
+
+    def test_ties_outside_the_range_are_kept(self):
+        BudgetCategory.objects.filter(name='C').update(order=30)
+        BudgetCategory.objects.filter(name='D').update(order=30)
+        self.assertEqual(self._move('B', 1), 1)
+        self.assertEqual(self._names(), 'BAECD')
+        self.assertEqual(self._orders(), [1, 2, 5, 30, 30])
+
+    def test_ties_in_the_range_are_renumbered_before_moving(self):
+        BudgetCategory.objects.filter(name='C').update(order=30)
+        BudgetCategory.objects.filter(name='D').update(order=30)
+        self.assertEqual(self._move('D', 1), 1)
+        self.assertEqual(self._names(), 'DABEC')
+        self.assertEqual(self._orders(), [1, 2, 3, 4, 5])
+
+
+class MoveToRankTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@example.com', password='password123')
+        self.list = UserModule.objects.create(
+            user=self.user, module=ModuleType.objects.get(name='list'), name='Tasks', order=0, is_enabled=True
+        )
+        self.items = {
+            name: ListItem.objects.create(user_module=self.list, order=index * RANK_STEP, fields=[name])
+            for index, name in enumerate('ABCDE', start=1)
+        }
+
+    def _move(self, name, new_order):
+        return move_to_rank(
+            ListItem.objects.filter(user_module=self.list),
+            self.items[name].id,
+            new_order,
+            lock=UserModule.objects.filter(pk=self.list.pk),
+            ordering=['order', '-modified_at', 'id']
+        )
+
+    def _names(self):
+        return ''.join(item.fields[0] for item in ListItem.objects.filter(user_module=self.list))
+
+    def test_move_writes_only_the_moved_row(self):
+        with CaptureQueriesContext(connection) as queries:
+            self._move('E', 2)
+        writes = [query for query in queries if query['sql'].startswith('UPDATE "api_listitem"')]
+        self.assertEqual(len(writes), 1)
+        self.assertEqual(self._names(), 'AEBCD')
+
+    def test_move_to_ends(self):
+        self._move('C', 1)
+        self.assertEqual(self._names(), 'CABDE')
+        self._move('C', 99)
+        self.assertEqual(self._names(), 'ABDEC')
+
+    def test_repeated_moves_rebalance_when_keys_are_too_close(self):
+        # Halving the same gap eventually drops below MIN_RANK_GAP and forces a respace
+        for _ in range(60):
+            self._move('E', 2)
+            self._move('D', 2)
+        self.assertEqual(self._names(), 'ADEBC')
+
+    def test_tied_keys_are_split(self):
+        ListItem.objects.filter(user_module=self.list).update(order=0)
+        self._move('A', 3)
+        self.assertEqual(len(set(ListItem.objects.filter(user_module=self.list).values_list('order', flat=True))), 5)
+
+    def test_rebalance_command_respaces_dense_lists(self):
+        ListItem.objects.filter(pk=self.items['B'].pk).update(order=RANK_STEP + 1e-9)
+        out = StringIO()
+        call_command('rebalance_list_items', stdout=out)
+        self.assertIn('Rebalanced 1 list(s).', out.getvalue())
+        self.assertEqual(
+            list(ListItem.objects.filter(user_module=self.list).values_list('order', flat=True)),
+            [RANK_STEP * position for position in range(1, 6)]
+        )
+
+
+class SeedLoadDataCommandTests(TestCase):
+    def _seed(self, *args):
+        out = StringIO()
+        call_command(
+            'seed_load_data', '--users', '2', '--lists', '1', '--fields', '5', '--items', '7',
+            '--budgets', '1', '--purchases', '60', '--chunk-size', '25', *args, stdout=out
+        )
+        return out.getvalue()
+
+    def test_generates_requested_scale(self):
+        output = self._seed()
+
+        self.assertIn('Generated 2 users, 2 lists, 10 fields, 6 options, 14 items, 2 budgets', output)
+        self.assertEqual(ListItem.objects.filter(user_module__user__email__endswith='@loadtest.example.com').count(), 14)
+        budget = UserModule.objects.filter(module__name='budget').order_by('id').first()
+        self.assertEqual(BudgetPurchase.objects.filter(user_module=budget).count(), 60)
+        self.assertFalse(BudgetPurchase.objects.filter(fingerprint='').exists())
+
+        # The rollup and term frequencies match what rebuilding them from the purchases gives
+        purchases = BudgetPurchase.objects.filter(user_module=budget).aggregate(total=Sum('amount'))['total']
+        rollup = BudgetWeeklySpend.objects.filter(user_module=budget).aggregate(total=Sum('total'))['total']
+        self.assertEqual(rollup, purchases)
+        terms = set(BudgetCategoryTermFrequency.objects.filter(category__user_module=budget).values_list('category_id', 'term', 'frequency'))
+        rebuild_term_frequencies(budget)
+        self.assertEqual(set(BudgetCategoryTermFrequency.objects.filter(category__user_module=budget).values_list('category_id', 'term', 'frequency')), terms)
+
+        # Positions are 1-based, as move_to_position and list configuration saves number them
+        user = get_user_model().objects.filter(email__endswith='@loadtest.example.com').order_by('id').first()
+        self.assertEqual(list(UserModule.objects.filter(user=user).order_by('order').values_list('order', flat=True)), [1, 2])
+        self.assertEqual(list(BudgetCategory.objects.filter(user_module=budget).order_by('order').values_list('order', flat=True))[:2], [1, 2])
+
+        # Items validate against their list's configuration
+        user_list = UserModule.objects.filter(module__name='list').order_by('id').first()
+        self.assertEqual(
+            list(ListField.objects.filter(user_module=user_list).order_by('order').values_list('order', flat=True)),
+            [1, 2, 3, 4, 5]
+        )
+        validator = get_list_validator(user_list.id)
+        for item in ListItem.objects.filter(user_module=user_list):
+            self.assertIsNone(validator.validate(item.fields))
+
+    def test_same_seed_generates_same_data(self):
+        def descriptions():
+            return list(BudgetPurchase.objects.order_by('id').values_list('purchase_date', 'amount', 'description'))
+
+        self._seed()
+        first = descriptions()
+        self._seed('--clear')
+        self.assertEqual(descriptions(), first)
+
+    def test_existing_users_require_clear(self):
+        self._seed()
+        with self.assertRaises(CommandError):
+            self._seed()
+        self.assertIn('Deleted 2 generated user(s).', self._seed('--clear'))
+        self.assertEqual(get_user_model().objects.filter(email__endswith='@loadtest.example.com').count(), 2)
+
+    def test_clear_deletes_purchases_without_loading_them(self):
+        self._seed()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(clear_load_data(), 2)
+
+        self.assertFalse(BudgetPurchase.objects.exists())
+        self.assertFalse(BudgetWeeklySpend.objects.exists())
+        # One statement for every purchase, and none left for the user cascade to load and delete
+        deletes = [query['sql'] for query in queries if query['sql'].startswith('DELETE FROM api_budgetpurchase')]
+        self.assertEqual(len(deletes), 1)
+        self.assertFalse(any(query['sql'].startswith('DELETE FROM "api_budgetpurchase"') for query in queries))
+
+
+class StatementParsingTests(SimpleTestCase):
+    def test_parse_flexible_date(self):
+        self.assertEqual(parse_flexible_date('2024-03-05'), date(2024, 3, 5))
+        self.assertEqual(parse_flexible_date('5/3/2024'), date(2024, 3, 5))
+        self.assertEqual(parse_flexible_date('05-03-24'), date(2024, 3, 5))
+        self.assertEqual(parse_flexible_date('5 Mar 2024'), date(2024, 3, 5))
+        self.assertEqual(parse_flexible_date('Mar 05 99'), date(1999, 3, 5))
+        self.assertIsNone(parse_flexible_date('31/02/2024'))
+        self.assertIsNone(parse_flexible_date('5 Foo 2024'))
+        self.assertIsNone(parse_flexible_date('yesterday'))
+
+    def test_parse_amount(self):
+        self.assertEqual(parse_amount('$1,234.5'), Decimal('1234.50'))
+        self.assertEqual(parse_amount('+3'), Decimal('3.00'))
+        self.assertEqual(parse_amount(''), Decimal('0.00'))
+        self.assertIsNone(parse_amount('abc'))
+
+    def test_csv_rows_use_mapping(self):
+        stream = StringIO('Date\tAmount\tDetails\n2024-03-05\t12.00\tShop\n')
+        rows = list(iter_csv_rows(stream, ['purchase_date', 'amount', 'description'], dialect='excel-tab'))
+        self.assertEqual(rows, [StatementRow(2, date(2024, 3, 5), Decimal('12.00'), 'Shop')])
+
+    def test_csv_mapping_must_cover_required_fields(self):
+        with self.assertRaises(InvalidStatement):
+            list(iter_csv_rows(StringIO(''), ['purchase_date', 'amount', 'amount']))
+
+    def test_mostly_negative_statements_are_inverted(self):
+        rows = [StatementRow(index, date(2024, 1, 1), Decimal(amount), 'x') for index, amount in enumerate(['-1', '-2', '3'])]
+        self.assertEqual([row.amount for row in with_positive_spend(rows, sample_size=2)], [1, 2, -3])
+        self.assertEqual([row.amount for row in with_positive_spend(rows[2:])], [3])
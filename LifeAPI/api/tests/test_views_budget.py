@@ -1,6 +1,14 @@
+import csv
+import json
+from decimal import Decimal
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils.timezone import now
 
@@ -12,6 +20,8 @@ from api.models import (
     BudgetCashFlow,
     BudgetCategoryTermFrequency,
     BudgetTermType,
+    BudgetBulkImportMapping,
+    BudgetWeeklySpend,
     Period
 )
 
@@ -112,6 +122,26 @@ class BudgetCategoryViewSetTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(BudgetCategory.objects.filter(id=self.category.id).exists())
 
+    def test_delete_category_clears_suggestions(self):
+        self.client.force_authenticate(user=self.user)
+        purchase = BudgetPurchase.objects.create(
+            user_module=self.budget,
+            purchase_date='2024-01-01',
+            amount=10,
+            description='Woolworths',
+            category=self.category
+        )
+        self.client.post(f'/api/budgets/{self.budget.id}/purchases/analyse/reprocess/')
+        analyse_url = f'/api/budgets/{self.budget.id}/purchases/analyse/'
+        data = [{'index': 0, 'description': purchase.description}]
+
+        response = self.client.post(analyse_url, data, format='json')
+        self.assertEqual(response.data[0]['category'], self.category.id)
+
+        self.client.delete(f'{self.base_url}{self.category.id}/')
+        response = self.client.post(analyse_url, data, format='json')
+        self.assertIsNone(response.data[0]['category'])
+
     def test_user_cannot_access_other_budget(self):
         self.client.force_authenticate(user=self.user)
         other_user = User.objects.create_user(email='other@example.com', password='password456')
@@ -227,6 +257,292 @@ class BudgetPurchaseViewSetTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(len(response.data), 2)
 
+    def test_stream_purchases_ndjson(self):
+        self.client.force_authenticate(user=self.user)
+        BudgetPurchase.objects.create(user_module=self.budget, purchase_date='2024-02-01', amount=12.5, description=None)
+
+        expected = self.client.get(self.base_url, {'get_all': 'true'}).data
+        response = self.client.get(self.base_url, {'get_all': 'true', 'stream': 'ndjson'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(rows, [dict(row) for row in expected])
+
+    def test_stream_purchases_csv(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.base_url, {'get_all': 'true', 'stream': 'csv', 'description': 'wool'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0], ['id', 'purchase_date', 'amount', 'description', 'category', 'category_name', 'modified_at'])
+        self.assertEqual(rows[1][:6], [str(self.purchase.id), '2024-01-01', '50.00', 'Woolworths', str(self.category.id), 'Groceries'])
+        self.assertEqual(len(rows), 2)
+
+    def test_list_purchases_constant_query_count(self):
+        self.client.force_authenticate(user=self.user)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(self.base_url, {'get_all': 'true'})
+
+        other = BudgetCategory.objects.create(user_module=self.budget, name='Transport', weekly_target=50, order=1)
+        for day in range(1, 11):
+            BudgetPurchase.objects.create(user_module=self.budget, purchase_date=f'2024-02-{day:02d}', amount=day, description='Bus', category=other)
+
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(self.base_url, {'get_all': 'true'})
+        self.assertEqual(len(response.data), 11)
+        self.assertEqual(len(large), len(small))
+
+    def test_search_purchases(self):
+        self.client.force_authenticate(user=self.user)
+        for description in ['Woolworths Metro Sydney', 'Metro petrol', 'Sydney Metro card']:
+            BudgetPurchase.objects.create(user_module=self.budget, purchase_date='2024-02-01', amount=5, description=description)
+
+        response = self.client.get(self.base_url, {'get_all': 'true', 'search': ' metro  SYDNEY '})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(row['description'] for row in response.data),
+            ['Sydney Metro card', 'Woolworths Metro Sydney']
+        )
+
+        # Ranked ordering falls back to the default ordering when there is nothing to rank
+        response = self.client.get(self.base_url, {'get_all': 'true', 'ordering': '-search_rank'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 4)
+
+    def test_search_purchases_ranked(self):
+        self.client.force_authenticate(user=self.user)
+        for description in ['Metro', 'Woolworths Metro Sydney CBD store 1234']:
+            BudgetPurchase.objects.create(user_module=self.budget, purchase_date='2024-02-01', amount=5, description=description)
+
+        response = self.client.get(self.base_url, {'get_all': 'true', 'search': 'metro', 'ordering': '-search_rank'})
+        self.assertEqual(
+            [row['description'] for row in response.data],
+            ['Metro', 'Woolworths Metro Sydney CBD store 1234']
+        )
+
+    def test_stream_purchases_invalid_format(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.base_url, {'get_all': 'true', 'stream': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_purchases_with_cursor_pagination(self):
+        self.client.force_authenticate(user=self.user)
+        for day in range(1, 31):
+            for _ in range(2):
+                BudgetPurchase.objects.create(
+                    user_module=self.budget,
+                    purchase_date=f'2024-04-{day:02d}',
+                    amount=day,
+                    description='Purchase',
+                    category=self.category
+                )
+        expected = list(
+            BudgetPurchase.objects.filter(user_module=self.budget)
+            .order_by('-purchase_date', '-modified_at', 'id')
+            .values_list('id', flat=True)
+        )
+
+        seen = []
+        url, params = self.base_url, {'pagination': 'cursor'}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            seen.extend(purchase['id'] for purchase in response.data['results'])
+            url, params = response.data['next'], None
+
+        self.assertEqual(seen, expected)
+
+OFX_STATEMENT = """OFXHEADER:100
+DATA:OFXSGML
+
+<OFX>
+<BANKMSGSRSV1><STMTTRNRS><STMTRS>
+<BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20240305120000[0:GMT]
+<TRNAMT>-42.10
+<NAME>WOOLWORTHS METRO
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20240306
+<TRNAMT>-7.50
+<MEMO>Coffee cart
+</STMTTRN>
+</BANKTRANLIST>
+</STMTRS></STMTTRNRS></BANKMSGSRSV1>
+</OFX>
+"""
+
+class BudgetPurchaseImportTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='user@example.com', password='password123')
+        self.budget_type = ModuleType.objects.get(name='budget')
+        self.budget = UserModule.objects.create(user=self.user, module=self.budget_type, name='Main Budget', order=0, is_enabled=True)
+        self.groceries = BudgetCategory.objects.create(user_module=self.budget, name='Groceries', weekly_target=100, order=1)
+        self.mapping = BudgetBulkImportMapping.objects.create(
+            user_module=self.budget,
+            headers=['Date', 'Details', 'Amount', 'Balance'],
+            mapping=['purchase_date', 'description', 'amount', '']
+        )
+        # Seed the suggestion model with one categorised purchase
+        self.client.force_authenticate(user=self.user)
+        self.client.post(f'/api/budgets/{self.budget.id}/purchases/bulk/', [{
+            'purchase_date': '2024-01-01', 'amount': 10, 'description': 'Woolworths Metro', 'category': self.groceries.id
+        }], format='json')
+
+        self.url = f'/api/budgets/{self.budget.id}/purchases/import/'
+
+    def _upload(self, content, name='statement.csv', **data):
+        upload = SimpleUploadedFile(name, content.encode(), content_type='text/csv')
+        return self.client.post(self.url, {'file': upload, **data}, format='multipart')
+
+    def test_import_csv_with_saved_mapping(self):
+        content = (
+            'Date,Details,Amount,Balance\r\n'
+            '05/03/2024,WOOLWORTHS METRO SYDNEY,-42.10,900.00\r\n'
+            '06/03/2024,"Coffee, cart",-7.50,892.50\r\n'
+            '07/03/2024,Refund,3.00,895.50\r\n'
+        )
+        response = self._upload(content)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {'imported': 3, 'updated': 0, 'skipped': 0, 'categorised': 1})
+
+        purchases = BudgetPurchase.objects.filter(user_module=self.budget, purchase_date__gte='2024-03-01').order_by('purchase_date')
+        self.assertEqual(
+            [(str(p.purchase_date), str(p.amount), p.description, p.category_id) for p in purchases],
+            [
+                ('2024-03-05', '42.10', 'WOOLWORTHS METRO SYDNEY', self.groceries.id),
+                ('2024-03-06', '7.50', 'Coffee, cart', None),
+                ('2024-03-07', '-3.00', 'Refund', None),
+            ]
+        )
+
+        # bulk_create skips signals, so the rollup and years cache are updated explicitly
+        rollup = BudgetWeeklySpend.objects.filter(user_module=self.budget, week_start__gte='2024-03-01').aggregate(total=Sum('total'))
+        self.assertEqual(rollup['total'], Decimal('46.60'))
+        years = self.client.get(f'/api/budgets/{self.budget.id}/summary/years/')
+        self.assertEqual(list(years.data), [2024])
+
+        # The suggested category is not learned from
+        self.assertFalse(
+            BudgetCategoryTermFrequency.objects.filter(category=self.groceries, term='sydney').exists()
+        )
+
+    def test_import_ofx(self):
+        response = self._upload(OFX_STATEMENT, name='statement.ofx')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['imported'], 2)
+        purchases = BudgetPurchase.objects.filter(user_module=self.budget, purchase_date__gte='2024-03-01').order_by('purchase_date')
+        self.assertEqual(
+            [(str(p.purchase_date), str(p.amount), p.description) for p in purchases],
+            [('2024-03-05', '42.10', 'WOOLWORTHS METRO'), ('2024-03-06', '7.50', 'Coffee cart')]
+        )
+        self.assertEqual(purchases[0].category_id, self.groceries.id)
+
+    def test_import_without_matching_mapping(self):
+        response = self._upload('When,What,How much\r\n05/03/2024,Shop,4.00\r\n')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_row_rolls_back_import(self):
+        content = (
+            'Date,Details,Amount,Balance\r\n'
+            '05/03/2024,Shop,4.00,1\r\n'
+            'yesterday,Shop,4.00,1\r\n'
+        )
+        response = self._upload(content, suggest_categories='false')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Row 3', response.data['detail'])
+        self.assertFalse(BudgetPurchase.objects.filter(user_module=self.budget, description='Shop').exists())
+
+    def test_reimport_skips_duplicates(self):
+        content = (
+            'Date,Details,Amount,Balance\r\n'
+            '05/03/2024,Shop,4.00,1\r\n'
+            '06/03/2024,Bakery,3.50,1\r\n'
+        )
+        self._upload(content, suggest_categories='false')
+        response = self._upload(content + '07/03/2024,Bakery,3.50,1\r\n', suggest_categories='false', duplicates='skip')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {'imported': 1, 'updated': 0, 'skipped': 2, 'categorised': 0})
+        self.assertEqual(BudgetPurchase.objects.filter(user_module=self.budget, purchase_date__gte='2024-03-01').count(), 3)
+
+    def test_duplicates_match_one_to_one(self):
+        content = 'Date,Details,Amount,Balance\r\n05/03/2024,Shop,4.00,1\r\n'
+        self._upload(content, suggest_categories='false')
+        response = self._upload(content + '05/03/2024,  SHOP ,4.00,1\r\n', suggest_categories='false', duplicates='skip')
+
+        self.assertEqual(response.data['imported'], 1)
+        self.assertEqual(response.data['skipped'], 1)
+        self.assertEqual(BudgetPurchase.objects.filter(user_module=self.budget, purchase_date='2024-03-05').count(), 2)
+
+    def test_reimport_upserts_category(self):
+        content = 'Date,Details,Amount,Balance\r\n05/03/2024,Shop,4.00,1\r\n'
+        self._upload(content, suggest_categories='false')
+        self.mapping.headers = ['Date', 'Details', 'Amount', 'Category']
+        self.mapping.mapping = ['purchase_date', 'description', 'amount', 'category']
+        self.mapping.save()
+
+        response = self._upload('Date,Details,Amount,Category\r\n05/03/2024,Shop,4.00,groceries\r\n', duplicates='upsert')
+
+        self.assertEqual(response.data, {'imported': 0, 'updated': 1, 'skipped': 0, 'categorised': 0})
+        purchase = BudgetPurchase.objects.get(user_module=self.budget, purchase_date='2024-03-05')
+        self.assertEqual(purchase.category_id, self.groceries.id)
+        week = BudgetWeeklySpend.objects.filter(user_module=self.budget, week_start='2024-03-04')
+        self.assertEqual(week.filter(category=self.groceries).aggregate(total=Sum('total'))['total'], Decimal('4.00'))
+        self.assertEqual(week.filter(category=None).aggregate(total=Sum('total'))['total'], Decimal('0.00'))
+
+    def test_reimport_upsert_moves_term_frequencies(self):
+        self.mapping.headers = ['Date', 'Details', 'Amount', 'Category']
+        self.mapping.mapping = ['purchase_date', 'description', 'amount', 'category']
+        self.mapping.save()
+        dining = BudgetCategory.objects.create(user_module=self.budget, name='Dining', weekly_target=50, order=2)
+        self._upload('Date,Details,Amount,Category\r\n05/03/2024,Corner Bakery,4.00,groceries\r\n')
+
+        response = self._upload('Date,Details,Amount,Category\r\n05/03/2024,Corner Bakery,4.00,dining\r\n', duplicates='upsert')
+
+        self.assertEqual(response.data['updated'], 1)
+        terms = BudgetCategoryTermFrequency.objects.filter(term__in=['corner', 'bakery', 'corner bakery'])
+        self.assertEqual(
+            sorted(terms.values_list('category_id', 'term', 'frequency')),
+            [(dining.id, term, 1) for term in ['bakery', 'corner', 'corner bakery']]
+        )
+
+    def test_invalid_duplicates_mode(self):
+        response = self._upload('Date,Details,Amount,Balance\r\n05/03/2024,Shop,4.00,1\r\n', duplicates='merge')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_create_skips_duplicates(self):
+        url = f'/api/budgets/{self.budget.id}/purchases/bulk/?duplicates=skip'
+        data = [
+            {'purchase_date': '2024-01-01', 'amount': 10, 'description': 'woolworths  metro', 'category': self.groceries.id},
+            {'purchase_date': '2024-01-02', 'amount': 12, 'description': 'Woolworths Metro', 'category': self.groceries.id},
+        ]
+        response = self.client.post(url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([row['purchase_date'] for row in response.data], ['2024-01-02'])
+        self.assertEqual(BudgetPurchase.objects.filter(user_module=self.budget).count(), 2)
+
+        response = self.client.post(f'/api/budgets/{self.budget.id}/purchases/bulk/?duplicates=merge', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_other_budget_forbidden(self):
+        other_user = User.objects.create_user(email='other@example.com', password='password456')
+        self.client.force_authenticate(user=other_user)
+        response = self._upload('Date,Details,Amount,Balance\r\n05/03/2024,Shop,4.00,1\r\n')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
 class BudgetPurchaseSummaryViewSetTests(APITestCase):
     def setUp(self):
         self.user = User.objects.create_user(email='user@example.com', password='password123')
@@ -500,4 +816,20 @@ class BudgetPurchaseAnalyseReprocessTests(APITestCase):
 
     def test_unauthenticated(self):
         response = self.client.get(self.base_url)
-        self.assertEqual(response.status_code, 401)
\ No newline at end of file
+        self.assertEqual(response.status_code, 401)
+
+    def test_analyse_descriptions(self):
+        self.client.force_authenticate(user=self.user)
+        self.client.post(self.reprocess_url)
+
+        data = [
+            {'index': 0, 'description': 'Woolworths Market'},
+            {'index': 1, 'description': 'Something Else Entirely'},
+        ]
+        response = self.client.post(self.base_url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [
+            {'index': 0, 'category': self.category.id},
+            {'index': 1, 'category': None},
+        ])
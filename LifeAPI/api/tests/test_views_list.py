@@ -1,3 +1,7 @@
+import json
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase
@@ -13,6 +17,7 @@ from api.models import (
     ListItem,
     FieldTypeRule
 )
+from api.services.ordering import RANK_STEP
 
 User = get_user_model()
 
@@ -258,6 +263,108 @@ class ListConfigurationViewSetTests(APITestCase):
         self.assertEqual(options.count(), 4)
         self.assertTrue(options.filter(option_name='Critical').exists())
 
+    def test_fields_without_order_are_numbered_from_one(self):
+        """Test saved fields get 1-based orders, so a later reorder only shifts the affected range"""
+        self.client.force_authenticate(user=self.user1)
+        detail_url = reverse('configuration-detail', args=[self.user1_list.id])
+
+        response = self.client.put(detail_url, self._configuration_payload([
+            {'field_name': name, 'field_type': self.text_field_type.id, 'is_mandatory': False}
+            for name in ['First', 'Second', 'Third']
+        ]), format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        fields = ListField.objects.filter(user_module=self.user1_list).order_by('order')
+        self.assertEqual(list(fields.values_list('order', flat=True)), [1, 2, 3])
+
+        second = fields.get(field_name='Second')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse('configuration-fields-reorder', args=[self.user1_list.id, second.id]),
+                {'new_order': 1},
+                format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        writes = [query for query in queries if query['sql'].startswith('UPDATE "api_listfield"')]
+        self.assertEqual(len(writes), 2)
+        self.assertEqual(list(fields.values_list('field_name', flat=True)), ['Second', 'First', 'Third'])
+
+    def _configuration_payload(self, list_fields):
+        return {
+            'name': 'My Tasks',
+            'module': self.list_module_type.id,
+            'order': self.user1_list.order,
+            'is_enabled': True,
+            'list_fields': list_fields
+        }
+
+    def _field_payload(self, field):
+        return {
+            'id': field.id,
+            'field_name': field.field_name,
+            'field_type': field.field_type_id,
+            'is_mandatory': field.is_mandatory,
+            'order': field.order,
+            'rules': [{'field_type_rule': rule.field_type_rule_id} for rule in field.listfieldrule_set.order_by('id')],
+            'options': [{'option_name': option.option_name} for option in field.listfieldoption_set.order_by('id')]
+        }
+
+    def test_update_list_configuration_keeps_unchanged_options(self):
+        """Test unchanged options are kept and only the differences are written"""
+        self.client.force_authenticate(user=self.user1)
+        detail_url = reverse('configuration-detail', args=[self.user1_list.id])
+
+        priority = self._field_payload(self.priority_field)
+        priority['options'] = [{'option_name': 'High'}, {'option_name': 'Low'}, {'option_name': 'Critical'}]
+        payload = self._configuration_payload([self._field_payload(self.task_name_field), priority])
+
+        response = self.client.put(detail_url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        options = list(ListFieldOption.objects.filter(list_field=self.priority_field).order_by('id'))
+        self.assertEqual([option.option_name for option in options], ['High', 'Low', 'Critical'])
+        self.assertEqual(options[0].id, self.option_high.id)
+        self.assertEqual(options[1].id, self.option_low.id)
+
+    def test_update_list_configuration_constant_queries(self):
+        """Test saving a configuration costs the same number of queries regardless of field count"""
+        self.client.force_authenticate(user=self.user1)
+        detail_url = reverse('configuration-detail', args=[self.user1_list.id])
+        email_rule = FieldTypeRule.objects.get(field_type=self.text_field_type, rule='email')
+
+        def build_payload(count):
+            # Existing fields are renamed, one is dropped and `count` new fields are added
+            priority = self._field_payload(self.priority_field)
+            priority['field_name'] = f'Priority {count}'
+            priority['options'] = [{'option_name': 'High'}, {'option_name': f'Option {count}'}]
+            task_name = self._field_payload(self.task_name_field)
+            task_name['rules'] = [{'field_type_rule': email_rule.id}]
+            new_fields = [
+                {
+                    'field_name': f'New {count} {index}',
+                    'field_type': self.dropdown_field_type.id,
+                    'order': index + 2,
+                    'rules': [],
+                    'options': [{'option_name': 'A'}, {'option_name': 'B'}]
+                }
+                for index in range(count)
+            ]
+            return self._configuration_payload([task_name, priority] + new_fields)
+
+        # Each save replaces the previous save's new fields, so warm up to delete in both runs
+        self.client.put(detail_url, build_payload(1), format='json')
+
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.put(detail_url, build_payload(2), format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.put(detail_url, build_payload(30), format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['list_fields']), 32)
+        self.assertEqual(len(large), len(small))
+
     def test_update_list_configuration_remove_field(self):
         """Test updating a list configuration by removing a field"""
         # Authenticate as user1
@@ -329,6 +436,64 @@ class ListConfigurationViewSetTests(APITestCase):
         self.assertEqual(len(response.data), 1)
         self.assertEqual(response.data[0]['name'], 'My Tasks')
 
+    def _add_lists(self, count, fields_per_list):
+        rule = FieldTypeRule.objects.filter(field_type=self.number_field_type).first()
+        for list_idx in range(count):
+            user_module = UserModule.objects.create(
+                user=self.user1,
+                module=self.list_module_type,
+                name=f'Extra {list_idx}',
+                order=list_idx + 2
+            )
+            for field_idx in range(fields_per_list):
+                number_field = ListField.objects.create(
+                    user_module=user_module,
+                    field_type=self.number_field_type,
+                    field_name=f'Number {field_idx}',
+                    order=field_idx * 2
+                )
+                ListFieldRule.objects.create(list_field=number_field, field_type_rule=rule)
+                dropdown_field = ListField.objects.create(
+                    user_module=user_module,
+                    field_type=self.dropdown_field_type,
+                    field_name=f'Dropdown {field_idx}',
+                    order=field_idx * 2 + 1
+                )
+                ListFieldOption.objects.create(list_field=dropdown_field, option_name='A')
+                ListFieldOption.objects.create(list_field=dropdown_field, option_name='B')
+
+    def test_list_configurations_constant_query_count(self):
+        """Test that listing configurations does not query per list or field"""
+        self.client.force_authenticate(user=self.user1)
+
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.get(self.list_configuration_url, {'get_all': 'true'})
+        self.assertEqual(len(response.data), 1)
+
+        self._add_lists(count=4, fields_per_list=5)
+
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(self.list_configuration_url, {'get_all': 'true'})
+        self.assertEqual(len(response.data), 5)
+        self.assertEqual(len(response.data[-1]['list_fields']), 10)
+        self.assertEqual(len(response.data[-1]['list_fields'][0]['rules']), 1)
+        self.assertEqual(len(response.data[-1]['list_fields'][1]['options']), 2)
+
+        self.assertEqual(len(large.captured_queries), len(small.captured_queries))
+
+    def test_list_configuration_fields_ordered(self):
+        """Test that prefetched fields keep their configured order"""
+        self.client.force_authenticate(user=self.user1)
+        self.task_name_field.order = 5
+        self.task_name_field.save()
+
+        response = self.client.get(f'{self.list_configuration_url}{self.user1_list.id}/')
+
+        self.assertEqual(
+            [field['id'] for field in response.data['list_fields']],
+            [self.priority_field.id, self.task_name_field.id]
+        )
+
 class ListConfigurationFieldViewSetTests(APITestCase):
     def setUp(self):
         """Set up test data and authenticated client"""
@@ -579,11 +744,69 @@ class ListDataViewSetTests(APITestCase):
         self.assertEqual(len(response.data), 1)
         self.assertEqual(response.data[0]['name'], 'My Tasks')
 
+    def _add_items(self, count):
+        ListItem.objects.bulk_create(
+            ListItem(
+                user_module=self.user_list,
+                order=index,
+                fields=[{'field': self.task_name_field.id, 'value': f'Bulk {index}'}]
+            )
+            for index in range(count)
+        )
+
+    def test_list_data_detail_constant_queries(self):
+        """Test retrieving list data costs the same number of queries regardless of size"""
+        self.client.force_authenticate(user=self.user)
+        detail_url = reverse('data-detail', args=[self.user_list.id])
+
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(detail_url)
+
+        for index in range(5):
+            ListField.objects.create(
+                user_module=self.user_list,
+                field_type=self.text_field_type,
+                field_name=f'Extra {index}',
+                order=index + 1
+            )
+        self._add_items(30)
+
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(detail_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['list_items']), 32)
+        self.assertEqual(len(large), len(small))
+
+    def test_list_data_items_limit_links_to_next_page(self):
+        """Test list data embeds at most items_limit items and links to the remainder"""
+        self.client.force_authenticate(user=self.user)
+        self._add_items(5)
+        detail_url = reverse('data-detail', args=[self.user_list.id])
+
+        response = self.client.get(detail_url, {'items_limit': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['list_items']), 3)
+        self.assertIsNotNone(response.data['list_items_next'])
+
+        seen = [item['id'] for item in response.data['list_items']]
+        next_page = self.client.get(response.data['list_items_next'])
+        self.assertEqual(next_page.status_code, status.HTTP_200_OK)
+        seen += [item['id'] for item in next_page.data['results']]
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+
+        response = self.client.get(detail_url)
+        self.assertIsNone(response.data['list_items_next'])
+
 class ListItemViewSetTests(APITestCase):
     """Test the List Item ViewSet functionality"""
 
     def setUp(self):
         """Set up test data and authenticated client"""
+        # Compiled validators are cached per list id, which the test database reuses
+        cache.clear()
+
         # Create test users
         self.user1 = User.objects.create_user(
             email='user1@example.com',
@@ -739,6 +962,25 @@ class ListItemViewSetTests(APITestCase):
         self.assertEqual(field_values_db[self.task_name_field.id], 'New Task')
         self.assertEqual(field_values_db[self.priority_field.id], 'Medium')
 
+    def test_created_items_go_above_existing_ones(self):
+        """Test each created item gets its own rank key above the current top item"""
+        self.client.force_authenticate(user=self.user1)
+
+        created_ids = []
+        for name in ('Second', 'First'):
+            response = self.client.post(self.list_items_url, {
+                'field_values': [{'field': self.task_name_field.id, 'value': name}]
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            created_ids.append(response.data['id'])
+
+        orders = dict(ListItem.objects.filter(user_module=self.user1_list).values_list('id', 'order'))
+        self.assertEqual(orders[created_ids[0]], orders[self.list_item1.id] - RANK_STEP)
+        self.assertEqual(orders[created_ids[1]], orders[created_ids[0]] - RANK_STEP)
+
+        response = self.client.get(self.list_items_url)
+        self.assertEqual([item['id'] for item in response.data['results']], [*reversed(created_ids), self.list_item1.id])
+
     def test_update_list_item(self):
         """Test updating an existing list item"""
         # Authenticate as user1
@@ -891,4 +1133,169 @@ class ListItemViewSetTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIsInstance(response.data, list)
         self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['id'], self.list_item1.id)
\ No newline at end of file
+        self.assertEqual(response.data[0]['id'], self.list_item1.id)
+
+    def test_stream_list_items_ndjson(self):
+        """Test streaming list items as NDJSON matches the get_all response"""
+        self.client.force_authenticate(user=self.user1)
+        expected = self.client.get(self.list_items_url, {'get_all': 'true'}).data
+
+        response = self.client.get(self.list_items_url, {'get_all': 'true', 'stream': 'ndjson'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(rows, [dict(item) for item in expected])
+
+    def test_get_list_items_with_cursor_pagination(self):
+        """Test walking list items with opt-in keyset pagination"""
+        self.client.force_authenticate(user=self.user1)
+        for idx in range(45):
+            ListItem.objects.create(
+                user_module=self.user1_list,
+                order=idx % 5,
+                fields=[{'field': self.task_name_field.id, 'value': f'Task {idx}'}]
+            )
+        expected = list(
+            ListItem.objects.filter(user_module=self.user1_list)
+            .order_by('order', '-modified_at', 'id')
+            .values_list('id', flat=True)
+        )
+
+        seen = []
+        response = self.client.get(self.list_items_url, {'pagination': 'cursor'})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            seen.extend(item['id'] for item in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+
+        self.assertEqual(seen, expected)
+
+    def test_get_list_items_with_invalid_cursor(self):
+        """Test that a malformed cursor is rejected"""
+        self.client.force_authenticate(user=self.user1)
+        response = self.client.get(self.list_items_url, {'pagination': 'cursor', 'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_reorder_list_item(self):
+        """Test moving a list item rewrites only that item's rank"""
+        self.client.force_authenticate(user=self.user1)
+        self.list_item1.order = 1024
+        self.list_item1.save()
+        item2 = ListItem.objects.create(user_module=self.user1_list, order=2048, fields=[])
+        item3 = ListItem.objects.create(user_module=self.user1_list, order=3072, fields=[])
+
+        url = reverse('list-items-reorder', args=[self.user1_list.id, item3.id])
+        response = self.client.post(url, {'new_order': 2}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        ordered = list(ListItem.objects.filter(user_module=self.user1_list).values_list('id', 'order'))
+        self.assertEqual(ordered, [(self.list_item1.id, 1024), (item3.id, 1536), (item2.id, 2048)])
+
+    def test_item_writes_use_cached_configuration(self):
+        """Test validating item writes does not read the configuration tables once compiled"""
+        self.client.force_authenticate(user=self.user1)
+        data = {
+            'field_values': [
+                {'field': self.task_name_field.id, 'value': 'Cached'},
+                {'field': self.priority_field.id, 'value': 'Low'}
+            ]
+        }
+        self.client.post(self.list_items_url, data, format='json')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.list_items_url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(any('api_listfield' in query['sql'] for query in queries))
+
+    def test_field_update_refreshes_cached_configuration(self):
+        """Test options added through the field endpoint are accepted straight away"""
+        self.client.force_authenticate(user=self.user1)
+        data = {
+            'field_values': [
+                {'field': self.task_name_field.id, 'value': 'Urgent task'},
+                {'field': self.priority_field.id, 'value': 'Urgent'}
+            ]
+        }
+        response = self.client.post(self.list_items_url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        field_url = reverse('configuration-fields-detail', args=[self.user1_list.id, self.priority_field.id])
+        response = self.client.patch(
+            field_url,
+            {'options': [{'option_name': 'High'}, {'option_name': 'Urgent'}]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.post(self.list_items_url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_bulk_list_item_changes(self):
+        """Test creating, updating, completing and deleting items in one request"""
+        self.client.force_authenticate(user=self.user1)
+        item2 = ListItem.objects.create(user_module=self.user1_list, order=2048, fields=[])
+        item3 = ListItem.objects.create(user_module=self.user1_list, order=3072, fields=[])
+        url = reverse('list-items-bulk', args=[self.user1_list.id])
+
+        payload = {
+            'create': [
+                {'field_values': [{'field': self.task_name_field.id, 'value': f'Bulk {index}'}]}
+                for index in range(3)
+            ],
+            'update': [
+                {'id': self.list_item1.id, 'field_values': [
+                    {'field': self.task_name_field.id, 'value': 'Renamed'},
+                    {'field': self.priority_field.id, 'value': 'Low'}
+                ]}
+            ],
+            'complete': [{'id': item2.id, 'is_completed': True}],
+            'delete': [item3.id]
+        }
+        response = self.client.post(url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['created']), 3)
+        self.assertEqual(len(response.data['updated']), 2)
+        self.assertEqual(response.data['deleted'], [item3.id])
+
+        items = list(ListItem.objects.filter(user_module=self.user1_list))
+        self.assertEqual([item.fields[0]['value'] for item in items[:3]], ['Bulk 0', 'Bulk 1', 'Bulk 2'])
+        self.assertEqual(items[3].id, self.list_item1.id)
+        self.assertEqual(items[3].fields[0]['value'], 'Renamed')
+        self.assertTrue(ListItem.objects.get(id=item2.id).is_completed)
+        self.assertFalse(ListItem.objects.filter(id=item3.id).exists())
+
+    def test_bulk_list_items_rejects_invalid_values(self):
+        """Test a bulk request is rejected as a whole when any item is invalid"""
+        self.client.force_authenticate(user=self.user1)
+        url = reverse('list-items-bulk', args=[self.user1_list.id])
+        payload = {
+            'create': [
+                {'field_values': [{'field': self.task_name_field.id, 'value': 'Fine'}]},
+                {'field_values': [
+                    {'field': self.task_name_field.id, 'value': 'Bad'},
+                    {'field': self.priority_field.id, 'value': 'Unknown'}
+                ]}
+            ],
+            'delete': [self.list_item1.id]
+        }
+        response = self.client.post(url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(1, response.data['create'])
+        self.assertEqual(ListItem.objects.filter(user_module=self.user1_list).count(), 1)
+
+    def test_bulk_list_items_rejects_other_lists_items(self):
+        """Test bulk changes cannot reference items from another list"""
+        self.client.force_authenticate(user=self.user1)
+        other_item = ListItem.objects.create(user_module=self.user2_list, fields=[])
+        url = reverse('list-items-bulk', args=[self.user1_list.id])
+
+        response = self.client.post(url, {'delete': [other_item.id]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(ListItem.objects.filter(id=other_item.id).exists())
@@ -2,6 +2,8 @@ from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 from rest_framework.routers import DefaultRouter
 
+from api.views import MetricsView
+
 router = DefaultRouter()
 
 urlpatterns = [
@@ -12,6 +14,7 @@ urlpatterns = [
     path('reference/', include('api.urls.urls_reference')),
     path('budgets/', include('api.urls.urls_budgets')),
     path('profile/', include('api.urls.urls_profile')),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('schema/', SpectacularAPIView.as_view(), name='schema'),
     path('schema/swagger/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger')
 ]
\ No newline at end of file
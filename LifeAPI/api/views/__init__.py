@@ -3,4 +3,5 @@ from .list_views import ListConfigurationViewSet, ListDataViewSet, ListItemViewS
 from .module_views import ModuleTypeViewSet, UserModuleViewSet
 from .reference_views import FieldTypeViewSet, PeriodViewSet
 from .budget_views import BudgetCategoryViewSet, BudgetPurchaseViewSet, BudgetViewSet, BudgetPurchaseSummaryViewSet, BudgetCashFlowViewSet, BudgetPurchaseAnalyseViewSet, BudgetBulkImportMappingViewSet
-from .profile_views import DeleteProfileView
\ No newline at end of file
+from .profile_views import DeleteProfileView
+from .metrics_views import MetricsView
\ No newline at end of file
@@ -1,14 +1,14 @@
 from django.shortcuts import get_object_or_404
 from django.http import Http404
+from django.db import transaction
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db import transaction, connection
 from django.utils.timezone import now
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
-from rest_framework.filters import OrderingFilter
 from rest_framework.mixins import CreateModelMixin
 from rest_framework.decorators import action
-from drf_spectacular.utils import extend_schema_view, extend_schema
+from rest_framework.parsers import MultiPartParser
+from drf_spectacular.utils import extend_schema_view, extend_schema, OpenApiParameter
 
 from datetime import datetime
 
@@ -20,23 +20,39 @@ from api.serializers.serializers_budgets import (
     BudgetCashFlowSerializer,
     BudgetPurchaseAnalyseInputSerializer,
     BudgetPurchaseAnalyseOutputSerializer,
-    BudgetBulkImportMappingSerializer
+    BudgetBulkImportMappingSerializer,
+    BudgetPurchaseImportSerializer,
+    BudgetPurchaseImportResultSerializer
 )
 from api.models import (
     BudgetCategory,
     BudgetPurchase,
     UserModule,
     BudgetCashFlow,
-    BudgetCategoryTermFrequency,
     BudgetBulkImportMapping
 )
-from api.views.mixins import UserModuleAuthorizationMixin
+from api.views.mixins import UserModuleAuthorizationMixin, StreamingExportMixin
 from api.pagination import Unpaginatable
-from api.filters import PurchaseFilterSet
+from api.filters import PurchaseFilterSet, PurchaseOrderingFilter, SEARCH_RANK
 from api.services.budget_analysis import (
     update_term_frequencies_from_purchase,
-    get_all_term_types,
-    suggest_category_for_description
+    update_term_frequencies_from_purchases,
+    rebuild_term_frequencies,
+    suggest_categories_for_descriptions,
+    invalidate_category_model
+)
+from api.services.budget_summary import get_weekly_summary, get_purchase_years, invalidate_purchase_years
+from api.services.budget_purchases import save_purchase_batch, DUPLICATE_MODES
+from api.services.ordering import move_to_position
+from api.services.budget_import import (
+    InvalidStatement,
+    detect_format,
+    open_text,
+    read_csv_headers,
+    iter_csv_rows,
+    iter_ofx_rows,
+    with_positive_spend,
+    import_purchases
 )
 
 
@@ -100,6 +116,11 @@ class BudgetCategoryViewSet(UserModuleAuthorizationMixin, viewsets.ModelViewSet)
     def perform_create(self, serializer):
         serializer.save(user_module=self.get_serializer_context()['user_module'])
 
+    def perform_destroy(self, instance):
+        user_module_id = instance.user_module_id
+        instance.delete()
+        invalidate_category_model(user_module_id)
+
     @action(detail=True, methods=['post'], url_path='reorder')
     def reorder(self, request, budget_id=None, id=None):
         """
@@ -118,27 +139,21 @@ class BudgetCategoryViewSet(UserModuleAuthorizationMixin, viewsets.ModelViewSet)
 
         # Validate user and category ownership
         user_module = self.get_user_module()
-        categories = list(BudgetCategory.objects.filter(user_module=user_module).order_by('order'))
-
-        # Move category within the list
         category = get_object_or_404(BudgetCategory, id=id, user_module=user_module)
-        original_order = category.order
 
-        if original_order != new_order:
-            moved_category = categories.pop(original_order - 1)
-            categories.insert(new_order - 1, moved_category)
-
-            # Reassign orders
-            with transaction.atomic():
-                for idx, cat in enumerate(categories):
-                    cat.order = idx + 1
-                BudgetCategory.objects.bulk_update(categories, ['order'])
+        # Move category within the list
+        move_to_position(
+            BudgetCategory.objects.filter(user_module=user_module),
+            category.id,
+            new_order,
+            lock=UserModule.objects.filter(pk=user_module.pk)
+        )
 
         # Return updated budget config
         serializer = BudgetSerializer(user_module, context={'request': request})
         return Response(serializer.data, status=200)
 
-class BudgetPurchaseViewSet(UserModuleAuthorizationMixin, viewsets.ModelViewSet):
+class BudgetPurchaseViewSet(UserModuleAuthorizationMixin, StreamingExportMixin, viewsets.ModelViewSet):
     """
     API endpoint for CRUD operations on budget purchases
     Allows users to view, create, update and delete their budget purchases
@@ -147,10 +162,21 @@ class BudgetPurchaseViewSet(UserModuleAuthorizationMixin, viewsets.ModelViewSet)
     serializer_class = BudgetPurchaseSerializer
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = Unpaginatable
-    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, PurchaseOrderingFilter]
     filterset_class = PurchaseFilterSet
-    ordering_fields = ['purchase_date', 'amount', 'category__name']
+    ordering_fields = ['purchase_date', 'amount', 'category__name', SEARCH_RANK]
     ordering = ['-purchase_date']
+    keyset_ordering = ['-purchase_date', '-modified_at', 'id']
+    stream_fields = {
+        'id': 'id',
+        'purchase_date': 'purchase_date',
+        'amount': 'amount',
+        'description': 'description',
+        'category': 'category_id',
+        'category_name': 'category__name',
+        'modified_at': 'modified_at',
+    }
+    stream_filename = 'purchases'
     user_module_kwarg = 'budget_id'
 
     lookup_field = 'id'
@@ -158,7 +184,8 @@ class BudgetPurchaseViewSet(UserModuleAuthorizationMixin, viewsets.ModelViewSet)
 
     def get_queryset(self):
         user_module = self.get_user_module()
-        return BudgetPurchase.objects.filter(user_module=user_module)
+        # category_name is serialised for every row
+        return BudgetPurchase.objects.filter(user_module=user_module).select_related('category')
 
     def get_serializer_context(self):
         # Include the user module in the serializer context
@@ -170,23 +197,94 @@ class BudgetPurchaseViewSet(UserModuleAuthorizationMixin, viewsets.ModelViewSet)
         instance = serializer.save(user_module=self.get_serializer_context()['user_module'])
         update_term_frequencies_from_purchase(instance)
 
+    @extend_schema(parameters=[
+        OpenApiParameter('duplicates', str, enum=DUPLICATE_MODES, description='How purchases matching an existing one are handled. Defaults to allow.')
+    ])
     @action(detail=False, methods=['post'], url_path='bulk')
     def bulk_create(self, request, budget_id=None):
         data = request.data
         if not isinstance(data, list):
             return Response({"detail": "Expected a list of items."}, status=status.HTTP_400_BAD_REQUEST)
 
+        duplicates = request.query_params.get('duplicates', 'allow')
+        if duplicates not in DUPLICATE_MODES:
+            return Response({"detail": f"duplicates must be one of: {', '.join(DUPLICATE_MODES)}."}, status=status.HTTP_400_BAD_REQUEST)
+
         context = self.get_serializer_context()
         serializer = self.get_serializer(data=data, many=True, context=context)
         serializer.is_valid(raise_exception=True)
-        self.perform_bulk_create(serializer)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        instances = self.perform_bulk_save(serializer, duplicates)
+        return Response(self.get_serializer(instances, many=True).data, status=status.HTTP_201_CREATED)
 
-    def perform_bulk_create(self, serializer):
+    def perform_bulk_save(self, serializer, duplicates):
+        """
+        Writes the purchases with one bulk_create, skipping or upserting those
+        matching existing ones when asked to, using the fingerprint index.
+        Returns the created and updated purchases.
+        """
         user_module = self.get_serializer_context()['user_module']
-        instances = serializer.save(user_module=user_module)
-        for purchase in instances:
-            update_term_frequencies_from_purchase(purchase)
+        with transaction.atomic():
+            created, updated = save_purchase_batch(
+                user_module,
+                [BudgetPurchase(user_module=user_module, **row) for row in serializer.validated_data],
+                duplicates=duplicates
+            )
+            update_term_frequencies_from_purchases(created)
+            if created:
+                invalidate_purchase_years(user_module.id)
+        return created + updated
+
+    @extend_schema(
+        request={'multipart/form-data': BudgetPurchaseImportSerializer},
+        responses={201: BudgetPurchaseImportResultSerializer}
+    )
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_statement(self, request, budget_id=None):
+        """
+        Imports a CSV or OFX bank statement upload. CSV columns are read with a
+        saved import mapping. Rows are parsed and inserted in chunks, so the
+        whole statement is never held in memory.
+        """
+        serializer = BudgetPurchaseImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        user_module = self.get_user_module()
+
+        upload = data['file']
+        statement_format = data.get('format') or detect_format(upload)
+        invert_amounts = data.get('invert_amounts')
+        stream = open_text(upload)
+
+        try:
+            if statement_format == 'ofx':
+                rows = iter_ofx_rows(stream, invert_amounts=bool(invert_amounts))
+            else:
+                dialect, headers, has_header = read_csv_headers(stream)
+                mappings = BudgetBulkImportMapping.objects.filter(user_module=user_module)
+                if data.get('mapping') is not None:
+                    mapping = mappings.filter(id=data['mapping']).first()
+                else:
+                    mapping = mappings.filter(headers=headers).order_by('-modified_at').first()
+                if mapping is None:
+                    return Response({'detail': 'No saved import mapping matches this file.'}, status=status.HTTP_400_BAD_REQUEST)
+
+                rows = iter_csv_rows(stream, mapping.mapping, dialect, skip_header=has_header, invert_amounts=bool(invert_amounts))
+                if invert_amounts is None:
+                    rows = with_positive_spend(rows)
+
+            result = import_purchases(
+                user_module,
+                rows,
+                suggest_categories=data.get('suggest_categories') is not False,
+                duplicates=data['duplicates']
+            )
+        except InvalidStatement as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        finally:
+            # Leave the upload open for Django to clean up
+            stream.detach()
+
+        return Response(BudgetPurchaseImportResultSerializer(result).data, status=status.HTTP_201_CREATED)
 
 class BudgetPurchaseSummaryViewSet(UserModuleAuthorizationMixin, viewsets.GenericViewSet):
     """
@@ -211,27 +309,7 @@ class BudgetPurchaseSummaryViewSet(UserModuleAuthorizationMixin, viewsets.Generi
         except (TypeError, ValueError):
             return Response({'detail': 'start_date and end_date must be in YYYY-MM-DD format.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        query = """
-            SELECT
-                CAST(to_char(purchase_date,'IW') as int) AS week,
-                category_id,
-                SUM(amount) AS total
-            FROM api_budgetpurchase
-            WHERE user_module_id = %s
-              AND purchase_date >= %s
-              AND purchase_date < %s
-            GROUP BY week, category_id
-            ORDER BY week, category_id
-        """
-
-        with connection.cursor() as cursor:
-            cursor.execute(query, [budget_id, start_date, end_date])
-            results = cursor.fetchall()
-
-        data = [
-            {"week": row[0], "category": row[1], "total": float(row[2])}
-            for row in results
-        ]
+        data = get_weekly_summary(user_module, start_date, end_date)
 
         serializer = self.get_serializer(data, many=True)
         return Response(serializer.data)
@@ -241,17 +319,7 @@ class BudgetPurchaseSummaryViewSet(UserModuleAuthorizationMixin, viewsets.Generi
     def list_years(self, request, budget_id=None):
         user_module = self.get_user_module()
 
-        query = """
-            SELECT DISTINCT EXTRACT(YEAR FROM purchase_date)::int AS year
-            FROM api_budgetpurchase
-            WHERE user_module_id = %s
-            ORDER BY year
-        """
-        with connection.cursor() as cursor:
-            cursor.execute(query, [user_module.id])
-            rows = cursor.fetchall()
-
-        years = sorted({int(row[0]) for row in rows})
+        years = get_purchase_years(user_module.id)
         return Response(years)
 
 class BudgetCashFlowViewSet(UserModuleAuthorizationMixin, viewsets.ModelViewSet):
@@ -294,17 +362,8 @@ class BudgetPurchaseAnalyseViewSet(UserModuleAuthorizationMixin, viewsets.ViewSe
     def reprocess(self, request, budget_id=None):
         user_module = self.get_user_module()
 
-        # Clear all term frequencies for this budget's categories
-        category_ids = BudgetCategory.objects.filter(user_module=user_module).values_list('id', flat=True)
-        BudgetCategoryTermFrequency.objects.filter(category_id__in=category_ids).delete()
-
-        # Reprocess all purchases to rebuild frequencies
-        purchases = BudgetPurchase.objects.filter(user_module=user_module)
-        count = 0
-        for purchase in purchases:
-            if purchase.description and purchase.category:
-                update_term_frequencies_from_purchase(purchase)
-                count += 1
+        # Rebuild all term frequencies for this budget's categories
+        count = rebuild_term_frequencies(user_module)
 
         return Response(
             {"detail": f"Reprocessed {count} purchases for term frequency analysis."},
@@ -317,15 +376,16 @@ class BudgetPurchaseAnalyseViewSet(UserModuleAuthorizationMixin, viewsets.ViewSe
 
         user_module = self.get_user_module()
 
-        results = []
-        for item in serializer.validated_data:
-            description = item['description']
-            index = item['index']
-            suggested = suggest_category_for_description(description, user_module)
-            results.append({
-                "index": index,
-                "category": suggested
-            })
+        items = serializer.validated_data
+        suggestions = suggest_categories_for_descriptions(
+            [item['description'] for item in items],
+            user_module
+        )
+
+        results = [
+            {"index": item['index'], "category": suggested}
+            for item, suggested in zip(items, suggestions)
+        ]
 
         return Response(BudgetPurchaseAnalyseOutputSerializer(results, many=True).data)
 
@@ -2,12 +2,29 @@ from django.db import transaction
 from django.shortcuts import get_object_or_404
 from rest_framework import viewsets, permissions, status, serializers
 from rest_framework.response import Response
-from datetime import datetime
 from rest_framework.decorators import action
-
-from api.serializers.serializers_lists import ListConfigurationSerializer, ListFieldReorderSerializer, ListFieldSerializer, ListItemSerializer, ListDataSerializer
+from drf_spectacular.utils import extend_schema
+
+from api.serializers.serializers_lists import (
+    ListConfigurationSerializer,
+    ListFieldReorderSerializer,
+    ListFieldSerializer,
+    ListItemSerializer,
+    ListDataSerializer,
+    ListItemBulkSerializer,
+    ListItemBulkResultSerializer,
+    prefetch_list_configuration,
+    prefetch_list_fields,
+    prefetch_list_data,
+    LIST_ITEM_ORDERING,
+    LIST_ITEMS_LIMIT
+)
 from api.models import UserModule, ListField, ListFieldRule, ListFieldOption, ListItem
-from api.views.mixins import UserModuleAuthorizationMixin
+from api.views.mixins import UserModuleAuthorizationMixin, StreamingExportMixin
+from api.services.list_configuration import apply_list_fields
+from api.services.ordering import move_to_position, move_to_rank
+from api.services.list_validation import get_list_validator, invalidate_list_validator
+from api.services.list_items import apply_bulk_item_changes, top_ranks
 from api.pagination import Unpaginatable
 
 class ListConfigurationViewSet(viewsets.ModelViewSet):
@@ -27,7 +44,9 @@ class ListConfigurationViewSet(viewsets.ModelViewSet):
         """
         Return lists that belong to the current authenticated user
         """
-        return UserModule.objects.filter(user=self.request.user, module__name='list')
+        return prefetch_list_configuration(
+            UserModule.objects.filter(user=self.request.user, module__name='list')
+        )
 
     def create(self, request, *args, **kwargs):
         return Response(
@@ -52,73 +71,10 @@ class ListConfigurationViewSet(viewsets.ModelViewSet):
 
             # Handle fields update logic
             if 'list_fields' in request.data:
-                existing_fields = {field.id: field for field in ListField.objects.filter(user_module=instance)}
-                submitted_field_ids = {field_data.get('id') for field_data in request.data.get('list_fields', [])
-                                    if 'id' in field_data}
-
-                # Fields to delete (exist in DB but not in submitted data)
-                fields_to_delete = set(existing_fields.keys()) - submitted_field_ids
-                ListField.objects.filter(id__in=fields_to_delete).delete()
-
-                # Process submitted fields
-                for idx, field_data in enumerate(request.data.get('list_fields', [])):
-                    field_id = field_data.get('id')
-
-                    if field_id and field_id in existing_fields:
-                        # Update existing field
-                        field = existing_fields[field_id]
-                        field.field_name = field_data.get('field_name', field.field_name)
-                        field.field_type_id = field_data.get('field_type', field.field_type_id)
-                        field.is_mandatory = field_data.get('is_mandatory', field.is_mandatory)
-                        field.order = field_data.get('order', idx)
-                        field.save()
-
-                        # Handle rules
-                        if 'rules' in field_data:
-                            existing_rules = ListFieldRule.objects.filter(list_field=field)
-                            existing_rules.delete()
-
-                            for rule_data in field_data.get('rules', []):
-                                ListFieldRule.objects.create(
-                                    list_field=field,
-                                    field_type_rule_id=rule_data.get('field_type_rule')
-                                )
-
-                        # Handle options for dropdown fields
-                        if field.field_type.name == 'dropdown' and 'options' in field_data:
-                            existing_options = ListFieldOption.objects.filter(list_field=field)
-                            existing_options.delete()
-
-                            for option_data in field_data.get('options', []):
-                                ListFieldOption.objects.create(
-                                    list_field=field,
-                                    option_name=option_data.get('option_name')
-                                )
-                    else:
-                        # Create new field
-                        field = ListField.objects.create(
-                            user_module=instance,
-                            field_type_id=field_data.get('field_type'),
-                            field_name=field_data.get('field_name'),
-                            is_mandatory=field_data.get('is_mandatory', False),
-                            order=field_data.get('order', idx)
-                        )
-
-                        # Create rules
-                        for rule_data in field_data.get('rules', []):
-                            ListFieldRule.objects.create(
-                                list_field=field,
-                                field_type_rule_id=rule_data.get('field_type_rule')
-                            )
-
-                        # Create options for dropdown fields
-                        if field.field_type.name == 'dropdown':
-                            for option_data in field_data.get('options', []):
-                                ListFieldOption.objects.create(
-                                    list_field=field,
-                                    option_name=option_data.get('option_name')
-                                )
+                apply_list_fields(instance, request.data.get('list_fields', []))
 
+            # Reload so the response reflects the writes rather than the prefetched state
+            instance = self.get_queryset().get(pk=instance.pk)
             return Response(self.get_serializer(instance).data)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -139,7 +95,7 @@ class ListConfigurationFieldViewSet(viewsets.ModelViewSet):
         """
         Return only fields owned by the current user
         """
-        return ListField.objects.filter(user_module__user=self.request.user)
+        return prefetch_list_fields(ListField.objects.filter(user_module__user=self.request.user))
 
     def perform_create(self, serializer):
         """
@@ -163,6 +119,8 @@ class ListConfigurationFieldViewSet(viewsets.ModelViewSet):
                     option_name=opt.get('option_name')
                 )
 
+        invalidate_list_validator(instance.user_module_id)
+
     def perform_update(self, serializer):
         """
         Handle rule/option updates if provided
@@ -187,6 +145,8 @@ class ListConfigurationFieldViewSet(viewsets.ModelViewSet):
                     option_name=opt.get('option_name')
                 )
 
+        invalidate_list_validator(instance.user_module_id)
+
     def destroy(self, request, *args, **kwargs):
         """
         Delete field along with related rules/options
@@ -195,6 +155,7 @@ class ListConfigurationFieldViewSet(viewsets.ModelViewSet):
         ListFieldRule.objects.filter(list_field=instance).delete()
         ListFieldOption.objects.filter(list_field=instance).delete()
         instance.delete()
+        invalidate_list_validator(instance.user_module_id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=True, methods=['post'], url_path='reorder')
@@ -216,22 +177,16 @@ class ListConfigurationFieldViewSet(viewsets.ModelViewSet):
         )
         user_module = field.user_module
 
-        # Fetch fields ordered by current order
-        fields = list(ListField.objects.filter(user_module=user_module).order_by('order'))
-
         # Move field
-        original_order = field.order
-        if original_order != new_order:
-            moved_field = fields.pop(original_order - 1)
-            fields.insert(new_order - 1, moved_field)
-
-            # Reassign orders
-            with transaction.atomic():
-                for idx, f in enumerate(fields):
-                    f.order = idx + 1
-                ListField.objects.bulk_update(fields, ['order'])
+        move_to_position(
+            ListField.objects.filter(user_module=user_module),
+            field.id,
+            new_order,
+            lock=UserModule.objects.filter(pk=user_module.pk)
+        )
 
         # Return updated configuration
+        user_module = prefetch_list_configuration(UserModule.objects.filter(pk=user_module.pk)).get()
         config_serializer = ListConfigurationSerializer(user_module, context={'request': request})
         return Response(config_serializer.data, status=status.HTTP_200_OK)
 
@@ -247,10 +202,32 @@ class ListDataViewSet(viewsets.ReadOnlyModelViewSet):
     lookup_field = 'id'
     lookup_value_regex = r'\d+'
 
+    # Upper bound for the `items_limit` query parameter
+    max_items_limit = 500
+
+    def get_items_limit(self):
+        try:
+            limit = int(self.request.query_params.get('items_limit', LIST_ITEMS_LIMIT))
+        except ValueError:
+            limit = LIST_ITEMS_LIMIT
+        return min(max(limit, 1), self.max_items_limit)
+
     def get_queryset(self):
-        return UserModule.objects.filter(user=self.request.user, module__name='list')
+        """
+        Return lists with their configuration and first page of items preloaded,
+        so each response costs a fixed number of queries
+        """
+        return prefetch_list_data(
+            UserModule.objects.filter(user=self.request.user, module__name='list'),
+            limit=self.get_items_limit()
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['list_items_limit'] = self.get_items_limit()
+        return context
 
-class ListItemViewSet(UserModuleAuthorizationMixin, viewsets.ModelViewSet):
+class ListItemViewSet(UserModuleAuthorizationMixin, StreamingExportMixin, viewsets.ModelViewSet):
     """
     API endpoint for CRUD operations on list items
     """
@@ -258,6 +235,14 @@ class ListItemViewSet(UserModuleAuthorizationMixin, viewsets.ModelViewSet):
     serializer_class = ListItemSerializer
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = Unpaginatable
+    keyset_ordering = LIST_ITEM_ORDERING
+    stream_fields = {
+        'id': 'id',
+        'is_completed': 'is_completed',
+        'modified_at': 'modified_at',
+        'field_values': 'fields',
+    }
+    stream_filename = 'list_items'
     user_module_kwarg = 'list_id'
 
     lookup_field = 'id'
@@ -285,30 +270,59 @@ class ListItemViewSet(UserModuleAuthorizationMixin, viewsets.ModelViewSet):
         user_module = self.get_user_module()
         item = get_object_or_404(ListItem, id=id, user_module=user_module)
 
-        items = list(ListItem.objects.filter(user_module=user_module).order_by('order', '-modified_at'))
-
-        original_order = item.order
-        if original_order != new_order:
-            moved_item = None
-            for idx, i in enumerate(items):
-                if i.id == item.id:
-                    moved_item = items.pop(idx)
-                    break
-            
-            if moved_item:
-                insert_index = max(0, new_order - 1)
-                items.insert(insert_index, moved_item)
-
-                with transaction.atomic():
-                    for idx, i in enumerate(items):
-                        i.order = idx + 1
-                    ListItem.objects.bulk_update(items, ['order'])
+        move_to_rank(
+            ListItem.objects.filter(user_module=user_module),
+            item.id,
+            new_order,
+            lock=UserModule.objects.filter(pk=user_module.pk),
+            ordering=LIST_ITEM_ORDERING
+        )
 
         # Return the updated page of list items, ideally just returning success to refetch
         page = self.paginate_queryset(self.get_queryset())
         serializer = self.get_serializer(page, many=True)
         return self.get_paginated_response(serializer.data)
 
+    @extend_schema(request=ListItemBulkSerializer, responses=ListItemBulkResultSerializer)
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request, list_id=None):
+        """
+        Apply many item changes in one request and one transaction.
+        Expects {"create": [...], "update": [...], "delete": [<id>], "complete": [{"id", "is_completed"}]};
+        every key is optional. Field values are checked against one compiled schema.
+        """
+        serializer = ListItemBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        user_module = self.get_user_module()
+
+        validator = get_list_validator(user_module.id)
+        errors = {}
+        for key in ('create', 'update'):
+            item_errors = {
+                index: validator.validate(item['fields'])
+                for index, item in enumerate(data.get(key, []))
+                if item.get('fields')
+            }
+            item_errors = {index: error for index, error in item_errors.items() if error}
+            if item_errors:
+                errors[key] = item_errors
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        try:
+            result = apply_bulk_item_changes(
+                user_module,
+                create=data.get('create', []),
+                update=data.get('update', []),
+                delete=data.get('delete', []),
+                complete=data.get('complete', [])
+            )
+        except ListItem.DoesNotExist as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(ListItemBulkResultSerializer(result).data)
+
     def perform_create(self, serializer):
         list_id = self.kwargs.get('list_id')
         user_module = self.get_user_module()
@@ -316,7 +330,10 @@ class ListItemViewSet(UserModuleAuthorizationMixin, viewsets.ModelViewSet):
         field_values = self.request.data.get('field_values', [])
         self._validate_field_values(field_values, list_id)
 
-        serializer.save(user_module=user_module)
+        # New items go above the existing ones, under the same lock as a move
+        with transaction.atomic():
+            list(UserModule.objects.filter(pk=user_module.pk).select_for_update())
+            serializer.save(user_module=user_module, order=top_ranks(user_module, 1)[0])
 
     def perform_update(self, serializer):
         list_id = self.kwargs.get('list_id')
@@ -337,65 +354,7 @@ class ListItemViewSet(UserModuleAuthorizationMixin, viewsets.ModelViewSet):
         if not field_values:
             return
 
-        # Get all valid fields for this list
-        valid_fields = {
-            field.id: field for field in ListField.objects.filter(user_module_id=list_id)
-        }
-
-        # Check for required fields
-        required_field_ids = {
-            field_id for field_id, field in valid_fields.items() if field.is_mandatory
-        }
-        provided_field_ids = {item.get('field') for item in field_values if 'field' in item}
-
-        missing_required = required_field_ids - provided_field_ids
-        if missing_required:
-            missing_field_names = [valid_fields[id].field_name for id in missing_required]
-            raise serializers.ValidationError({
-                "field_values": f"Missing required fields: {', '.join(missing_field_names)}"
-            })
-
-        # Validate each field value
-        for item in field_values:
-            field_id = item['field']
-
-            # Check if field exists in this list
-            if field_id not in valid_fields:
-                raise serializers.ValidationError({
-                    "field_values": f"Field ID {field_id} does not belong to this list"
-                })
-
-            # Validate value based on field type
-            field = valid_fields[field_id]
-            value = item['value']
-
-            # Type-specific validation
-            match field.field_type.name:
-                case 'number':
-                    try:
-                        float(value)
-                    except (ValueError, TypeError):
-                        raise serializers.ValidationError({
-                            "field_values": f"Field '{field.field_name}' must be a number"
-                        })
-
-                case 'date':
-                    try:
-                        if value:  # Allow empty dates for non-mandatory fields
-                            datetime.strptime(value, '%Y-%m-%d')
-                    except ValueError:
-                        raise serializers.ValidationError({
-                            "field_values": f"Field '{field.field_name}' must be a valid date in YYYY-MM-DD format"
-                        })
-
-                case 'dropdown':
-                    # Validate dropdown option exists
-                    if value:
-                        valid_options = ListFieldOption.objects.filter(
-                            list_field_id=field_id
-                        ).values_list('option_name', flat=True)
-
-                        if value not in valid_options:
-                            raise serializers.ValidationError({
-                                "field_values": f"'{value}' is not a valid option for field '{field.field_name}'"
-                            })
\ No newline at end of file
+        # Checked against the list's compiled configuration, cached until it changes
+        error = get_list_validator(list_id).validate(field_values)
+        if error:
+            raise serializers.ValidationError({"field_values": error})
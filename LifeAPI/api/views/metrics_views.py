@@ -0,0 +1,46 @@
+import hmac
+
+from django.conf import settings
+from drf_spectacular.utils import extend_schema
+from rest_framework import permissions
+from rest_framework.renderers import BaseRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from api.metrics import registry
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+class PrometheusTextRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Error responses carry a {'detail': ...} dict
+        if isinstance(data, dict):
+            data = str(data.get('detail', data))
+        return data.encode(self.charset)
+
+class HasMetricsToken(permissions.BasePermission):
+    """
+    Allows requests bearing "Authorization: Bearer <METRICS_TOKEN>".
+    Nothing is allowed while METRICS_TOKEN is unset.
+    """
+    def has_permission(self, request, view):
+        token = settings.METRICS_TOKEN
+        return bool(token) and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+class MetricsView(APIView):
+    """
+    API endpoint for scraping the API's metrics in the Prometheus text format,
+    summed across every gunicorn worker.
+    """
+    authentication_classes = []
+    permission_classes = [HasMetricsToken]
+    throttle_classes = []
+    renderer_classes = [PrometheusTextRenderer]
+
+    @extend_schema(exclude=True)
+    def get(self, request):
+        return Response(registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,5 +1,10 @@
 from django.shortcuts import get_object_or_404
+from rest_framework import status
+from rest_framework.response import Response
+
+from api import metrics
 from api.models import UserModule
+from api.streaming import EXPORT_CONTENT_TYPES, streaming_export_response
 
 class UserModuleAuthorizationMixin:
     """
@@ -32,3 +37,30 @@ class UserModuleAuthorizationMixin:
                 user=self.request.user
             )
         return self._user_module_cache
+
+class StreamingExportMixin:
+    """
+    Mixin that streams `get_all=true` list responses row by row when a
+    `stream` format of 'ndjson' or 'csv' is requested, instead of
+    serializing the whole queryset into one response.
+
+    Configure `stream_fields` as a mapping of output column to queryset
+    value path (e.g. {'category_name': 'category__name'}).
+    """
+    stream_fields = {}
+    stream_filename = 'export'
+
+    def list(self, request, *args, **kwargs):
+        export_format = request.query_params.get('stream')
+        if request.query_params.get('get_all') != 'true' or not export_format:
+            return super().list(request, *args, **kwargs)
+
+        if export_format not in EXPORT_CONTENT_TYPES:
+            return Response(
+                {'detail': f"stream must be one of: {', '.join(EXPORT_CONTENT_TYPES)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        metrics.PAGINATED_REQUESTS.inc(view=type(self).__name__, mode='stream')
+        queryset = self.filter_queryset(self.get_queryset())
+        return streaming_export_response(queryset, self.stream_fields, export_format, self.stream_filename)
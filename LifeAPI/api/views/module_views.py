@@ -1,12 +1,13 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db import transaction
+from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
 
 from api.serializers.serializers_modules import ModuleTypeSerializer, UserModuleSerializer
 from api.models import ModuleType, UserModule
 from api.pagination import Unpaginatable
+from api.services.ordering import move_to_position
 
 class ModuleTypeViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -54,26 +55,13 @@ class UserModuleViewSet(viewsets.ModelViewSet):
         except ValueError:
             return Response({'detail': 'Invalid order value.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        modules = list(UserModule.objects.filter(user=request.user).order_by('order'))
-        
         module = get_object_or_404(UserModule, id=id, user=request.user)
-        original_order = module.order
-
-        if original_order != new_order:
-            moved_module = None
-            for idx, m in enumerate(modules):
-                if m.id == module.id:
-                    moved_module = modules.pop(idx)
-                    break
-            
-            if moved_module:
-                insert_index = max(0, new_order - 1)
-                modules.insert(insert_index, moved_module)
-
-                with transaction.atomic():
-                    for idx, m in enumerate(modules):
-                        m.order = idx + 1
-                    UserModule.objects.bulk_update(modules, ['order'])
+        move_to_position(
+            UserModule.objects.filter(user=request.user),
+            module.id,
+            new_order,
+            lock=get_user_model().objects.filter(pk=request.user.pk)
+        )
 
         # Return updated module list so frontend can sync
         updated_modules = UserModule.objects.filter(user=request.user).order_by('order')
@@ -0,0 +1,328 @@
+"""
+Query-count, latency and memory benchmark for every router-registered API
+endpoint.
+
+Generates a synthetic dataset, as the seed_load_data command does, into a
+throwaway test database, then requests each endpoint and records:
+  - queries: SQL statements issued by one request with empty caches
+  - p50/p95: latency in ms over --repeat warm requests
+  - peak_kib: peak traced Python memory of the cold request
+Write requests run inside a transaction that is rolled back, so every
+request sees the same data.
+
+Results are compared against a baseline JSON and any regression fails the
+run with exit status 1. Query counts and response statuses are always
+compared; median latency and peak memory only when the baseline was
+recorded on the same database vendor and dataset scale.
+
+Run from the LifeAPI directory:
+    python benchmarks/api_benchmark.py [--preset smoke] [--baseline benchmarks/baseline.json]
+    python benchmarks/api_benchmark.py --preset production --lists 10 --save-baseline /tmp/baseline.json
+"""
+import argparse
+import gc
+import json
+import os
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import timedelta
+from pathlib import Path
+from typing import NamedTuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.cache import cache  # noqa: E402
+from django.core.files.uploadedfile import SimpleUploadedFile  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment  # noqa: E402
+from django.urls import URLResolver, get_resolver, reverse  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from api.services.load_data import generate_load_data, LoadData, LoadDataScale, DEFAULT_SEED, HISTORY_END_DATE  # noqa: E402
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'baseline.json'
+
+PRESETS = {
+    'smoke': {'lists': 3, 'fields': 8, 'items': 500, 'budgets': 2, 'purchases': 5_000},
+    'production': {'lists': 50, 'fields': 40, 'items': 10_000, 'budgets': 5, 'purchases': 100_000},
+}
+
+# Extra query strings per route, each benchmarked as its own case
+QUERY_CASES = {
+    'budget-purchase-list': [
+        {},
+        {'get_all': 'true'},
+        {'pagination': 'cursor'},
+        {'search': 'metro sydney'},
+        {'description': 'wool'},
+    ],
+    'list-items-list': [{}, {'get_all': 'true'}, {'pagination': 'cursor'}],
+    'data-list': [{}, {'get_all': 'true'}],
+    'budget-summary-list': [{
+        'start_date': (HISTORY_END_DATE - timedelta(weeks=12)).isoformat(),
+        'end_date': HISTORY_END_DATE.isoformat(),
+    }],
+}
+
+
+class Case(NamedTuple):
+    label: str
+    method: str
+    path: str
+    params: dict
+    body: object = None
+    format: str = 'json'
+
+
+def iter_routes(patterns=None, prefix=''):
+    """
+    Yields (name, url regex, http method -> action) for each viewset route.
+    Format suffix variants are skipped.
+    """
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        regex = prefix + pattern.pattern.regex.pattern.lstrip('^')
+        if isinstance(pattern, URLResolver):
+            yield from iter_routes(pattern.url_patterns, regex.rstrip('$'))
+            continue
+        actions = getattr(pattern.callback, 'actions', None)
+        if actions and pattern.name and '(?P<format>' not in regex:
+            yield pattern.name, regex, actions
+
+def _results(data):
+    return data.get('results', []) if isinstance(data, dict) else data
+
+def _writable(data: dict) -> dict:
+    return {key: value for key, value in data.items() if key not in ('id', 'modified_at', 'created_at')}
+
+def build_cases(client: APIClient, dataset: LoadData) -> tuple[list[Case], list[str]]:
+    """
+    Expands every route into benchmark cases. Parent ids point at the first
+    seeded list and budget; detail ids are taken from the matching list route.
+    Write bodies reuse what the read endpoints return. Returns (cases,
+    routes skipped with the reason).
+    """
+    parents = {
+        'list_id': dataset.lists[0].id if dataset.lists else None,
+        'configuration_id': dataset.lists[0].id if dataset.lists else None,
+        'budget_id': dataset.budgets[0].id if dataset.budgets else None,
+    }
+    routes = list(iter_routes())
+    list_routes = {name[:-len('-list')]: name for name, _, _ in routes if name.endswith('-list')}
+
+    cases, skipped = [], []
+    for name, regex, actions in routes:
+        kwarg_names = re.compile(regex).groupindex
+        kwargs = {key: parents[key] for key in kwarg_names if key in parents}
+        if None in kwargs.values():
+            skipped.append(f'{name}: no seeded parent')
+            continue
+
+        detail = None
+        lookup = next((key for key in kwarg_names if key not in parents), None)
+        if lookup:
+            basename = name.rsplit('-', 1)[0]
+            list_name = list_routes.get(basename)
+            rows = _results(client.get(reverse(list_name, kwargs=kwargs)).data) if list_name else []
+            if not rows:
+                skipped.append(f'{name}: no object to look up')
+                continue
+            detail = rows[0]
+            kwargs[lookup] = detail['id']
+
+        path = reverse(name, kwargs=kwargs)
+        for method, action in sorted(actions.items()):
+            if method in ('head', 'options'):
+                continue
+            for params in QUERY_CASES.get(name, [{}]) if method == 'get' else [{}]:
+                body = _write_body(client, name, method, action, path, detail, parents)
+                if method != 'get' and method != 'delete' and body is None:
+                    skipped.append(f'{method.upper()} {name}: no payload')
+                    continue
+                query = '&'.join(f'{key}={value}' for key, value in params.items())
+                label = f'{method.upper()} {name}' + (f'?{query}' if query else '')
+                cases.append(Case(label, method, path, params, body, 'multipart' if action == 'import_statement' else 'json'))
+
+    return cases, skipped
+
+def _write_body(client, name, method, action, path, detail, parents):
+    if method in ('get', 'delete'):
+        return None
+    if action == 'reorder':
+        return {'new_order': 1}
+    if action in ('update', 'partial_update'):
+        return _writable(client.get(path).data)
+    if action == 'reprocess':
+        return {}
+
+    purchases = [_writable(row) for row in _results(client.get(reverse('budget-purchase-list', kwargs={'budget_id': parents['budget_id']})).data)]
+    if action == 'create' and name == 'budget-purchase-analyse-list':
+        return [{'index': i, 'description': row['description']} for i, row in enumerate(purchases)]
+    if action == 'create':
+        rows = _results(client.get(path).data)
+        if not rows:
+            return None
+        body = _writable(rows[0])
+        if 'name' in body:
+            # Names such as category names are unique per budget; every request is rolled back
+            body['name'] = f"{body['name']} (benchmark copy)"
+        return body
+    if action == 'bulk_create':
+        return purchases
+    if action == 'import_statement':
+        lines = ['Date,Details,Amount'] + [f"{row['purchase_date']},{row['description']},{row['amount']}" for row in purchases]
+        return {'file': SimpleUploadedFile('statement.csv', '\r\n'.join(lines).encode(), content_type='text/csv')}
+    if action == 'bulk':
+        items = _results(client.get(path.replace('bulk/', ''), {'get_all': 'true'}).data)[:20]
+        return {
+            'create': [{'field_values': item['field_values']} for item in items[:5]],
+            'complete': [{'id': item['id'], 'is_completed': True} for item in items[5:15]],
+            'delete': [item['id'] for item in items[15:20]],
+        }
+    return None
+
+
+def _request(client: APIClient, case: Case):
+    body = case.body
+    if hasattr(body, 'get') and hasattr(body.get('file'), 'seek'):
+        body['file'].seek(0)
+    if case.method == 'get':
+        return client.get(case.path, case.params)
+    with transaction.atomic():
+        response = getattr(client, case.method)(case.path, body, format=case.format)
+        transaction.set_rollback(True)
+    return response
+
+def measure(client: APIClient, case: Case, repeat: int) -> dict:
+    cache.clear()
+    tracemalloc.start()
+    with CaptureQueriesContext(connection) as queries:
+        response = _request(client, case)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Read now: the query log is reset when the next request starts
+    query_count = len(queries)
+
+    # As timeit does, keep collector pauses out of the timings
+    gc.collect()
+    gc.disable()
+    try:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            _request(client, case)
+            timings.append((time.perf_counter() - start) * 1000)
+    finally:
+        gc.enable()
+
+    return {
+        'status': response.status_code,
+        'queries': query_count,
+        'p50': round(statistics.median(timings), 2),
+        'p95': round(statistics.quantiles(timings, n=20, method='inclusive')[-1] if len(timings) > 1 else timings[0], 2),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def compare(results: dict, baseline: dict, environment: dict, args) -> list[str]:
+    """
+    Returns a description of each regression against the baseline.
+    """
+    same_environment = baseline.get('environment') == environment
+    regressions = []
+    for label, result in results.items():
+        expected = baseline.get('results', {}).get(label)
+        if expected is None:
+            continue
+        if result['status'] != expected['status']:
+            regressions.append(f"{label}: status {expected['status']} -> {result['status']}")
+        if result['queries'] > expected['queries']:
+            regressions.append(f"{label}: queries {expected['queries']} -> {result['queries']}")
+        if not same_environment:
+            continue
+        # p95 over a few dozen requests is mostly scheduler noise, so only the median is gated
+        if result['p50'] > expected['p50'] * (1 + args.latency_tolerance) and result['p50'] - expected['p50'] > args.latency_floor:
+            regressions.append(f"{label}: p50 {expected['p50']}ms -> {result['p50']}ms")
+        if result['peak_kib'] > expected['peak_kib'] * (1 + args.memory_tolerance) and result['peak_kib'] - expected['peak_kib'] > args.memory_floor:
+            regressions.append(f"{label}: peak memory {expected['peak_kib']}KiB -> {result['peak_kib']}KiB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--preset', choices=PRESETS, default='smoke')
+    for key in PRESETS['smoke']:
+        parser.add_argument(f'--{key}', type=int, help=f'Override the preset number of {key}.')
+    parser.add_argument('--repeat', type=int, default=20, help='Warm requests timed per endpoint.')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--only', help='Only run cases whose label contains this text.')
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', type=Path, help='Write the results as a new baseline instead of comparing.')
+    parser.add_argument('--latency-tolerance', type=float, default=0.5, help='Allowed relative p50 increase.')
+    parser.add_argument('--latency-floor', type=float, default=10.0, help='p50 increases below this many ms are ignored.')
+    parser.add_argument('--memory-tolerance', type=float, default=0.25, help='Allowed relative peak memory increase.')
+    parser.add_argument('--memory-floor', type=float, default=256.0, help='Peak memory increases below this many KiB are ignored.')
+    args = parser.parse_args()
+
+    scale = {key: getattr(args, key) if getattr(args, key) is not None else value for key, value in PRESETS[args.preset].items()}
+    environment = {'vendor': connection.vendor, 'scale': scale}
+
+    setup_test_environment()
+    # Never touch a shared cache or follow the production HTTPS redirect
+    settings_override = override_settings(
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'}},
+        SECURE_SSL_REDIRECT=False
+    )
+    settings_override.enable()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        started = time.perf_counter()
+        dataset = generate_load_data(LoadDataScale(users=1, **scale), seed=args.seed)
+        print(f"Seeded {scale} in {time.perf_counter() - started:.1f}s on {connection.vendor}")
+
+        client = APIClient()
+        client.force_authenticate(user=dataset.users[0])
+        cases, skipped = build_cases(client, dataset)
+        if args.only:
+            cases = [case for case in cases if args.only in case.label]
+
+        results = {}
+        print(f"{'endpoint':<70} {'status':>6} {'queries':>7} {'p50 ms':>8} {'p95 ms':>8} {'peak KiB':>9}")
+        for case in cases:
+            result = results[case.label] = measure(client, case, args.repeat)
+            print(f"{case.label:<70} {result['status']:>6} {result['queries']:>7} {result['p50']:>8} {result['p95']:>8} {result['peak_kib']:>9}")
+        for reason in skipped:
+            print(f"skipped {reason}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        settings_override.disable()
+
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps({'environment': environment, 'results': results}, indent=2, sort_keys=True) + '\n')
+        print(f"Saved baseline to {args.save_baseline}")
+        return
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return
+
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get('environment') != environment:
+        print(f"Baseline was recorded with {baseline.get('environment')}; comparing statuses and query counts only.")
+    regressions = compare(results, baseline, environment, args)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+    print("No regressions against the baseline.")
+
+
+if __name__ == '__main__':
+    main()
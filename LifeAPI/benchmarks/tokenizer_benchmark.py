@@ -0,0 +1,85 @@
+"""
+Micro-benchmark comparing the precompiled tokenizer against the original
+per-call implementation used by budget_analysis.
+
+Run from the LifeAPI directory:
+    python benchmarks/tokenizer_benchmark.py [--rows 5000] [--repeat 5]
+"""
+import argparse
+import random
+import re
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api.services.tokenizer import description_ngrams  # noqa: E402
+
+WORD_LENGTHS = (1, 2, 3)
+
+MERCHANTS = [
+    'WOOLWORTHS METRO 1234 SYDNEY NSW',
+    'COLES EXPRESS 5678 MELBOURNE VIC',
+    'UBER *TRIP HELP.UBER.COM',
+    'ANGKOR CAFE & BAR NEWTOWN',
+    'BUNNINGS WAREHOUSE 0412 ALEXANDRIA',
+    'NETFLIX.COM 866-579-7172',
+    'AMAZON MKTPLC AU SYDNEY SOUTH',
+    'TRANSPORTFORNSW OPAL CHATSWOOD',
+]
+
+
+def legacy_tokenize(text):
+    cleaned = re.sub(r"[^\w\s]", "", text.lower())
+    tokens = cleaned.split()
+    return [t for t in tokens if not any(char.isdigit() for char in t)]
+
+
+def legacy_get_ngrams(tokens, n):
+    if len(tokens) < n:
+        return set()
+    return {" ".join(tokens[i:i+n]) for i in range(len(tokens) - n + 1)}
+
+
+def legacy_terms(description):
+    tokens = legacy_tokenize(description)
+    return [t for n in WORD_LENGTHS for t in legacy_get_ngrams(tokens, n)]
+
+
+def current_terms(description):
+    return [t for grams in description_ngrams(description, WORD_LENGTHS) for t in grams]
+
+
+def build_corpus(rows, seed=42):
+    rng = random.Random(seed)
+    return [f"{rng.choice(MERCHANTS)} {rng.choice(['', 'CARD 4821', 'AUS'])}".strip() for _ in range(rows)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.rows)
+
+    # Sanity check that both implementations agree before timing them
+    for description in set(corpus):
+        assert sorted(legacy_terms(description)) == sorted(current_terms(description)), description
+
+    legacy = min(timeit.repeat(lambda: [legacy_terms(d) for d in corpus], number=1, repeat=args.repeat))
+
+    def run_current():
+        description_ngrams.cache_clear()
+        return [current_terms(d) for d in corpus]
+
+    current = min(timeit.repeat(run_current, number=1, repeat=args.repeat))
+
+    print(f"rows: {args.rows}, distinct descriptions: {len(set(corpus))}")
+    print(f"legacy:  {legacy * 1000:8.2f} ms")
+    print(f"current: {current * 1000:8.2f} ms  ({legacy / current:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -28,6 +28,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'corsheaders',
@@ -37,7 +38,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'api.middleware.SQLProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -84,6 +87,26 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# The cache must be shared by every gunicorn worker so version bumps
+# (api/cache.py) reach them all. Set CACHE_LOCATION to a Redis URL, e.g.
+# redis://localhost:6379/0, to use RedisCache. Without one, each process
+# keeps its own LocMemCache, which is only correct with a single worker
+# (development and tests).
+
+CACHE_LOCATION = os.environ.get('CACHE_LOCATION', '')
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.redis.RedisCache' if CACHE_LOCATION else 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': CACHE_LOCATION,
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -204,9 +227,41 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        'api.sql': {
+            'handlers': ['console', 'file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
+# SQL profiling
+# Logs query counts and database time per request to the api.sql logger
+# and adds a Server-Timing header. Requests over any threshold are logged
+# as warnings. Off by default; the middleware is removed at startup.
+SQL_PROFILING = os.environ.get('SQL_PROFILING', 'False') == 'True'
+SQL_PROFILING_MAX_QUERIES = int(os.environ.get('SQL_PROFILING_MAX_QUERIES', '50'))
+SQL_PROFILING_MAX_DB_MS = float(os.environ.get('SQL_PROFILING_MAX_DB_MS', '200'))
+SQL_PROFILING_MAX_QUERY_MS = float(os.environ.get('SQL_PROFILING_MAX_QUERY_MS', '100'))
+# Highest number of times one query may repeat in a request, e.g. an N+1
+SQL_PROFILING_MAX_DUPLICATES = int(os.environ.get('SQL_PROFILING_MAX_DUPLICATES', '5'))
+
+# Metrics
+# Request latency, query counts and hot-path counters, served in the
+# Prometheus text format at /api/metrics/ to requests bearing
+# "Authorization: Bearer <METRICS_TOKEN>". Off by default; when on, every
+# request runs through a query-counting execute wrapper and a URL resolve.
+# With several gunicorn workers, set METRICS_DIR to a directory the
+# workers share; each worker writes its values there at most every
+# METRICS_FLUSH_INTERVAL seconds and a scrape sums them. A starting worker
+# deletes snapshots not written for METRICS_SNAPSHOT_MAX_AGE seconds, which
+# Prometheus sees as a counter reset.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'False') == 'True'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '5'))
+METRICS_SNAPSHOT_MAX_AGE = float(os.environ.get('METRICS_SNAPSHOT_MAX_AGE', '86400'))
+
 APPEND_SLASH = True
 
 SPECTACULAR_SETTINGS = {
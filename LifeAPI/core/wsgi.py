@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_wsgi_application()
+
+# Load reference data at worker boot so the first request does not pay for it
+from api.reference_data import warm_reference_data  # noqa: E402
+
+warm_reference_data()